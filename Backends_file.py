@@ -0,0 +1,251 @@
+import importlib.util
+import os
+import threading
+
+import numpy as np
+
+from Forces_file import G, compute_accel
+
+# Backends de cálculo disponibles, seleccionables con "backend" de los parámetros de la simulación; "auto"
+# escoge "numba" si está instalado y "numpy" si no.
+BACKEND_NAMES = ("auto", "numpy", "numba")
+
+# Backends ya creados, guardados por (nombre, fastmath) para compilar los kernels una sola vez.
+_backends = {}
+_lock = threading.Lock()
+
+
+def numba_available():
+    '''Indica si Numba está instalado (sin importarlo).'''
+    return importlib.util.find_spec("numba") is not None
+
+
+class NumpyBackend:
+    '''
+    Backend de referencia, con las operaciones vectorizadas de numpy: el cálculo de la fuerza con el
+    método de los parámetros (ver "compute_accel") y las actualizaciones de velocidad y posición de los
+    integradores.
+
+    Métodos:
+        compute_accel(m, pos, params=None, targets=None, potential=False): Aceleraciones (y potenciales).
+        kick(vel, accel, kick): vel += accel·kick.
+        kick_drift(pos, vel, accel, kick, drift): vel += accel·kick y luego pos += vel·drift.
+        warm_up(dtype="float64"): Prepara el backend (en este caso no hace nada).
+    '''
+    name = "numpy"
+
+    def __init__(self, fastmath=False):
+        self.fastmath = False
+
+
+    def compute_accel(self, m, pos, params=None, targets=None, potential=False):
+        return compute_accel(m, pos, params, targets, potential)
+
+
+    def kick(self, vel, accel, kick):
+        vel += accel * kick
+
+
+    def kick_drift(self, pos, vel, accel, kick, drift):
+        vel += accel * kick
+        pos += vel * drift
+
+
+    def warm_up(self, dtype="float64"):
+        pass
+
+
+def _numba_kernels(fastmath):
+    '''
+    Compila (la primera vez que se llaman) los kernels de Numba. Con "cache=True" el código compilado se
+    guarda en disco junto al módulo, de modo que las siguientes ejecuciones del programa no vuelven a
+    compilarlo.
+
+    :fastmath: Si se permiten las optimizaciones de punto flotante que no respetan IEEE 754.
+    :return: Diccionario {nombre: kernel}.
+    '''
+    from numba import njit, prange
+
+    @njit(parallel=True, fastmath=fastmath, cache=True)
+    def accel_targets(m, pos, targets, softening2, accel, phi, want_phi):
+        # Cada hilo calcula las aceleraciones de un grupo de partículas; no hay escrituras compartidas.
+        for t in prange(len(targets)):
+            i = targets[t]
+            xi, yi = pos[i, 0], pos[i, 1]
+            ax = ay = p = 0.0
+            for j in range(len(m)):
+                if j == i:
+                    continue
+                dx = pos[j, 0] - xi
+                dy = pos[j, 1] - yi
+                inv_dist = 1.0 / np.sqrt(dx * dx + dy * dy + softening2)
+                weight = m[j] * inv_dist * inv_dist * inv_dist
+                ax += weight * dx
+                ay += weight * dy
+                p -= m[j] * inv_dist
+            accel[t, 0] = G * ax
+            accel[t, 1] = G * ay
+            if want_phi:
+                phi[t] = G * p
+
+    @njit(fastmath=fastmath, cache=True)
+    def accel_symmetric(m, pos, softening2, accel, phi, want_phi):
+        # Tercera ley de Newton: cada par se calcula una sola vez y su fuerza se suma con signos
+        # opuestos a las dos partículas, con la mitad de las operaciones.
+        n = len(m)
+        accel[:, :] = 0.0
+        phi[:] = 0.0
+        for i in range(n):
+            xi, yi, mi = pos[i, 0], pos[i, 1], m[i]
+            ax = ay = p = 0.0
+            for j in range(i + 1, n):
+                dx = pos[j, 0] - xi
+                dy = pos[j, 1] - yi
+                inv_dist = 1.0 / np.sqrt(dx * dx + dy * dy + softening2)
+                inv_dist3 = inv_dist * inv_dist * inv_dist
+                ax += m[j] * inv_dist3 * dx
+                ay += m[j] * inv_dist3 * dy
+                accel[j, 0] -= mi * inv_dist3 * dx
+                accel[j, 1] -= mi * inv_dist3 * dy
+                if want_phi:
+                    p -= m[j] * inv_dist
+                    phi[j] -= mi * inv_dist
+            accel[i, 0] += ax
+            accel[i, 1] += ay
+            phi[i] += p
+        for i in range(n):
+            accel[i, 0] *= G
+            accel[i, 1] *= G
+            phi[i] *= G
+
+    @njit(parallel=True, fastmath=fastmath, cache=True)
+    def kick(vel, accel, dt):
+        for i in prange(len(vel)):
+            vel[i, 0] += accel[i, 0] * dt
+            vel[i, 1] += accel[i, 1] * dt
+
+    @njit(parallel=True, fastmath=fastmath, cache=True)
+    def kick_drift(pos, vel, accel, kick, drift):
+        # Patada y deriva en una sola pasada por los arreglos, sin temporales.
+        for i in prange(len(pos)):
+            for k in range(2):
+                v = vel[i, k] + accel[i, k] * kick
+                vel[i, k] = v
+                pos[i, k] += v * drift
+
+    return {"accel_targets": accel_targets, "accel_symmetric": accel_symmetric, "kick": kick,
+            "kick_drift": kick_drift}
+
+
+class NumbaBackend(NumpyBackend):
+    '''
+    Backend con kernels compilados por Numba para la suma directa y las actualizaciones de los
+    integradores. La suma directa usa un ciclo paralelo (prange) sobre las partículas, o, con un solo
+    hilo ("workers" = 1), un ciclo sobre los pares que aprovecha la tercera ley de Newton para hacer la
+    mitad de las operaciones. Barnes-Hut y partícula-malla usan la implementación de numpy.
+
+    Atributos:
+        fastmath (bool): Si los kernels se compilan con "fastmath".
+        kernels (dict): Kernels compilados.
+    '''
+    name = "numba"
+
+    def __init__(self, fastmath=False):
+        try:
+            import numba
+        except ImportError:
+            raise ImportError("The numba backend requires Numba (pip install numba)") from None
+        # Con la capa de hilos TBB el proceso no termina si un kernel paralelo se lanzó desde un hilo
+        # distinto del principal (como el hilo de la simulación de la interfaz), por lo que se prefieren
+        # OpenMP y la cola de trabajo de Numba, salvo que el usuario haya escogido la capa.
+        if not {"NUMBA_THREADING_LAYER", "NUMBA_THREADING_LAYER_PRIORITY"} & set(os.environ):
+            numba.config.THREADING_LAYER_PRIORITY = ["omp", "workqueue", "tbb"]
+        self.numba = numba
+        self.fastmath = bool(fastmath)
+        self.kernels = _numba_kernels(self.fastmath)
+
+
+    def compute_accel(self, m, pos, params=None, targets=None, potential=False):
+        if getattr(params, "force_method", "direct") != "direct":
+            return compute_accel(m, pos, params, targets, potential)
+        softening = getattr(params, "softening", 0.0)
+        workers = getattr(params, "workers", None)
+        n = len(m) if targets is None else len(targets)
+        accel = np.empty((n, 2))
+        phi = np.empty(n)
+        # Las posiciones en float32 se convierten a float64 (costo O(N)), de modo que las sumas de los
+        # kernels se acumulan en doble precisión.
+        m, pos = np.ascontiguousarray(m, dtype=np.float64), np.ascontiguousarray(pos, dtype=np.float64)
+        if targets is None and workers == 1:
+            self.kernels["accel_symmetric"](m, pos, softening**2, accel, phi, potential)
+        else:
+            if workers:
+                self.numba.set_num_threads(min(workers, self.numba.config.NUMBA_NUM_THREADS))
+            targets = np.arange(n) if targets is None else np.asarray(targets, dtype=np.int64)
+            self.kernels["accel_targets"](m, pos, targets, softening**2, accel, phi, potential)
+        return (accel, phi) if potential else accel
+
+
+    def kick(self, vel, accel, kick):
+        self.kernels["kick"](vel, accel, kick)
+
+
+    def kick_drift(self, pos, vel, accel, kick, drift):
+        self.kernels["kick_drift"](pos, vel, accel, kick, drift)
+
+
+    def warm_up(self, dtype="float64"):
+        '''
+        Compila todos los kernels (o los carga del caché en disco) con un sistema de 3 partículas, para
+        que la compilación no retrase el primer cuadro de la simulación. Las patadas y derivas se compilan
+        para el tipo de dato de las posiciones y velocidades ("dtype"); la suma directa siempre recibe
+        las posiciones en float64.
+        '''
+        m = np.ones(3)
+        pos = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+        state = pos.astype(dtype)
+        vel = np.zeros((3, 2), dtype=dtype)
+        accel = np.zeros((3, 2))
+        phi = np.zeros(3)
+        self.kernels["accel_symmetric"](m, pos, 0.0, accel, phi, True)
+        self.kernels["accel_targets"](m, pos, np.arange(3), 0.0, accel, phi, True)
+        self.kernels["kick"](vel, accel, 0.0)
+        self.kernels["kick_drift"](state, vel, accel, 0.0, 0.0)
+
+
+# Clases de los backends, según su nombre.
+BACKENDS = {"numpy": NumpyBackend, "numba": NumbaBackend}
+
+
+def get_backend(name="auto", fastmath=False):
+    '''
+    Devuelve el backend indicado, creándolo (y compilando sus kernels) la primera vez que se pide.
+
+    :name: "numpy", "numba" o "auto" (Numba si está instalado; si no, numpy).
+    :fastmath: Si los kernels de Numba se compilan con "fastmath".
+    :return: Objeto del backend.
+    '''
+    if name == "auto":
+        name = "numba" if numba_available() else "numpy"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    key = (name, bool(fastmath) and name == "numba")
+    backend = _backends.get(key)
+    if backend is None:
+        with _lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = _backends[key] = BACKENDS[name](fastmath)
+    return backend
+
+
+def params_backend(params):
+    '''
+    Devuelve el backend de los parámetros de la simulación ("backend" y "fastmath").
+
+    :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+    :return: Objeto del backend.
+    '''
+    if params is None:
+        return get_backend("numpy")
+    return get_backend(params.backend, params.fastmath)
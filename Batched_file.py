@@ -0,0 +1,145 @@
+import numpy as np
+
+from Forces_file import G
+
+# Estados posibles de cada sistema del lote.
+RUNNING, ESCAPED, MERGED = 0, 1, 2
+
+
+def batched_accel(m, pos):
+    '''
+    Computa las aceleraciones de M sistemas independientes de N partículas a la vez, sumando sobre todos
+    los pares de cada sistema con la fórmula de la fuerza gravitacional: F = (-GMm/(r^3))r.
+
+    :m: Masas. Arreglo de numpy de MxN.
+    :pos: Posiciones. Arreglo de numpy de MxNx2.
+    :return: Aceleraciones. Arreglo de numpy de MxNx2.
+    '''
+    # relative_pos[s, i, j] es el vector posición de la partícula j desde la partícula i del sistema s.
+    relative_pos = pos[:, np.newaxis, :, :] - pos[:, :, np.newaxis, :]
+    dist2 = np.einsum("sijk,sijk->sij", relative_pos, relative_pos)
+    # La distancia de cada partícula a sí misma se hace infinita para que no contribuya a la suma.
+    n = pos.shape[1]
+    dist2[:, np.arange(n), np.arange(n)] = np.inf
+    return G * np.einsum("sij,sj,sijk->sik", dist2 ** -1.5, m, relative_pos)
+
+
+class SystemBatch:
+    '''
+    Lote de M sistemas independientes de N partículas cada uno (por ejemplo, miles de experimentos de
+    dispersión de 3 cuerpos), guardados en arreglos de MxN y MxNx2 y avanzados todos a la vez con un
+    paso "leapfrog" vectorizado (patada-deriva-patada), sin ciclos de Python por sistema ni por
+    partícula. Cada sistema deja de avanzar cuando cumple un criterio de escape o de fusión.
+
+    Atributos:
+        m (arreglo de numpy de MxN): Masas.
+        pos (arreglo de numpy de MxNx2): Posiciones.
+        vel (arreglo de numpy de MxNx2): Velocidades.
+        accel (arreglo de numpy de MxNx2): Aceleraciones en el tiempo actual de cada sistema.
+        active (arreglo de numpy de M): Máscara de los sistemas que siguen avanzando.
+        status (arreglo de numpy de M): Estado de cada sistema: RUNNING, ESCAPED o MERGED.
+        time (arreglo de numpy de M): Tiempo simulado de cada sistema.
+        steps (arreglo de numpy de M): Pasos ejecutados por cada sistema.
+        escape_radius (float): Distancia al centro de masa a partir de la cual una partícula no ligada
+        se considera escapada; None para no revisar escapes.
+        merge_radius (float): Distancia entre dos partículas por debajo de la cual se considera que se
+        fusionaron; None para no revisar fusiones.
+
+    Métodos:
+        step(dt): Avanza un intervalo dt todos los sistemas activos.
+        check(): Revisa los criterios de escape y fusión y desactiva los sistemas que los cumplen.
+        run(dt, num_steps, check_every=1): Avanza los sistemas activos varios pasos.
+    '''
+    def __init__(self, m, pos, vel, escape_radius=None, merge_radius=None):
+        self.m = np.array(m, dtype="float64")
+        self.pos = np.array(pos, dtype="float64")
+        self.vel = np.array(vel, dtype="float64")
+        num_systems = self.m.shape[0]
+        self.active = np.ones(num_systems, dtype=bool)
+        self.status = np.full(num_systems, RUNNING, dtype=np.int8)
+        self.time = np.zeros(num_systems)
+        self.steps = np.zeros(num_systems, dtype=np.int64)
+        self.escape_radius = escape_radius
+        self.merge_radius = merge_radius
+        # La aceleración del final de un paso es la del inicio del siguiente, por lo que solo se calcula
+        # una vez por paso.
+        self.accel = batched_accel(self.m, self.pos)
+
+
+    def step(self, dt):
+        '''
+        Avanza un intervalo dt todos los sistemas activos con el método "leapfrog" sincronizado: media
+        patada con la aceleración actual, deriva completa de la posición y media patada con la nueva
+        aceleración.
+
+        :dt: Longitud del intervalo (step size).
+        :return: Número de sistemas avanzados. Entero.
+        '''
+        index = np.flatnonzero(self.active)
+        if len(index) == 0:
+            return 0
+        # Si todos los sistemas están activos se trabaja directamente sobre los arreglos, sin copiar.
+        if len(index) == len(self.active):
+            index = slice(None)
+        m, pos, vel, accel = self.m[index], self.pos[index], self.vel[index], self.accel[index]
+        vel += accel * (dt / 2)
+        pos += vel * dt
+        accel = batched_accel(m, pos)
+        vel += accel * (dt / 2)
+        self.pos[index], self.vel[index], self.accel[index] = pos, vel, accel
+        self.time[index] += dt
+        self.steps[index] += 1
+        return len(m)
+
+
+    def check(self):
+        '''
+        Revisa los criterios de los sistemas activos y desactiva los que los cumplen:
+        - Escape: alguna partícula está más lejos que "escape_radius" del centro de masa de su sistema y
+        su energía relativa al resto del sistema es positiva (no está ligada).
+        - Fusión: algún par de partículas está a una distancia menor que "merge_radius".
+
+        :return: N/A.
+        '''
+        index = np.flatnonzero(self.active)
+        if len(index) == 0:
+            return
+        m, pos, vel = self.m[index], self.pos[index], self.vel[index]
+        if self.merge_radius is not None:
+            relative_pos = pos[:, np.newaxis, :, :] - pos[:, :, np.newaxis, :]
+            dist2 = np.einsum("sijk,sijk->sij", relative_pos, relative_pos)
+            n = pos.shape[1]
+            dist2[:, np.arange(n), np.arange(n)] = np.inf
+            merged = (dist2 < self.merge_radius**2).any(axis=(1, 2))
+            self.status[index[merged]] = MERGED
+        if self.escape_radius is not None:
+            total = m.sum(axis=1, keepdims=True)
+            com_pos = np.einsum("sn,snk->sk", m, pos) / total
+            com_vel = np.einsum("sn,snk->sk", m, vel) / total
+            rel_pos = pos - com_pos[:, np.newaxis, :]
+            rel_vel = vel - com_vel[:, np.newaxis, :]
+            dist = np.sqrt(np.einsum("snk,snk->sn", rel_pos, rel_pos))
+            energy = 0.5 * np.einsum("snk,snk->sn", rel_vel, rel_vel) - G * (total - m) / dist
+            escaped = ((dist > self.escape_radius) & (energy > 0)).any(axis=1)
+            self.status[index[escaped & (self.status[index] == RUNNING)]] = ESCAPED
+        self.active = self.status == RUNNING
+
+
+    def run(self, dt, num_steps, check_every=1):
+        '''
+        Avanza los sistemas activos "num_steps" pasos, revisando los criterios de escape y fusión cada
+        "check_every" pasos. Termina antes si ya no quedan sistemas activos.
+
+        :dt: Longitud del intervalo (step size).
+        :num_steps: Número de pasos. Entero positivo.
+        :check_every: Cada cuántos pasos se revisan los criterios. Entero positivo.
+        :return: Número total de pasos de partícula ejecutados (partículas por pasos). Entero.
+        '''
+        body_steps = 0
+        for k in range(1, num_steps + 1):
+            body_steps += self.step(dt) * self.m.shape[1]
+            if k % check_every == 0:
+                self.check()
+                if not self.active.any():
+                    break
+        return body_steps
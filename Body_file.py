@@ -1,24 +1,360 @@
 import numpy as np
-from numpy.linalg import norm
 
-# Constante gravitacional en Unidades astronómicas, masas solares y años.
-G = 4 * np.pi**2 
+from Backends_file import params_backend
+from Forces_file import G
+from Profiler_file import PROFILER
+
+# Precisiones de las posiciones y velocidades guardadas (y de la trayectoria). Las masas, aceleraciones y
+# potenciales siempre son de doble precisión, de modo que las sumas de la fuerza se acumulan en float64.
+PRECISIONS = ("float64", "float32")
+
+class ParticleStore:
+    '''
+    Almacén de todas las partículas de la simulación como estructura de arreglos: las masas, posiciones,
+    velocidades y aceleraciones de todas las partículas se guardan en arreglos contiguos de numpy, de 
+    modo que cada paso se pueda calcular con operaciones vectorizadas en lugar de ciclos de Python sobre 
+    cada partícula. Los objetos de la clase "Body" son vistas sobre una fila de estos arreglos.
+
+    Los arreglos funcionan como una arena: "m", "pos", "vel" y "accel" son vistas de las primeras N filas
+    de arreglos de reserva con capacidad para más partículas, que se duplica cuando se llena, de modo que
+    agregar partículas cuesta O(1) amortizado en lugar de copiar todos los arreglos cada vez; eliminar
+    una partícula con "swap_remove" mueve la última a su fila, en O(1).
+
+    Atributos:
+        dtype (numpy.dtype): Tipo de dato de las posiciones y velocidades (ver "PRECISIONS").
+        m (arreglo de numpy de N): Masas de las partículas.
+        pos (arreglo de numpy de Nx2): Posiciones de las partículas.
+        vel (arreglo de numpy de Nx2): Velocidades de las partículas.
+        accel (arreglo de numpy de Nx2): Aceleraciones resultantes sobre las partículas.
+        accel_valid (bool): Indica si "accel" corresponde a las posiciones y masas actuales, de modo 
+        que los integradores puedan reutilizarla en lugar de volver a calcularla.
+        potential (arreglo de numpy de N): Potencial gravitacional de las partículas, calculado junto 
+        con las aceleraciones cuando "track_potential" es True (para los diagnósticos).
+        potential_valid (bool): Indica si "potential" se calculó en la última evaluación de la fuerza.
+        track_potential (bool): Si las evaluaciones de la fuerza de todas las partículas también 
+        calculan el potencial.
+        bodies (list): Lista de los objetos "Body" asociados a cada fila, en el mismo orden.
+        capacity (int): Número de partículas que caben en los arreglos de reserva.
+
+    Métodos:
+        append(body, masa, pos0, vel0): Agrega una fila a los arreglos para la partícula "body" y 
+        devuelve su índice.
+        extend(m, pos, vel, colors, names): Agrega varias partículas de una vez y devuelve sus objetos.
+        reserve(size): Garantiza capacidad para "size" partículas.
+        swap_remove(index): Elimina una partícula moviendo la última a su fila.
+        comp_accel(params=None, targets=None): Computa la aceleración resultante de todas las partículas 
+        (o de las indicadas) con el método de fuerza indicado en los parámetros de la simulación (suma 
+        directa por defecto).
+        comp_potential(params=None): Devuelve el potencial de las partículas en las posiciones actuales.
+        kick(dt, params=None): Actualiza la velocidad de todas las partículas con su aceleración.
+        kick_drift(kick, drift, params=None): Actualiza la velocidad y luego la posición de todas las 
+        partículas en una sola operación.
+        compact(keep): Elimina las partículas indicadas, compactando los arreglos.
+        set_precision(dtype): Convierte las posiciones y velocidades al tipo de dato indicado.
+        update_vel(dt, params=None): Actualiza la velocidad de todas las partículas a la mitad del intervalo.
+        update_pos(dt): Actualiza la posición de todas las partículas al final del intervalo.
+        clear(): Borra todas las partículas del almacén.
+    '''
+    def __init__(self, dtype="float64", capacity=16):
+        self.dtype = np.dtype(dtype)
+        self._buffers = {"m": np.zeros(capacity, dtype="float64"),
+                         "pos": np.zeros((capacity, 2), dtype=self.dtype),
+                         "vel": np.zeros((capacity, 2), dtype=self.dtype),
+                         "accel": np.zeros((capacity, 2), dtype="float64")}
+        self._views(0)
+        self.accel_valid = False
+        self.potential = np.zeros(0, dtype="float64")
+        self.potential_valid = False
+        self.track_potential = False
+        self.bodies = []
+
+
+    def __len__(self):
+        return len(self.m)
+
+
+    @property
+    def capacity(self):
+        return len(self._buffers["m"])
+
+
+    def _views(self, size):
+        # Los atributos son vistas de las primeras "size" filas de los arreglos de reserva.
+        for name, buffer in self._buffers.items():
+            setattr(self, name, buffer[:size])
+
+
+    def reserve(self, size):
+        '''
+        Garantiza que los arreglos de reserva tengan capacidad para "size" partículas; si no alcanza, la 
+        capacidad se duplica (o crece hasta "size", si es mayor). Los atributos que se reemplazaron por 
+        arreglos nuevos (como las aceleraciones que devuelve "comp_accel") se copian primero a los 
+        arreglos de reserva.
+
+        :size: Número de partículas. Entero.
+        :return: N/A.
+        '''
+        n = len(self)
+        capacity = self.capacity
+        if size > capacity:
+            capacity = max(size, 2 * capacity)
+        for name, buffer in self._buffers.items():
+            current = getattr(self, name)
+            if capacity > len(buffer):
+                self._buffers[name] = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+                self._buffers[name][:n] = current
+            elif current.base is not buffer:
+                buffer[:n] = current
+
+
+    def append(self, body, masa, pos0, vel0):
+        '''
+        Agrega una fila a los arreglos con los parámetros iniciales de la partícula y registra su 
+        objeto "Body".
+
+        :body: Objeto de la partícula que será la vista de la nueva fila.
+        :masa: Masa de la partícula. Flotante.
+        :pos0: Posición inicial de la partícula. Tupla de R2.
+        :vel0: Velocidad inicial de la partícula. Tupla de R2.
+        :return: Índice de la nueva fila. Entero.
+        '''
+        index = len(self)
+        self.reserve(index + 1)
+        # La fila se escribe en la arena antes de alargar las vistas, de modo que si algún valor no es
+        # válido el almacén queda como estaba.
+        buffers = self._buffers
+        buffers["m"][index] = masa
+        buffers["pos"][index] = pos0
+        buffers["vel"][index] = vel0
+        buffers["accel"][index] = 0.0
+        self._views(index + 1)
+        self.accel_valid = False
+        self.bodies.append(body)
+        return index
+
+
+    def extend(self, m, pos, vel, colors, names):
+        '''
+        Agrega varias partículas de una vez: sus filas se copian a los arreglos con una sola operación 
+        por arreglo y se crean sus objetos "Body", sin agregarlas una a una.
+
+        :m: Masas de las partículas. Arreglo de numpy de K.
+        :pos: Posiciones iniciales. Arreglo de numpy de Kx2.
+        :vel: Velocidades iniciales. Arreglo de numpy de Kx2.
+        :colors: Colores de las partículas. Lista de K cadenas de caracteres.
+        :names: Nombres de las partículas. Lista de K cadenas de caracteres.
+        :return: Lista de los objetos "Body" de las nuevas partículas.
+        '''
+        start = len(self)
+        size = start + len(m)
+        self.reserve(size)
+        # Como en "append", las filas se escriben antes de alargar las vistas.
+        buffers = self._buffers
+        buffers["m"][start:size] = m
+        buffers["pos"][start:size] = pos
+        buffers["vel"][start:size] = vel
+        buffers["accel"][start:size] = 0.0
+        self._views(size)
+        self.accel_valid = False
+        new_bodies = [Body.view(self, index, color, name)
+                      for index, color, name in zip(range(start, size), colors, names)]
+        self.bodies.extend(new_bodies)
+        return new_bodies
+
+
+    def swap_remove(self, index):
+        '''
+        Elimina la partícula de la fila indicada en O(1): la última partícula se mueve a dicha fila (su 
+        objeto "Body" actualiza su índice) y los arreglos se acortan en una fila. Cambia el orden de las 
+        partículas; "compact" conserva el orden, pero copia todas las filas.
+
+        :index: Fila de la partícula. Entero.
+        :return: Objeto "Body" de la partícula eliminada.
+        '''
+        last = len(self) - 1
+        for name in self._buffers:
+            array = getattr(self, name)
+            array[index] = array[last]
+            setattr(self, name, array[:last])
+        removed = self.bodies[index]
+        moved = self.bodies.pop()
+        if moved is not removed:
+            self.bodies[index] = moved
+            moved.index = index
+        self.accel_valid = self.potential_valid = False
+        return removed
+
+
+    def comp_accel(self, params=None, targets=None):
+        '''
+        Computa la aceleración resultante de todas las partículas en el tiempo actual con la fórmula de 
+        la fuerza gravitacional: F = (-GMm/(r^3))r, usando el método de fuerza indicado en los 
+        parámetros de la simulación (suma directa sobre todos los pares, Barnes-Hut o partícula-malla).
+
+        :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+        :targets: Índices de las partículas cuya aceleración se actualiza; si es None se actualizan 
+        todas.
+        :return: Aceleraciones resultantes. Arreglo de numpy de Nx2.
+        '''
+        backend = params_backend(params)
+        with PROFILER.phase("force"):
+            if targets is None and self.track_potential:
+                self.accel, self.potential = backend.compute_accel(self.m, self.pos, params, potential=True)
+                self.accel_valid = self.potential_valid = True
+            elif targets is None:
+                self.accel = backend.compute_accel(self.m, self.pos, params)
+                self.accel_valid = True
+                self.potential_valid = False
+            else:
+                self.accel[targets] = backend.compute_accel(self.m, self.pos, params, targets)
+                self.potential_valid = False
+        PROFILER.count("force_evaluations", len(self.m) if targets is None else len(targets))
+        return self.accel
+
+
+    def comp_potential(self, params=None):
+        '''
+        Devuelve el potencial gravitacional de las partículas en las posiciones actuales. Se reutiliza el
+        de la última evaluación de la fuerza si todavía es válido; si las aceleraciones tampoco lo son, 
+        ambos se calculan en una sola pasada (y el integrador reutiliza las aceleraciones en el siguiente 
+        paso).
+
+        :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+        :return: Potenciales. Arreglo de numpy de N.
+        '''
+        if self.potential_valid and self.accel_valid:
+            return self.potential
+        if not self.accel_valid:
+            tracking, self.track_potential = self.track_potential, True
+            self.comp_accel(params)
+            self.track_potential = tracking
+        else:
+            with PROFILER.phase("force"):
+                self.potential = params_backend(params).compute_accel(self.m, self.pos, params,
+                                                                      potential=True)[1]
+            self.potential_valid = True
+        return self.potential
+
+
+    def compact(self, keep):
+        '''
+        Elimina las partículas cuyo valor en "keep" es False, compactando los arreglos sin cambiar el 
+        orden de las demás, y actualiza el índice de los objetos "Body" que quedan.
+
+        :keep: Máscara de las partículas que se conservan. Arreglo de numpy de N booleanos.
+        :return: N/A.
+        '''
+        size = int(np.count_nonzero(keep))
+        for name, buffer in self._buffers.items():
+            buffer[:size] = getattr(self, name)[keep]
+        self._views(size)
+        self.accel_valid = self.potential_valid = False
+        self.bodies = [body for body, kept in zip(self.bodies, keep) if kept]
+        for index, body in enumerate(self.bodies):
+            body.index = index
+
+
+    def set_precision(self, dtype):
+        '''
+        Convierte las posiciones y velocidades al tipo de dato indicado ("float64" o "float32"). Con 
+        "float32" el estado ocupa la mitad de la memoria y los temporales de la suma directa por bloques 
+        también son de precisión simple, pero las sumas sobre las partículas se acumulan en float64 (los 
+        productos matriz-vector con las masas, que son de doble precisión) y las aceleraciones se guardan 
+        en float64. Las aceleraciones guardadas dejan de ser válidas, ya que las posiciones se redondean.
+
+        :dtype: Tipo de dato. Elemento de "PRECISIONS".
+        :return: N/A.
+        '''
+        if str(dtype) not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {dtype}")
+        self.dtype = np.dtype(dtype)
+        if self.pos.dtype != self.dtype:
+            self.reserve(len(self))
+            for name in ("pos", "vel"):
+                self._buffers[name] = self._buffers[name].astype(self.dtype)
+            self._views(len(self))
+            self.accel_valid = self.potential_valid = False
+
+
+    def kick(self, dt, params=None):
+        '''
+        Patada: actualiza la velocidad de todas las partículas con su aceleración, vel += accel·dt, con 
+        el backend de los parámetros.
+
+        :dt: Longitud de la patada.
+        :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+        :return: N/A.
+        '''
+        params_backend(params).kick(self.vel, self.accel, dt)
+
+
+    def kick_drift(self, kick, drift, params=None):
+        '''
+        Patada seguida de deriva: vel += accel·kick y pos += vel·drift, en una sola operación del backend 
+        de los parámetros (con Numba, una sola pasada por los arreglos sin temporales).
+
+        :kick: Longitud de la patada.
+        :drift: Longitud de la deriva.
+        :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+        :return: N/A.
+        '''
+        params_backend(params).kick_drift(self.pos, self.vel, self.accel, kick, drift)
+        self.accel_valid = self.potential_valid = False
+
+
+    def update_vel(self, dt, params=None):
+        '''
+        Actualiza la velocidad de todas las partículas a la mitad del intervalo actual ejecutando 
+        "comp_accel" para hallar las aceleraciones.
+
+        :dt: Longitud del intervalo (step size).
+        :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+        :return: Velocidades en la mitad del intervalo. Arreglo de numpy de Nx2.
+        '''
+        self.comp_accel(params)
+        self.vel += self.accel * dt / 2.0
+        return self.vel
+
+
+    def update_pos(self, dt):
+        '''
+        Actualiza la posición de todas las partículas al final del intervalo actual con la velocidad en 
+        la mitad.
+
+        :dt: Longitud del intervalo (step size).
+        :return: Posiciones al final del intervalo. Arreglo de numpy de Nx2.
+        '''
+        self.pos += self.vel * dt
+        self.accel_valid = False
+        return self.pos
+
+
+    def clear(self):
+        '''Borra todas las partículas del almacén, conservando la precisión.'''
+        self.__init__(self.dtype)
+
 
 class Body:
     '''
     Clase para cada partícula. Contiene todos los parámetros de cada partícula: masa, posición, velocidad,
-    color y nombre. También contiene las funciones a ejecutar en cada iteración, responsables de actualizar
-    la posición y velocidad inicial usando el método "leapfrog" (que se explica en la función "animate") 
-    con la fórmula de la fuerza gravitacional.
+    color y nombre. La masa, posición, velocidad y aceleración no se guardan en el objeto sino en una fila 
+    del almacén de partículas ("ParticleStore") compartido por toda la simulación; el objeto es una vista 
+    sobre dicha fila. También contiene las funciones responsables de actualizar la posición y velocidad 
+    inicial usando el método "leapfrog" (que se explica en la función "animate") con la fórmula de la 
+    fuerza gravitacional.
 
     Atributos:
         m (float): Masa de la partícula.
-        pos (arreglo de numpy de R2): Posición de la partícula.
-        vel (arreglo de numpy de R2): Velocidad de la partícula.
+        pos (arreglo de numpy de R2): Posición de la partícula (vista sobre el almacén).
+        vel (arreglo de numpy de R2): Velocidad de la partícula (vista sobre el almacén).
         color (string): Representación hexadecimal del color de la partícula.
         r_accel (arreglo de numpy de R2): Aceleración resultante sobre la partícula.
+        store (ParticleStore): Almacén de partículas en el que vive la partícula.
+        index (int): Fila de la partícula en el almacén.
 
     Métodos:
+        view(store, index, color, name="body"): Crea el objeto de una partícula cuya fila ya está en el 
+        almacén.
         comp_accel (bodies): Computa la aceleración resultante de la partícula en el tiempo actual 
         sumando la fuerza causada por cada partícula distinta a la misma con la fórmula de la fuerza
         gravitacional: F = (-GMm/(r^3))r.
@@ -27,31 +363,83 @@ class Body:
         update_pos (dt): Actualiza la posición al final del intervalo actual con la velocidad en la 
         mitad.
     '''
-    def __init__(self, masa, pos0, vel0, color, name="body"):
-        self.m = float(masa)
-        self.pos = np.array(pos0, dtype="float64")
-        self.vel = np.array(vel0, dtype="float64")
+    def __init__(self, masa, pos0, vel0, color, name="body", store=None):
+        # Si no se indica un almacén, la partícula vive en uno propio.
+        self.store = store if store is not None else ParticleStore()
+        self.index = self.store.append(self, masa, pos0, vel0)
         self.color = color
         self.name = str(name)
-        
 
-    def comp_accel(self, particles):
+
+    @classmethod
+    def view(cls, store, index, color, name="body"):
+        '''
+        Crea el objeto de una partícula cuya fila ya está en el almacén (ver "ParticleStore.extend"), 
+        sin agregar otra fila.
+
+        :store: Almacén de partículas.
+        :index: Fila de la partícula en el almacén. Entero.
+        :color: Representación hexadecimal del color de la partícula. Cadena de caracteres.
+        :name: Nombre de la partícula. Cadena de caracteres.
+        :return: Objeto de la partícula (Body).
+        '''
+        body = cls.__new__(cls)
+        body.store = store
+        body.index = index
+        body.color = color
+        body.name = str(name)
+        return body
+
+
+    @property
+    def m(self):
+        return self.store.m[self.index]
+
+    @m.setter
+    def m(self, value):
+        self.store.m[self.index] = value
+        self.store.accel_valid = False
+
+    @property
+    def pos(self):
+        return self.store.pos[self.index]
+
+    @pos.setter
+    def pos(self, value):
+        self.store.pos[self.index] = value
+        self.store.accel_valid = False
+
+    @property
+    def vel(self):
+        return self.store.vel[self.index]
+
+    @vel.setter
+    def vel(self, value):
+        self.store.vel[self.index] = value
+
+    @property
+    def r_accel(self):
+        return self.store.accel[self.index]
+
+
+    def comp_accel(self, particles=None):
         '''
         Computa la aceleración resultante de la partícula en el tiempo actual 
         sumando la fuerza causada por cada partícula distinta a la misma con la fórmula de la fuerza
-        gravitacional: F = (-GMm/(r^3))r.
+        gravitacional: F = (-GMm/(r^3))r. La suma se hace de forma vectorizada sobre todas las 
+        partículas del almacén.
 
-        :particles: Lista de objetos de las partículas en la simulación.
+        :particles: Se conserva por compatibilidad; las partículas consideradas son las del almacén.
         :return: Aceleración resultante. Arreglo de numpy de R2.
         '''
-        self.r_accel = np.array([0.0, 0.0])
-        for body in particles:
-            # Para cada partícula distinta a la misma...
-            if body is not self:
-                # se halla el vector posición de dicha partícula desde la misma...
-                relative_pos = body.pos - self.pos
-                # y se halla la fuerza ejercida por dicha partícula a la misma, sumándose a la resultante.
-                self.r_accel += (G * body.m / norm(relative_pos)**3) * relative_pos
+        store = self.store
+        # Se hallan los vectores posición de todas las partículas desde la misma...
+        relative_pos = store.pos - store.pos[self.index]
+        dist2 = np.einsum("ij,ij->i", relative_pos, relative_pos)
+        # excluyendo a la partícula misma...
+        dist2[self.index] = np.inf
+        # y se suman las fuerzas ejercidas por dichas partículas.
+        store.accel[self.index] = G * ((store.m * dist2 ** -1.5) @ relative_pos)
         return self.r_accel
     
 
@@ -78,4 +466,4 @@ class Body:
         :return: Posición al final del intervalo. Arreglo de numpy de R2.
         '''
         self.pos += self.vel * dt
-        return self.pos
\ No newline at end of file
+        return self.pos
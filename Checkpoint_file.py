@@ -0,0 +1,203 @@
+import json
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+from Diagnostics_file import DIAGNOSTIC_FIELDS
+from Integrator_file import make_integrator
+from Simulation_file import Simulation
+
+# Firma al inicio de cada archivo de punto de control.
+MAGIC = b"NBCKPT01"
+# El encabezado y cada arreglo comienzan en un múltiplo de este tamaño.
+ALIGN = 64
+# Firma (8 bytes), longitud del encabezado (uint64) y suma de verificación CRC32 del JSON (uint32 y 4
+# bytes de relleno).
+PREFIX_SIZE = 24
+
+
+def _aligned(size):
+    return -(-size // ALIGN) * ALIGN
+
+
+def checkpoint_state(simulation):
+    '''
+    Reúne todo el estado de la simulación necesario para continuarla exactamente: los arreglos del
+    almacén de partículas (incluyendo las aceleraciones), los nombres y colores, los parámetros (con el
+    dt corregido y el estado del algoritmo de corrección), el contador de iteraciones, el tiempo, el
+    número de partículas fusionadas, el estado interno del integrador y la serie de los diagnósticos
+    (con las energías de referencia y el número de reducciones del dt).
+
+    :simulation: Simulación (objeto de "Simulation").
+    :return: Tupla (metadatos que se guardan como JSON, diccionario {nombre: arreglo de numpy}).
+    '''
+    store = simulation.store
+    arrays = {"m": store.m, "pos": store.pos, "vel": store.vel, "accel": store.accel}
+    diagnostics = simulation.diagnostics
+    arrays["diagnostics"] = diagnostics.data[:diagnostics.rows]
+    diagnostics_state = {"initial_energy": diagnostics.initial_energy,
+                         "reference_energy": diagnostics.reference_energy,
+                         "tightened": diagnostics.tightened, "precision": diagnostics.precision}
+    integrator_state = {}
+    if simulation.integrator is not None:
+        for name, value in vars(simulation.integrator).items():
+            if isinstance(value, np.ndarray):
+                arrays["integrator." + name] = value
+            else:
+                integrator_state[name] = value.item() if isinstance(value, np.generic) else value
+    metadata = {"version": 1, "frame": simulation.frame, "time": simulation.time, "merged": simulation.merged,
+                "params": vars(simulation.params), "accel_valid": store.accel_valid,
+                "names": [body.name for body in store.bodies],
+                "colors": [body.color for body in store.bodies],
+                "integrator": simulation.integrator_name, "integrator_state": integrator_state,
+                "diagnostics": diagnostics_state}
+    return metadata, arrays
+
+
+def save_checkpoint(simulation, filename):
+    '''
+    Guarda un punto de control de la simulación en un archivo binario: una firma, un encabezado JSON con
+    los metadatos y la lista de arreglos (tipo, forma, posición y suma de verificación CRC32 de cada uno)
+    y los bytes de cada arreglo. La escritura es atómica: se escribe un archivo temporal en el mismo
+    directorio y solo al terminar reemplaza al anterior, de modo que una falla durante la escritura
+    nunca deja un punto de control incompleto.
+
+    :simulation: Simulación (objeto de "Simulation").
+    :filename: Ruta del archivo.
+    :return: N/A.
+    '''
+    metadata, arrays = checkpoint_state(simulation)
+    blocks = []
+    table = []
+    offset = 0
+    for name, array in arrays.items():
+        data = np.ascontiguousarray(array).tobytes()
+        table.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape),
+                      "offset": offset, "nbytes": len(data), "crc32": zlib.crc32(data)})
+        blocks.append(data.ljust(_aligned(len(data)), b"\0"))
+        offset += _aligned(len(data))
+    metadata["arrays"] = table
+    text = json.dumps(metadata).encode("utf-8")
+    header_size = _aligned(PREFIX_SIZE + len(text))
+    prefix = MAGIC + np.uint64(header_size).tobytes() + np.uint32(zlib.crc32(text)).tobytes() + b"\0" * 4
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix=".checkpoint-", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(prefix + text.ljust(header_size - PREFIX_SIZE, b" "))
+            for block in blocks:
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def read_checkpoint(filename):
+    '''
+    Lee un punto de control y verifica su firma y sus sumas de verificación.
+
+    :filename: Ruta del archivo.
+    :return: Tupla (metadatos, diccionario {nombre: arreglo de numpy}).
+    '''
+    with open(filename, "rb") as f:
+        content = f.read()
+    if content[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{filename} is not a checkpoint file")
+    header_size = int(np.frombuffer(content[8:16], dtype=np.uint64)[0])
+    header_crc = int(np.frombuffer(content[16:20], dtype=np.uint32)[0])
+    text = content[PREFIX_SIZE:header_size].rstrip(b" ")
+    if zlib.crc32(text) != header_crc:
+        raise ValueError(f"{filename}: corrupt checkpoint header")
+    metadata = json.loads(text.decode("utf-8"))
+    arrays = {}
+    for entry in metadata["arrays"]:
+        start = header_size + entry["offset"]
+        data = content[start:start + entry["nbytes"]]
+        if len(data) != entry["nbytes"] or zlib.crc32(data) != entry["crc32"]:
+            raise ValueError(f"{filename}: corrupt checkpoint array '{entry['name']}'")
+        arrays[entry["name"]] = np.frombuffer(data, dtype=entry["dtype"]).reshape(entry["shape"]).copy()
+    return metadata, arrays
+
+
+def load_checkpoint(filename, simulation=None):
+    '''
+    Restaura una simulación desde un punto de control, de modo que al continuarla se obtienen
+    exactamente (bit a bit) los mismos resultados que si no se hubiera interrumpido.
+
+    :filename: Ruta del archivo.
+    :simulation: Simulación en la que se restaura el estado (se borran sus partículas); si es None se
+    crea una nueva.
+    :return: La simulación restaurada.
+    '''
+    metadata, arrays = read_checkpoint(filename)
+    if simulation is None:
+        simulation = Simulation()
+    simulation.clear()
+    params = simulation.params
+    for name, value in metadata["params"].items():
+        # Los parámetros que ya no existen se ignoran, para poder leer puntos de control antiguos.
+        if hasattr(params, name):
+            setattr(params, name, value)
+    simulation.store.set_precision(params.precision)
+
+    # Las partículas se restauran de una vez, con una sola copia por arreglo a la arena del almacén.
+    store = simulation.store
+    store.extend(arrays["m"], arrays["pos"], arrays["vel"], metadata["colors"], metadata["names"])
+    store.accel[:] = arrays["accel"]
+    store.accel_valid = metadata["accel_valid"]
+
+    simulation.integrator = None
+    simulation.integrator_name = metadata["integrator"]
+    if simulation.integrator_name is not None:
+        simulation.integrator = make_integrator(simulation.integrator_name)
+        for name, value in metadata["integrator_state"].items():
+            setattr(simulation.integrator, name, value)
+        for name, array in arrays.items():
+            if name.startswith("integrator."):
+                setattr(simulation.integrator, name[len("integrator."):], array)
+    simulation.frame = metadata["frame"]
+    simulation.time = metadata["time"]
+    # Los puntos de control anteriores a las fusiones no tienen el contador.
+    simulation.merged = metadata.get("merged", 0)
+
+    # Con la serie y las energías de referencia, el error de la energía se sigue midiendo desde el inicio
+    # de la corrida y no desde el punto de control.
+    if "diagnostics" in arrays:
+        diagnostics = simulation.diagnostics
+        series = arrays["diagnostics"]
+        diagnostics.data = np.empty((max(diagnostics.capacity, len(series)), len(DIAGNOSTIC_FIELDS)))
+        diagnostics.data[:len(series)] = series
+        diagnostics.rows = len(series)
+        for name, value in metadata["diagnostics"].items():
+            setattr(diagnostics, name, value)
+    return simulation
+
+
+class AutoCheckpoint:
+    '''
+    Guarda un punto de control cada "every" iteraciones, para que una simulación larga pueda continuarse
+    después de una falla. Se llama después de cada paso.
+
+    Atributos:
+        simulation (Simulation): Simulación de la que se guardan los puntos de control.
+        filename (str): Ruta del archivo (se reemplaza en cada punto de control).
+        every (int): Cada cuántas iteraciones se guarda.
+        saved (int): Número de puntos de control guardados.
+    '''
+    def __init__(self, simulation, filename, every):
+        self.simulation = simulation
+        self.filename = str(filename)
+        self.every = max(int(every), 1)
+        self.saved = 0
+
+
+    def __call__(self):
+        if self.simulation.frame % self.every == 0:
+            save_checkpoint(self.simulation, self.filename)
+            self.saved += 1
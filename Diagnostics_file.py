@@ -0,0 +1,171 @@
+import numpy as np
+
+# Columnas de la serie de tiempo de los diagnósticos. "energy_error" es el error relativo de la energía
+# total respecto a la del primer registro.
+DIAGNOSTIC_FIELDS = ("frame", "time", "dt", "kinetic_energy", "potential_energy", "total_energy",
+                     "momentum_x", "momentum_y", "angular_momentum", "energy_error")
+# Acciones cuando el error relativo de la energía supera la tolerancia: "abort" detiene la simulación con
+# un error y "tighten" reduce el dt a la mitad.
+ENERGY_ACTIONS = ("abort", "tighten")
+
+
+class EnergyDriftError(RuntimeError):
+    '''Error que detiene la simulación cuando el error relativo de la energía supera la tolerancia.'''
+
+
+def conserved_quantities(m, pos, vel, potential):
+    '''
+    Calcula las cantidades conservadas del sistema de forma vectorizada: energía cinética, potencial y
+    total, momento lineal y momento angular (componente perpendicular al plano). La energía potencial se
+    obtiene del potencial de cada partícula, calculado en la misma pasada que las aceleraciones. Las
+    posiciones y velocidades en float32 se convierten a float64, de modo que las sumas se acumulan en
+    doble precisión.
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :vel: Velocidades de las partículas. Arreglo de numpy de Nx2.
+    :potential: Potencial gravitacional de cada partícula. Arreglo de numpy de N.
+    :return: Diccionario con los diagnósticos.
+    '''
+    pos, vel = np.asarray(pos, dtype=np.float64), np.asarray(vel, dtype=np.float64)
+    kinetic = 0.5 * float(m @ np.einsum("ij,ij->i", vel, vel))
+    # Cada par aparece en el potencial de sus dos partículas, por lo que se divide entre 2.
+    potential_energy = 0.5 * float(m @ potential)
+    momentum = m @ vel
+    angular = float(m @ (pos[:, 0] * vel[:, 1] - pos[:, 1] * vel[:, 0]))
+    return {"kinetic_energy": kinetic, "potential_energy": potential_energy,
+            "total_energy": kinetic + potential_energy, "momentum_x": float(momentum[0]),
+            "momentum_y": float(momentum[1]), "angular_momentum": angular}
+
+
+class Diagnostics:
+    '''
+    Serie de tiempo de las cantidades conservadas (energía, momento lineal y momento angular) de la
+    simulación, para validar la elección del dt y del épsilon. La simulación registra una fila cada
+    "diagnostics_every" iteraciones; en esas iteraciones el potencial se calcula junto con las
+    aceleraciones, de modo que la energía potencial no requiere otra pasada sobre los pares. Las filas se
+    guardan en un solo arreglo de numpy cuya capacidad se duplica al llenarse.
+
+    Si "energy_tolerance" de los parámetros es mayor que 0 y el error relativo de la energía (respecto al
+    primer registro, o al último ajuste del dt) la supera, se detiene la simulación ("abort") o se reduce
+    el dt a la mitad ("tighten"), según "energy_action".
+
+    Atributos:
+        rows (int): Número de registros.
+        tightened (int): Número de veces que se redujo el dt.
+        precision (str): Precisión de las posiciones y velocidades de la simulación en el último registro
+        ("float64" o "float32"), o None.
+
+    Métodos:
+        record(simulation): Registra el estado actual de la simulación y aplica la tolerancia de energía.
+        series(): Devuelve la serie de tiempo como diccionario {columna: arreglo de numpy}.
+        last(): Devuelve el último registro como diccionario, o None.
+        rebase(simulation): Toma el estado actual como nueva referencia de la energía y lo registra.
+        save(filename): Guarda la serie en un archivo .csv o .npz.
+        reset(): Borra la serie.
+    '''
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.reset()
+
+
+    def __len__(self):
+        return self.rows
+
+
+    def reset(self):
+        '''Borra la serie.'''
+        self.data = np.empty((self.capacity, len(DIAGNOSTIC_FIELDS)))
+        self.rows = 0
+        self.initial_energy = None
+        self.reference_energy = None
+        self.tightened = 0
+        self.precision = None
+
+
+    def record(self, simulation):
+        '''
+        Registra las cantidades conservadas del estado actual de la simulación. El potencial se reutiliza
+        de la última evaluación de la fuerza si corresponde a las posiciones actuales.
+
+        :simulation: Simulación (objeto de "Simulation").
+        :return: Registro. Diccionario con las columnas de "DIAGNOSTIC_FIELDS".
+        '''
+        store, params = simulation.store, simulation.params
+        values = conserved_quantities(store.m, store.pos, store.vel, store.comp_potential(params))
+        energy = values["total_energy"]
+        self.precision = store.dtype.name
+        if self.initial_energy is None:
+            self.initial_energy = self.reference_energy = energy
+        row = {"frame": simulation.frame, "time": simulation.time, "dt": params.dt, **values,
+               "energy_error": _relative_error(energy, self.initial_energy)}
+        if self.rows == len(self.data):
+            self.data = np.concatenate((self.data, np.empty_like(self.data)))
+        self.data[self.rows] = [row[field] for field in DIAGNOSTIC_FIELDS]
+        self.rows += 1
+
+        tolerance = params.energy_tolerance
+        error = _relative_error(energy, self.reference_energy)
+        if tolerance and error > tolerance:
+            if params.energy_action == "tighten":
+                params.user_dt /= 2
+                params.dt = min(params.dt, params.user_dt)
+                self.reference_energy = energy
+                self.tightened += 1
+            else:
+                raise EnergyDriftError(f"relative energy error {error:.3g} exceeds {tolerance:.3g} at "
+                                       f"frame {simulation.frame}")
+        return row
+
+
+    def rebase(self, simulation):
+        '''
+        Toma la energía del estado actual como nueva referencia del error relativo (por ejemplo, después
+        de una fusión de partículas, que no conserva la energía) y registra dicho estado.
+
+        :simulation: Simulación (objeto de "Simulation").
+        :return: Registro. Diccionario con las columnas de "DIAGNOSTIC_FIELDS".
+        '''
+        self.initial_energy = self.reference_energy = None
+        return self.record(simulation)
+
+
+    def series(self):
+        '''
+        Devuelve la serie de tiempo.
+
+        :return: Diccionario {columna de "DIAGNOSTIC_FIELDS": arreglo de numpy}.
+        '''
+        return {field: self.data[:self.rows, k] for k, field in enumerate(DIAGNOSTIC_FIELDS)}
+
+
+    def last(self):
+        '''
+        Devuelve el último registro.
+
+        :return: Diccionario {columna: valor}, o None si no hay registros.
+        '''
+        if self.rows == 0:
+            return None
+        return dict(zip(DIAGNOSTIC_FIELDS, self.data[self.rows - 1].tolist()))
+
+
+    def save(self, filename):
+        '''
+        Guarda la serie de tiempo en un archivo .npz (un arreglo por columna, más "precision") o .csv (con
+        la precisión en una primera línea de comentario, "# precision: float64").
+
+        :filename: Ruta del archivo.
+        :return: N/A.
+        '''
+        if str(filename).lower().endswith(".npz"):
+            np.savez(filename, precision=np.array(self.precision or ""), **self.series())
+        else:
+            header = f"# precision: {self.precision}\n" + ",".join(DIAGNOSTIC_FIELDS)
+            np.savetxt(filename, self.data[:self.rows], delimiter=",", header=header, comments="",
+                       fmt=["%d"] + ["%.17g"] * (len(DIAGNOSTIC_FIELDS) - 1))
+
+
+def _relative_error(energy, reference):
+    # Si la energía de referencia es 0 se usa el error absoluto.
+    return abs(energy - reference) / abs(reference) if reference else abs(energy - reference)
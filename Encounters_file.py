@@ -0,0 +1,115 @@
+import numpy as np
+
+from Profiler_file import PROFILER
+
+# Celdas vecinas que se revisan desde cada celda del mapa espacial: la misma y la mitad de sus 8 vecinas,
+# de modo que cada par de celdas vecinas se revisa una sola vez.
+_HALF_NEIGHBORHOOD = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def find_close_pairs(pos, radius):
+    '''
+    Encuentra todos los pares de partículas a una distancia menor que "radius" con un mapa espacial
+    (spatial hash) de celdas de lado "radius": cada partícula solo se compara con las de su celda y las
+    de las celdas vecinas, en lugar de con todas, por lo que el costo es O(N log N) (por el ordenamiento
+    de las celdas) más el número de candidatos, en vez de O(N^2).
+
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :radius: Distancia de captura. Flotante positivo.
+    :return: Tupla (i, j) de arreglos de índices de numpy con i < j, un elemento por par.
+    '''
+    n = len(pos)
+    if n < 2 or radius <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cell = np.floor((pos - pos.min(axis=0)) / radius).astype(np.int64)
+    # Llave entera de cada celda; la columna se desplaza en 1 y el ancho deja una columna libre a cada
+    # lado, para que las llaves de las celdas vecinas (con columna -1 o +1) no se confundan entre filas.
+    width = int(cell[:, 1].max()) + 3
+    key = cell[:, 0] * width + cell[:, 1] + 1
+    order = np.argsort(key, kind="stable")
+    sorted_keys = key[order]
+
+    pairs_i, pairs_j = [], []
+    for dx, dy in _HALF_NEIGHBORHOOD:
+        neighbor = key + dx * width + dy
+        lo = np.searchsorted(sorted_keys, neighbor, side="left")
+        counts = np.searchsorted(sorted_keys, neighbor, side="right") - lo
+        # Candidatos: cada partícula con todas las partículas de la celda vecina.
+        i = np.repeat(np.arange(n), counts)
+        j = order[np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                                              counts)]
+        if (dx, dy) == (0, 0):
+            i, j = i[i < j], j[i < j]
+        rel = pos[j] - pos[i]
+        close = np.einsum("ij,ij->i", rel, rel) < radius * radius
+        pairs_i.append(i[close])
+        pairs_j.append(j[close])
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def encounter_groups(n, i, j):
+    '''
+    Agrupa las partículas conectadas por pares cercanos (componentes conexas), de modo que si A está cerca
+    de B y B de C, las tres se fusionan juntas.
+
+    :n: Número de partículas. Entero.
+    :i: Primer índice de cada par. Arreglo de numpy.
+    :j: Segundo índice de cada par. Arreglo de numpy.
+    :return: Etiqueta del grupo de cada partícula (el menor índice del grupo). Arreglo de numpy de N.
+    '''
+    labels = np.arange(n)
+    while True:
+        # Cada par toma la menor etiqueta de sus dos partículas, y las etiquetas se acortan apuntando a la
+        # etiqueta de su etiqueta, hasta que no cambian.
+        lowest = np.minimum(labels[i], labels[j])
+        new = labels.copy()
+        np.minimum.at(new, i, lowest)
+        np.minimum.at(new, j, lowest)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def merge_encounters(store, radius):
+    '''
+    Fusiona las partículas que están a menos de la distancia de captura: cada grupo de partículas
+    cercanas se reemplaza por una sola partícula con la masa total, en el centro de masa y con la
+    velocidad del centro de masa, de modo que se conservan la masa y el momento lineal (la fusión es
+    inelástica, por lo que la energía no se conserva). La partícula resultante conserva el nombre y el
+    color de la más masiva del grupo, y las demás se eliminan del almacén, compactando sus arreglos.
+
+    :store: Almacén de partículas (objeto de "ParticleStore").
+    :radius: Distancia de captura. Flotante positivo.
+    :return: Lista de tuplas (partícula resultante, lista de partículas absorbidas), una por fusión.
+    '''
+    i, j = find_close_pairs(store.pos, radius)
+    if len(i) == 0:
+        return []
+    n = len(store)
+    labels = encounter_groups(n, i, j)
+    mass = np.bincount(labels, weights=store.m, minlength=n)
+    sizes = np.bincount(labels, minlength=n)
+    # La partícula que queda de cada grupo es la más masiva (la de menor índice si hay empate).
+    order = np.lexsort((np.arange(n), -store.m, labels))
+    first = np.ones(n, dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    survivors = order[first]
+    survivors = survivors[sizes[labels[survivors]] > 1]
+
+    group = labels[survivors]
+    total = mass[group]
+    for array in (store.pos, store.vel):
+        weighted = np.column_stack([np.bincount(labels, weights=store.m * array[:, k], minlength=n)
+                                    for k in range(2)])
+        array[survivors] = weighted[group] / total[:, np.newaxis]
+    store.m[survivors] = total
+
+    keep = sizes[labels] == 1
+    keep[survivors] = True
+    merged = [(store.bodies[s], [store.bodies[k] for k in np.flatnonzero((labels == g) & ~keep)])
+              for s, g in zip(survivors, group)]
+    store.compact(keep)
+    PROFILER.count("merges", n - len(store))
+    return merged
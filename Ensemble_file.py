@@ -0,0 +1,159 @@
+import csv
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from Diagnostics_file import conserved_quantities
+from Simulation_file import Simulation, load_initial_conditions
+
+
+def load_sweep(filename):
+    '''
+    Carga la especificación de un barrido de un archivo JSON. Ejemplo:
+
+        {"initial_conditions": "condiciones.csv",  (opcional; si no está se usan partículas aleatorias)
+         "random_particles": 50,
+         "steps": 1000,
+         "seeds": [1, 2, 3],
+         "sweep": {"dt": [0.001, 0.0005], "eps": [1.0, 5.0], "correctAlg_enabled": [true, false]}}
+
+    Las llaves de "sweep" son atributos de "SimulationParameters" ("dt" asigna "dt" y "user_dt").
+
+    :filename: Ruta del archivo JSON.
+    :return: Diccionario con la especificación.
+    '''
+    with open(filename) as f:
+        return json.load(f)
+
+
+def expand_sweep(spec):
+    '''
+    Expande la especificación de un barrido en la lista de simulaciones independientes a ejecutar: una
+    por cada combinación (producto cartesiano) de los valores barridos y de las semillas.
+
+    :spec: Diccionario con la especificación del barrido (ver "load_sweep").
+    :return: Lista de diccionarios, uno por simulación, con su identificador "run_id", su semilla
+    "seed", sus parámetros "params" y los datos comunes de la especificación.
+    '''
+    sweep = spec.get("sweep", {})
+    names = list(sweep)
+    runs = []
+    combinations = itertools.product(*(sweep[name] for name in names))
+    for values, seed in itertools.product(list(combinations), spec.get("seeds", [0])):
+        runs.append({"run_id": len(runs), "seed": seed, "params": dict(zip(names, values)),
+                     "initial_conditions": spec.get("initial_conditions"),
+                     "random_particles": spec.get("random_particles", 10),
+                     "steps": spec["steps"]})
+    return runs
+
+
+def summary_diagnostics(simulation):
+    '''
+    Calcula los diagnósticos de resumen del estado actual: energía cinética, potencial y total, momento
+    lineal y momento angular (componente perpendicular al plano).
+
+    :simulation: Simulación (objeto de "Simulation").
+    :return: Diccionario con los diagnósticos.
+    '''
+    store = simulation.store
+    # El potencial se reutiliza de la última evaluación de la fuerza si corresponde al estado actual.
+    return conserved_quantities(store.m, store.pos, store.vel, store.comp_potential(simulation.params))
+
+
+def run_single(run):
+    '''
+    Ejecuta una simulación del barrido de principio a fin. Es la función que ejecuta cada proceso, por lo
+    que solo recibe y devuelve datos que se pueden serializar (pickle).
+
+    :run: Diccionario de la simulación (elemento de la lista de "expand_sweep").
+    :return: Tupla (fila de resultados, estado final), donde el estado final es un diccionario con las
+    masas, posiciones y velocidades finales.
+    '''
+    simulation = Simulation()
+    params = simulation.params
+    for name, value in run["params"].items():
+        if name == "dt":
+            params.user_dt = params.dt = value
+        elif hasattr(params, name):
+            setattr(params, name, value)
+        else:
+            raise ValueError(f"Unknown simulation parameter: {name}")
+    # Cada simulación tiene su propio generador con su semilla, de modo que es reproducible sin importar
+    # en qué proceso o en qué orden se ejecute.
+    rng = random.Random(run["seed"])
+    if run["initial_conditions"]:
+        load_initial_conditions(run["initial_conditions"], simulation)
+    else:
+        simulation.generate_random_particles(run["random_particles"], rng=rng)
+
+    start = time.perf_counter()
+    for _ in range(run["steps"]):
+        simulation.step()
+    row = {"run_id": run["run_id"], "seed": run["seed"], **run["params"],
+           "bodies": len(simulation.store), "steps": simulation.frame, "time": simulation.time,
+           "final_dt": params.dt, "precision": simulation.store.dtype.name,
+           **summary_diagnostics(simulation),
+           "wall_time": time.perf_counter() - start}
+    state = {"m": simulation.store.m.copy(), "pos": simulation.store.pos.copy(),
+             "vel": simulation.store.vel.copy()}
+    return row, state
+
+
+def run_ensemble(spec, workers=None, progress=print):
+    '''
+    Ejecuta todas las simulaciones de un barrido repartiéndolas entre varios procesos
+    (ProcessPoolExecutor) y reúne sus resultados.
+
+    :spec: Diccionario con la especificación del barrido (ver "load_sweep").
+    :workers: Número de procesos; si es None se usan todos los núcleos.
+    :progress: Función que recibe un mensaje de progreso por cada simulación terminada, o None.
+    :return: Tupla (filas de resultados ordenadas por "run_id", diccionario {run_id: estado final}).
+    '''
+    runs = expand_sweep(spec)
+    rows, states = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_single, run) for run in runs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row, state = future.result()
+            rows.append(row)
+            states[row["run_id"]] = state
+            if progress is not None:
+                progress(f"[{done}/{len(runs)}] run {row['run_id']} (seed {row['seed']}) finished in "
+                         f"{row['wall_time']:.2f} s")
+    rows.sort(key=lambda row: row["run_id"])
+    return rows, states
+
+
+def save_results(rows, filename):
+    '''
+    Guarda la tabla de resultados de un barrido en un archivo .csv, una fila por simulación.
+
+    :rows: Filas de resultados (de "run_ensemble").
+    :filename: Ruta del archivo .csv.
+    :return: N/A.
+    '''
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def save_states(states, filename):
+    '''
+    Guarda los estados finales de un barrido en un archivo .npz con los arreglos "run<id>_m",
+    "run<id>_pos" y "run<id>_vel" de cada simulación.
+
+    :states: Diccionario {run_id: estado final} (de "run_ensemble").
+    :filename: Ruta del archivo .npz.
+    :return: N/A.
+    '''
+    arrays = {f"run{run_id}_{name}": array for run_id, state in states.items()
+              for name, array in state.items()}
+    np.savez_compressed(filename, **arrays)
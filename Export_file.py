@@ -0,0 +1,311 @@
+import csv
+import json
+import os
+import threading
+
+import numpy as np
+
+from Profiler_file import PROFILER
+from Simulation_file import STATE_HEADERS
+from Trajectory_file import TrajectoryReader
+
+# Número de cuadros que se leen de la trayectoria (mapeada en memoria) por cada bloque escrito.
+CHUNK_FRAMES = 1024
+# Columnas de la trayectoria en formato largo (una fila por partícula y cuadro) de .csv y .parquet.
+# "segment" es el archivo de la trayectoria (cambia cuando cambia el número de partículas, por ejemplo
+# después de una fusión) y "body" es el índice de la partícula dentro de ese segmento.
+TRAJECTORY_COLUMNS = ["frame", "time", "segment", "body", "pos_x", "pos_y", "vel_x", "vel_y"]
+# Columnas de la tabla de las partículas de cada segmento que acompaña al .csv.
+BODY_COLUMNS = ["segment", "body", "Name", "Mass", "Color"]
+# Formato de los flotantes en .csv según la precisión: el menor número de dígitos que conserva todos los
+# dígitos de cada tipo de dato.
+CSV_FLOAT_FORMATS = {"float64": "%.17g", "float32": "%.9g"}
+
+
+def particle_state(simulation):
+    '''
+    Copia el estado actual de las partículas, para exportarlo mientras la simulación sigue avanzando.
+
+    :simulation: Simulación (objeto de "Simulation").
+    :return: Diccionario con las listas "names" y "colors", los arreglos "m", "pos" y "vel" y la
+    precisión de las posiciones y velocidades, "precision" ("float64" o "float32").
+    '''
+    store = simulation.store
+    return {"names": [body.name for body in store.bodies], "colors": [body.color for body in store.bodies],
+            "m": store.m.copy(), "pos": store.pos.copy(), "vel": store.vel.copy(),
+            "precision": store.dtype.name}
+
+
+def trajectory_chunks(trajectory_files, chunk_frames=CHUNK_FRAMES):
+    '''
+    Recorre los cuadros de los archivos de la trayectoria por bloques, sin cargar ningún archivo completo.
+
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :chunk_frames: Número de cuadros por bloque.
+    :return: Generador de tuplas (índice del archivo, lector, bloque de registros).
+    '''
+    for segment, filename in enumerate(trajectory_files):
+        reader = TrajectoryReader(filename)
+        for start in range(0, len(reader), chunk_frames):
+            yield segment, reader, reader.frames(start, start + chunk_frames)
+
+
+def long_format(chunk, segment=0):
+    '''
+    Convierte un bloque de registros de la trayectoria al formato largo: una fila por partícula y cuadro.
+
+    :chunk: Bloque de registros (arreglo estructurado con "frame", "time", "pos" y "vel").
+    :segment: Índice del archivo de la trayectoria del bloque. Entero.
+    :return: Diccionario {columna de "TRAJECTORY_COLUMNS": arreglo de numpy}.
+    '''
+    n_frames, n_bodies = chunk["pos"].shape[:2]
+    pos = chunk["pos"].reshape(-1, 2)
+    vel = chunk["vel"].reshape(-1, 2)
+    return {"frame": np.repeat(chunk["frame"], n_bodies), "time": np.repeat(chunk["time"], n_bodies),
+            "segment": np.full(n_frames * n_bodies, segment),
+            "body": np.tile(np.arange(n_bodies), n_frames), "pos_x": pos[:, 0], "pos_y": pos[:, 1],
+            "vel_x": vel[:, 0], "vel_y": vel[:, 1]}
+
+
+def frame_headers(names):
+    '''Encabezados de la hoja "Frame Data" para las partículas indicadas.'''
+    headers = ["Frame"]
+    for name in names:
+        headers += [f"{name} PosX", f"{name} PosY", f"{name} VelX", f"{name} VelY"]
+    return headers
+
+
+def export_xlsx(filename, state, trajectory_files):
+    '''
+    Escribe el archivo .xlsx con las dos hojas de la interfaz ("Particle Data" con el estado actual y
+    "Frame Data" con la posición y velocidad de cada partícula en cada cuadro), más la hoja "Metadata"
+    con la precisión y el número de cuadros, en una sola pasada, con el
+    modo de solo escritura de openpyxl: las filas se escriben al archivo a medida que se agregan, en
+    lugar de guardarse todas en memoria, y no se vuelve a abrir el libro.
+
+    :filename: Ruta del archivo .xlsx.
+    :state: Estado actual de las partículas (de "particle_state").
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :return: Número de cuadros escritos. Entero.
+    '''
+    # openpyxl solo se importa al exportar, para que no retrase el inicio del programa.
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    wb = openpyxl.Workbook(write_only=True)
+    border = Border(left=Side(border_style="thin"), right=Side(border_style="thin"),
+                    top=Side(border_style="thin"), bottom=Side(border_style="thin"))
+    center = Alignment(horizontal='center', vertical='center')
+    header_font = Font(bold=True)
+
+    def styled(ws, values, font=None):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.border = border
+            cell.alignment = center
+            if font is not None:
+                cell.font = font
+            cells.append(cell)
+        return cells
+
+    def set_widths(ws, columns):
+        # Con el modo de solo escritura el ancho de las columnas se asigna antes de escribir las filas;
+        # se ajusta al elemento más largo de hasta 15 caracteres, más 2 espacios.
+        for k, column in enumerate(columns, start=1):
+            lengths = [len(str(value)) for value in column if len(str(value)) <= 15]
+            letter = openpyxl.utils.get_column_letter(k)
+            ws.column_dimensions[letter].width = max(lengths, default=0) + 2
+
+    ws = wb.create_sheet("Particle Data")
+    rows = [[name, float(m), float(pos[0]), float(pos[1]), float(vel[0]), float(vel[1]), color]
+            for name, m, pos, vel, color in zip(state["names"], state["m"], state["pos"], state["vel"],
+                                                state["colors"])]
+    set_widths(ws, zip(STATE_HEADERS, *rows))
+    ws.append(styled(ws, STATE_HEADERS, header_font))
+    for row in rows:
+        ws.append(styled(ws, row))
+
+    ws_frames = wb.create_sheet("Frame Data")
+    # El primer segmento es el que tiene más partículas cuando las fusiones las reducen.
+    first_names = TrajectoryReader(trajectory_files[0]).names if trajectory_files else state["names"]
+    set_widths(ws_frames, ([header] for header in frame_headers(first_names)))
+    if not trajectory_files:
+        ws_frames.append(styled(ws_frames, frame_headers(state["names"]), header_font))
+    # Cada cuadro es el número del cuadro seguido de la posición y velocidad de cada partícula. Cada
+    # archivo de la trayectoria (segmento) empieza con una fila de encabezados con los nombres de sus
+    # partículas, ya que el número y el orden de las columnas cambian al agregar o fusionar partículas.
+    frames = 0
+    current = None
+    for segment, reader, chunk in trajectory_chunks(trajectory_files):
+        if segment != current:
+            current = segment
+            ws_frames.append(styled(ws_frames, frame_headers(reader.names), header_font))
+        values = np.concatenate((chunk["pos"], chunk["vel"]), axis=2).reshape(len(chunk), -1)
+        for frame, row in zip(chunk["frame"].tolist(), values.tolist()):
+            ws_frames.append([frame] + row)
+        frames += len(chunk)
+
+    ws_metadata = wb.create_sheet("Metadata")
+    ws_metadata.append(styled(ws_metadata, ["Precision", state["precision"]]))
+    ws_metadata.append(styled(ws_metadata, ["Frames", frames]))
+    wb.save(filename)
+    return frames
+
+
+def export_csv(filename, state, trajectory_files):
+    '''
+    Escribe la trayectoria en un archivo .csv en formato largo (columnas de "TRAJECTORY_COLUMNS", una
+    fila por partícula y cuadro), por bloques y directamente desde los arreglos de la trayectoria. El
+    estado actual de las partículas (con sus nombres, masas y colores) se escribe junto a él, en
+    "<nombre>_particles.csv" con las columnas de "STATE_HEADERS", y las partículas de cada segmento de la
+    trayectoria en "<nombre>_bodies.csv" con las columnas de "BODY_COLUMNS": cada par ("segment", "body")
+    de la trayectoria corresponde a una fila de dicho archivo. La primera línea del archivo de la
+    trayectoria es un comentario con la precisión ("# precision: float64"), que también determina el
+    número de dígitos de las posiciones y velocidades.
+
+    :filename: Ruta del archivo .csv.
+    :state: Estado actual de las partículas (de "particle_state").
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :return: Número de cuadros escritos. Entero.
+    '''
+    stem, extension = os.path.splitext(filename)
+    with open(stem + "_particles" + extension, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(STATE_HEADERS)
+        for name, m, pos, vel, color in zip(state["names"], state["m"], state["pos"], state["vel"],
+                                            state["colors"]):
+            writer.writerow([name, repr(float(m)), repr(float(pos[0])), repr(float(pos[1])),
+                             repr(float(vel[0])), repr(float(vel[1])), color])
+    with open(stem + "_bodies" + extension, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(BODY_COLUMNS)
+        for segment, segment_file in enumerate(trajectory_files):
+            reader = TrajectoryReader(segment_file)
+            for body, (name, m, color) in enumerate(zip(reader.names, reader.masses, reader.colors)):
+                writer.writerow([segment, body, name, repr(float(m)), color])
+    frames = 0
+    digits = CSV_FLOAT_FORMATS[state["precision"]]
+    with open(filename, "w", newline="") as f:
+        f.write(f"# precision: {state['precision']}\n")
+        f.write(",".join(TRAJECTORY_COLUMNS) + "\n")
+        for segment, _, chunk in trajectory_chunks(trajectory_files):
+            columns = long_format(chunk, segment)
+            # El tiempo siempre es de doble precisión.
+            np.savetxt(f, np.column_stack(list(columns.values())), delimiter=",",
+                       fmt=["%d", "%.17g", "%d", "%d"] + [digits] * 4)
+            frames += len(chunk)
+    return frames
+
+
+def export_npz(filename, state, trajectory_files):
+    '''
+    Escribe un archivo .npz (sin comprimir) con el estado actual de las partículas ("names", "colors",
+    "m", "pos", "vel" y "precision") y los arreglos de cada archivo de la trayectoria ("segment<k>_frame",
+    "segment<k>_time", "segment<k>_pos" y "segment<k>_vel"), tomados directamente del mapa en memoria,
+    con los nombres de las partículas de cada uno ("segment<k>_names").
+
+    :filename: Ruta del archivo .npz.
+    :state: Estado actual de las partículas (de "particle_state").
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :return: Número de cuadros escritos. Entero.
+    '''
+    arrays = {"names": np.array(state["names"]), "colors": np.array(state["colors"]),
+              "m": state["m"], "pos": state["pos"], "vel": state["vel"],
+              "precision": np.array(state["precision"])}
+    frames = 0
+    for segment, segment_file in enumerate(trajectory_files):
+        reader = TrajectoryReader(segment_file)
+        records = reader.frames()
+        for field in ("frame", "time", "pos", "vel"):
+            arrays[f"segment{segment}_{field}"] = records[field]
+        arrays[f"segment{segment}_names"] = np.array(reader.names)
+        frames += len(records)
+    np.savez(filename, **arrays)
+    return frames
+
+
+def export_parquet(filename, state, trajectory_files):
+    '''
+    Escribe la trayectoria en un archivo .parquet en formato largo (columnas de "TRAJECTORY_COLUMNS"), un
+    grupo de filas por bloque de cuadros; las posiciones y velocidades tienen la precisión del estado, que
+    también se guarda en los metadatos del esquema ("precision"). Los nombres y colores de las partículas
+    de cada segmento se guardan en los metadatos como listas JSON ("segment_names" y "segment_colors"),
+    de modo que "body" es el índice en la lista de su segmento. Requiere pyarrow, que es opcional.
+
+    :filename: Ruta del archivo .parquet.
+    :state: Estado actual de las partículas (de "particle_state").
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :return: Número de cuadros escritos. Entero.
+    '''
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from None
+    value_type = pa.from_numpy_dtype(np.dtype(state["precision"]))
+    schema = pa.schema([("frame", pa.int64()), ("time", pa.float64()), ("segment", pa.int32()),
+                        ("body", pa.int32())] + [(column, value_type) for column in TRAJECTORY_COLUMNS[4:]])
+    readers = [TrajectoryReader(segment_file) for segment_file in trajectory_files]
+    metadata = {b"names": ",".join(state["names"]).encode("utf-8"),
+                b"colors": ",".join(state["colors"]).encode("utf-8"),
+                b"segment_names": json.dumps([reader.names for reader in readers]).encode("utf-8"),
+                b"segment_colors": json.dumps([reader.colors for reader in readers]).encode("utf-8"),
+                b"precision": state["precision"].encode("utf-8")}
+    frames = 0
+    with pq.ParquetWriter(filename, schema.with_metadata(metadata)) as writer:
+        for segment, _, chunk in trajectory_chunks(trajectory_files):
+            columns = long_format(chunk, segment)
+            writer.write_table(pa.table({name: np.ascontiguousarray(values)
+                                         for name, values in columns.items()}, schema=schema))
+            frames += len(chunk)
+    return frames
+
+
+# Formatos de exportación, según la extensión del archivo.
+EXPORT_FORMATS = {".xlsx": export_xlsx, ".csv": export_csv, ".npz": export_npz,
+                  ".parquet": export_parquet}
+
+
+def export_data(filename, state, trajectory_files):
+    '''
+    Exporta el estado actual y la trayectoria en el formato que indica la extensión del archivo.
+
+    :filename: Ruta del archivo (.xlsx, .csv, .npz o .parquet).
+    :state: Estado actual de las partículas (de "particle_state").
+    :trajectory_files: Rutas de los archivos de la trayectoria, en orden.
+    :return: Número de cuadros escritos. Entero.
+    '''
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {extension}")
+    return EXPORT_FORMATS[extension](filename, state, trajectory_files)
+
+
+class ExportJob(threading.Thread):
+    '''
+    Exporta los datos en un hilo aparte, para no congelar la interfaz mientras se escribe el archivo.
+
+    Atributos:
+        filename (str): Ruta del archivo.
+        frames (int): Número de cuadros escritos, al terminar.
+        error (Exception): Error ocurrido al exportar, o None.
+    '''
+    def __init__(self, filename, state, trajectory_files):
+        super().__init__(name="export", daemon=True)
+        self.filename = str(filename)
+        self.state = state
+        self.trajectory_files = list(trajectory_files)
+        self.frames = 0
+        self.error = None
+
+
+    def run(self):
+        try:
+            with PROFILER.phase("export"):
+                self.frames = export_data(self.filename, self.state, self.trajectory_files)
+            PROFILER.count("frames_exported", self.frames)
+            PROFILER.count("bytes_exported", os.path.getsize(self.filename))
+        except Exception as error:
+            self.error = error
@@ -0,0 +1,445 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Constante gravitacional en Unidades astronómicas, masas solares y años.
+G = 4 * np.pi**2
+
+# Grupos de hilos para el cálculo por bloques, guardados por número de hilos para no crearlos en cada paso.
+_executors = {}
+
+
+def _executor(workers):
+    '''
+    Devuelve el grupo de hilos (ThreadPoolExecutor) con el número de hilos indicado, creándolo la primera
+    vez que se pide.
+
+    :workers: Número de hilos. Entero positivo.
+    :return: Objeto de ThreadPoolExecutor.
+    '''
+    if workers not in _executors:
+        _executors[workers] = ThreadPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+
+def _direct_tile(m, pos, accel, targets, start, stop, potential=None, softening=0.0):
+    '''
+    Computa la aceleración de las partículas targets[start:stop] debida a todas las partículas y la
+    escribe en las filas start..stop-1 de "accel"; si se indica "potential", también escribe el potencial
+    gravitacional de dichas partículas, reutilizando las mismas distancias. Con "softening" > 0 se usa el
+    suavizado de Plummer: r^2 se reemplaza por r^2 + softening^2. Los temporales son de tamaño
+    (stop - start) x N y del tipo de dato de las posiciones (con posiciones en float32, la mitad de la
+    memoria), pero las sumas sobre j se acumulan en float64, ya que las masas son de doble precisión.
+    '''
+    tile_targets = targets[start:stop]
+    # dx[i, j], dy[i, j] son las componentes del vector posición de la partícula j desde la partícula i.
+    dx = pos[np.newaxis, :, 0] - pos[tile_targets, 0, np.newaxis]
+    dy = pos[np.newaxis, :, 1] - pos[tile_targets, 1, np.newaxis]
+    inv_dist3 = dx * dx + dy * dy
+    if softening:
+        inv_dist3 += softening * softening
+    # La distancia de cada partícula a sí misma se hace infinita para que no contribuya a la suma.
+    rows = np.arange(stop - start)
+    inv_dist3[rows, tile_targets] = np.inf
+    if potential is None:
+        inv_dist3 **= -1.5
+    else:
+        # El inverso de la distancia se obtiene como r^2 / r^3, sin otra potencia, y con él el potencial
+        # -G sum_j m_j / r; las aceleraciones quedan idénticas a las calculadas sin el potencial.
+        inv_dist = inv_dist3.copy()
+        inv_dist[rows, tile_targets] = 0.0
+        inv_dist3 **= -1.5
+        inv_dist *= inv_dist3
+        potential[start:stop] = -G * (inv_dist @ m)
+    # Las sumas sobre j se hacen como productos matriz-vector con las masas.
+    accel[start:stop, 0] = G * ((inv_dist3 * dx) @ m)
+    accel[start:stop, 1] = G * ((inv_dist3 * dy) @ m)
+
+
+def direct_accel(m, pos, tile=1024, workers=None, targets=None, potential=False, softening=0.0):
+    '''
+    Computa la aceleración resultante de todas las partículas con la fórmula de la fuerza gravitacional:
+    F = (-GMm/(r^3))r, sumando directamente sobre todos los pares. Las partículas se dividen en bloques
+    ("tiles") de "tile" partículas cuyas aceleraciones se calculan con operaciones vectorizadas de numpy,
+    de modo que la memoria temporal es O(N·tile) en lugar de O(N^2); los bloques se reparten entre
+    varios hilos, lo cual aprovecha varios núcleos porque numpy libera el GIL en dichas operaciones.
+    Su costo es O(N^2).
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :tile: Número de partículas por bloque. Entero positivo.
+    :workers: Número de hilos; si es None se usa el número de núcleos del computador.
+    :targets: Índices de las partículas cuya aceleración se calcula; si es None se calculan todas.
+    :potential: Si es True también se calcula el potencial gravitacional de las partículas en la misma
+    pasada.
+    :softening: Longitud de suavizado de Plummer; 0 para la fuerza sin suavizar.
+    :return: Aceleraciones resultantes de las partículas indicadas. Arreglo de numpy de Nx2. Si
+    "potential" es True, tupla (aceleraciones, potenciales de N).
+    '''
+    targets = np.arange(len(m)) if targets is None else np.asarray(targets)
+    n = len(targets)
+    accel = np.empty((n, 2))
+    phi = np.empty(n) if potential else None
+    workers = workers or os.cpu_count() or 1
+    starts = range(0, n, tile)
+    if workers == 1 or n <= tile:
+        for start in starts:
+            _direct_tile(m, pos, accel, targets, start, min(start + tile, n), phi, softening)
+    else:
+        # Se consume el iterador de resultados para propagar cualquier excepción de los hilos.
+        list(_executor(workers).map(
+            lambda start: _direct_tile(m, pos, accel, targets, start, min(start + tile, n), phi, softening),
+            starts))
+    return (accel, phi) if potential else accel
+
+
+def direct_accel_jerk(m, pos, vel, tile=1024, softening=0.0):
+    '''
+    Computa la aceleración y su derivada temporal (jerk) de todas las partículas en una sola pasada por
+    todos los pares, reutilizando las distancias de la aceleración:
+    a_i = G sum_j m_j r_ij / r^3,  j_i = G sum_j m_j (v_ij / r^3 - 3 (r_ij · v_ij) r_ij / r^5).
+    Con suavizado de Plummer, r^2 se reemplaza por r^2 + softening^2 en ambas sumas. Se calcula por
+    bloques de "tile" partículas para acotar la memoria temporal a O(N·tile).
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :vel: Velocidades de las partículas. Arreglo de numpy de Nx2.
+    :tile: Número de partículas por bloque. Entero positivo.
+    :softening: Longitud de suavizado de Plummer; 0 para la fuerza sin suavizar.
+    :return: Tupla (aceleraciones, jerks). Arreglos de numpy de Nx2.
+    '''
+    n = len(m)
+    accel = np.empty((n, 2))
+    jerk = np.empty((n, 2))
+    for start in range(0, n, tile):
+        stop = min(start + tile, n)
+        dx = pos[np.newaxis, :, 0] - pos[start:stop, 0, np.newaxis]
+        dy = pos[np.newaxis, :, 1] - pos[start:stop, 1, np.newaxis]
+        dvx = vel[np.newaxis, :, 0] - vel[start:stop, 0, np.newaxis]
+        dvy = vel[np.newaxis, :, 1] - vel[start:stop, 1, np.newaxis]
+        inv_dist2 = dx * dx + dy * dy
+        if softening:
+            inv_dist2 += softening * softening
+        inv_dist2[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        inv_dist2 = 1 / inv_dist2
+        inv_dist3 = inv_dist2 * np.sqrt(inv_dist2)
+        # rv = 3 (r · v) / r^2, el factor del término radial del jerk.
+        rv = 3 * (dx * dvx + dy * dvy) * inv_dist2
+        accel[start:stop, 0] = G * ((inv_dist3 * dx) @ m)
+        accel[start:stop, 1] = G * ((inv_dist3 * dy) @ m)
+        jerk[start:stop, 0] = G * ((inv_dist3 * (dvx - rv * dx)) @ m)
+        jerk[start:stop, 1] = G * ((inv_dist3 * (dvy - rv * dy)) @ m)
+    return accel, jerk
+
+
+def build_quadtree(m, pos, max_depth=20):
+    '''
+    Construye el árbol cuaternario (quadtree) de Barnes-Hut de forma vectorizada. Cada nivel l divide
+    la caja raíz en 2^l x 2^l celdas; de cada nivel solo se guardan las celdas no vacías, identificadas
+    por la llave entera (ix << l) | iy, junto con su masa, centro de masa y número de partículas. La
+    construcción se detiene en el primer nivel en que todas las celdas tienen una sola partícula (o en
+    "max_depth" si hay partículas prácticamente coincidentes).
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :max_depth: Profundidad máxima del árbol. Entero entre 1 y 30.
+    :return: Tupla (niveles, tamaño de la caja raíz). Cada nivel es una tupla (llaves, masas, centros
+    de masa, conteos, celda de cada partícula).
+    '''
+    lo = pos.min(axis=0)
+    size = (pos.max(axis=0) - lo).max()
+    # Se agranda un poco la caja para que ninguna partícula quede justo en el borde superior.
+    size = size * (1 + 1e-9) if size > 0 else 1.0
+    scale = 2**max_depth
+    cell_ij = np.minimum(((pos - lo) / size * scale).astype(np.int64), scale - 1)
+
+    levels = []
+    for level in range(max_depth + 1):
+        shift = max_depth - level
+        key = ((cell_ij[:, 0] >> shift) << level) | (cell_ij[:, 1] >> shift)
+        keys, owner, counts = np.unique(key, return_inverse=True, return_counts=True)
+        owner = owner.ravel()
+        mass = np.bincount(owner, weights=m, minlength=len(keys))
+        com = np.empty((len(keys), 2))
+        com[:, 0] = np.bincount(owner, weights=m * pos[:, 0], minlength=len(keys)) / mass
+        com[:, 1] = np.bincount(owner, weights=m * pos[:, 1], minlength=len(keys)) / mass
+        levels.append((keys, mass, com, counts, owner))
+        if counts.max() == 1:
+            break
+    return levels, size
+
+
+def barnes_hut_accel(m, pos, theta=0.5, max_depth=20, block=4096, targets=None, potential=False,
+                     softening=0.0):
+    '''
+    Computa la aceleración resultante de todas las partículas con el algoritmo de Barnes-Hut sobre un
+    árbol cuaternario que se reconstruye en cada llamada. Una celda lejana se aproxima por su masa total
+    en su centro de masa cuando (tamaño de la celda)/(distancia) < theta; si no, se abre y se revisan
+    sus hijas. El recorrido se hace nivel por nivel de forma vectorizada sobre pares (partícula, celda),
+    procesando las partículas en bloques para acotar la memoria. Su costo es O(N log N); con theta = 0
+    se recupera la suma directa.
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :theta: Ángulo de apertura. Flotante no negativo; valores menores son más precisos y más lentos.
+    :max_depth: Profundidad máxima del árbol. Entero.
+    :block: Número de partículas cuyo recorrido se procesa a la vez. Entero positivo.
+    :targets: Índices de las partículas cuya aceleración se calcula; si es None se calculan todas.
+    :potential: Si es True también se calcula el potencial de las partículas con las mismas celdas.
+    :softening: Longitud de suavizado de Plummer (se suma su cuadrado a la distancia al cuadrado de cada
+    interacción); 0 para la fuerza sin suavizar.
+    :return: Aceleraciones resultantes de las partículas indicadas. Arreglo de numpy de Nx2. Si
+    "potential" es True, tupla (aceleraciones, potenciales de N).
+    '''
+    targets = np.arange(len(m)) if targets is None else np.asarray(targets)
+    n = len(targets)
+    accel = np.zeros((n, 2))
+    phi = np.zeros(n) if potential else None
+    if len(m) < 2:
+        return (accel, phi) if potential else accel
+    levels, size = build_quadtree(m, pos, max_depth)
+    depth = len(levels) - 1
+    theta2 = theta**2
+
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        block_targets = targets[rows]
+        # Pares (partícula, celda) por revisar; al inicio cada partícula se compara con la raíz.
+        p = np.arange(len(rows))
+        c = np.zeros(len(rows), dtype=np.int64)
+        for level in range(depth + 1):
+            keys, mass, com, counts, owner = levels[level]
+            body = block_targets[p]
+            rel = com[c] - pos[body]
+            dist2 = np.einsum("ij,ij->i", rel, rel)
+            own = owner[body] == c
+            leaf = (counts[c] == 1) | (level == depth)
+            cell_size = size / 2**level
+            accept = leaf | (~own & (cell_size**2 < theta2 * dist2))
+
+            # Celdas aceptadas que no contienen a la partícula: aproximación por el centro de masa.
+            far = accept & ~own
+            # Hojas que contienen a la partícula junto con otras (solo en la profundidad máxima): se
+            # quita la contribución de la partícula misma del centro de masa de la celda.
+            shared = accept & own & (counts[c] > 1)
+            if shared.any():
+                sb, sc = body[shared], c[shared]
+                rest = mass[sc] - m[sb]
+                rest_com = (mass[sc, None] * com[sc] - m[sb, None] * pos[sb]) / rest[:, None]
+                rel[shared] = rest_com - pos[sb]
+                dist2[shared] = np.einsum("ij,ij->i", rel[shared], rel[shared])
+            contrib = far | (shared & (dist2 > 0))
+            if softening:
+                dist2 += softening * softening
+            factor = np.zeros(len(p))
+            factor[contrib] = G * np.where(shared, mass[c] - m[body], mass[c])[contrib] \
+                * dist2[contrib] ** -1.5
+            accel[rows, 0] += np.bincount(p, weights=factor * rel[:, 0], minlength=len(rows))
+            accel[rows, 1] += np.bincount(p, weights=factor * rel[:, 1], minlength=len(rows))
+            if potential:
+                # -G M / d = -(G M / d^3) d^2 (con d^2 suavizado).
+                phi[rows] -= np.bincount(p, weights=factor * dist2, minlength=len(rows))
+
+            # Las celdas no aceptadas se abren: se buscan sus (hasta 4) hijas no vacías.
+            opened = ~accept
+            if not opened.any() or level == depth:
+                break
+            p, c = p[opened], c[opened]
+            ix = keys[c] >> level
+            iy = keys[c] & ((1 << level) - 1)
+            child_keys = np.concatenate([((2 * ix + a) << (level + 1)) | (2 * iy + b)
+                                         for a in (0, 1) for b in (0, 1)])
+            p = np.tile(p, 4)
+            next_keys = levels[level + 1][0]
+            child = np.minimum(np.searchsorted(next_keys, child_keys), len(next_keys) - 1)
+            exists = next_keys[child] == child_keys
+            p, c = p[exists], child[exists]
+    return (accel, phi) if potential else accel
+
+
+def barnes_hut_error(m, pos, thetas=(0.2, 0.3, 0.5, 0.7, 1.0)):
+    '''
+    Comprueba la precisión de Barnes-Hut frente a la suma directa para distintos ángulos de apertura.
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :thetas: Ángulos de apertura a comprobar. Iterable de flotantes.
+    :return: Diccionario {theta: (error relativo medio, error relativo máximo)} de las aceleraciones.
+    '''
+    reference = direct_accel(m, pos)
+    ref_norm = np.linalg.norm(reference, axis=1)
+    errors = {}
+    for theta in thetas:
+        rel_err = np.linalg.norm(barnes_hut_accel(m, pos, theta) - reference, axis=1) / ref_norm
+        errors[theta] = (float(rel_err.mean()), float(rel_err.max()))
+    return errors
+
+
+# Transformadas de las funciones de Green de la malla para una celda de tamaño 1, guardadas por
+# (tamaño de la malla, frontera aislada); para otro tamaño de celda h basta dividir entre h.
+_pm_green_cache = {}
+
+
+def _pm_green(grid, isolated):
+    '''
+    Devuelve la transformada de Fourier de la función de Green del potencial, -G/r, evaluada en los
+    desplazamientos de la malla para celdas de tamaño 1. Se suaviza a media celda para evitar la
+    singularidad en r = 0. En el modo aislado la malla se duplica en cada eje (relleno con ceros) para que
+    la convolución no sea periódica.
+
+    :grid: Número de celdas por eje de la malla de masa. Entero.
+    :isolated: True para frontera aislada, False para frontera periódica.
+    :return: Transformada real (rfft2) de la función de Green. Arreglo de numpy complejo.
+    '''
+    key = (grid, isolated)
+    if key not in _pm_green_cache:
+        size = 2 * grid if isolated else grid
+        offsets = np.arange(size)
+        # Desplazamientos con signo según el orden de la FFT (positivos y luego negativos).
+        offsets = np.where(offsets < size - size // 2, offsets, offsets - size).astype("float64")
+        dist = np.sqrt(offsets[:, np.newaxis]**2 + offsets[np.newaxis, :]**2 + 0.25)
+        _pm_green_cache[key] = np.fft.rfft2(-G / dist)
+    return _pm_green_cache[key]
+
+
+def wrap_periodic(pos, box):
+    '''
+    Envuelve las posiciones a la caja periódica [-box/2, box/2) de cada eje, en su lugar.
+
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :box: Lado de la caja. Flotante positivo.
+    :return: N/A.
+    '''
+    half = box / 2
+    np.subtract(np.mod(pos + half, box), half, out=pos)
+
+
+def particle_mesh_accel(m, pos, grid=256, isolated=True, potential=False, box=None):
+    '''
+    Computa la aceleración resultante de todas las partículas con el método de partícula-malla (PM):
+    la masa se deposita en una malla 2D con el esquema "cloud in cell" (CIC), el potencial se obtiene
+    resolviendo la ecuación de Poisson como la convolución de la masa con la función de Green -G/r
+    (la misma ley de fuerza de la suma directa) mediante FFTs de numpy, la aceleración de la malla es
+    menos el gradiente del potencial y se interpola de vuelta a las partículas con los mismos pesos CIC.
+    Su costo es O(N + M log M), donde M es el número de celdas. Con frontera aislada la malla cubre la
+    caja que contiene a todas las partículas en el tiempo actual; con frontera periódica cubre la caja
+    fija [-box/2, box/2) de cada eje, y las posiciones fuera de ella cuentan como su imagen dentro de la
+    caja. La resolución de la fuerza es del orden de una celda, por lo que la fuerza ya está suavizada a
+    esa escala y no se aplica el suavizado de Plummer.
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :grid: Número de celdas por eje de la malla. Entero mayor que 2.
+    :isolated: True para frontera aislada (relleno con ceros, sin imágenes periódicas), False para
+    frontera periódica sobre la caja "box".
+    :potential: Si es True también se interpola el potencial de la malla a las partículas, quitando la
+    contribución de cada partícula a sí misma.
+    :box: Lado de la caja periódica, centrada en el origen. Flotante positivo; solo se usa (y se
+    requiere) con frontera periódica.
+    :return: Aceleraciones resultantes. Arreglo de numpy de Nx2. Si "potential" es True, tupla
+    (aceleraciones, potenciales de N).
+    '''
+    if not isolated and (box is None or box <= 0):
+        raise ValueError("The periodic particle-mesh boundary requires a positive box size")
+    n = len(m)
+    if n < 2:
+        return (np.zeros((n, 2)), np.zeros(n)) if potential else np.zeros((n, 2))
+    if isolated:
+        lo = pos.min(axis=0)
+        size = (pos.max(axis=0) - lo).max()
+        if size == 0:
+            size = 1.0
+        # Se deja una celda de margen a cada lado para que los pesos CIC no salgan de la malla.
+        h = size / (grid - 2)
+        lo = lo - h
+    else:
+        # La caja es fija; los índices de las celdas se toman módulo la malla, de modo que las posiciones
+        # fuera de la caja se depositan e interpolan en su imagen periódica.
+        h = box / grid
+        lo = np.full(2, -box / 2)
+
+    # Depósito CIC: cada partícula reparte su masa entre las 4 celdas más cercanas a su posición.
+    x = (pos - lo) / h - 0.5
+    cell = np.floor(x).astype(np.int64)
+    frac = x - cell
+    corners = []
+    for a in (0, 1):
+        for b in (0, 1):
+            weight = (frac[:, 0] if a else 1 - frac[:, 0]) * (frac[:, 1] if b else 1 - frac[:, 1])
+            index = (cell[:, 0] + a) % grid * grid + (cell[:, 1] + b) % grid
+            corners.append((index, weight))
+    mass = np.zeros(grid * grid)
+    for index, weight in corners:
+        mass += np.bincount(index, weights=m * weight, minlength=grid * grid)
+    mass = mass.reshape(grid, grid)
+
+    # Solución de Poisson por convolución con la función de Green en el espacio de Fourier.
+    size_fft = 2 * grid if isolated else grid
+    grid_potential = np.fft.irfft2(np.fft.rfft2(mass, s=(size_fft, size_fft)) * _pm_green(grid, isolated),
+                                   s=(size_fft, size_fft)) / h
+
+    # Aceleración en la malla: menos el gradiente del potencial por diferencias centradas. En el modo
+    # aislado se usa el potencial de toda la malla duplicada, que también es válido fuera de la caja,
+    # para que las celdas del borde usen la misma diferencia centrada (sin fuerza propia espuria).
+    grid_ax = (np.roll(grid_potential, 1, axis=0) - np.roll(grid_potential, -1, axis=0)) / (2 * h)
+    grid_ay = (np.roll(grid_potential, 1, axis=1) - np.roll(grid_potential, -1, axis=1)) / (2 * h)
+    grid_ax, grid_ay = grid_ax[:grid, :grid], grid_ay[:grid, :grid]
+
+    # Interpolación CIC de la aceleración de la malla a las partículas.
+    accel = np.zeros((n, 2))
+    grid_ax, grid_ay = grid_ax.ravel(), grid_ay.ravel()
+    for index, weight in corners:
+        accel[:, 0] += weight * grid_ax[index]
+        accel[:, 1] += weight * grid_ay[index]
+    if not potential:
+        return accel
+
+    # Potencial de las partículas: interpolación CIC del potencial de la malla menos la energía propia de
+    # cada partícula, que es la interacción de sus 4 pesos CIC entre sí a través de la función de Green.
+    grid_phi = grid_potential[:grid, :grid].ravel()
+    phi = np.zeros(n)
+    for index, weight in corners:
+        phi += weight * grid_phi[index]
+    offsets = [(a, b) for a in (0, 1) for b in (0, 1)]
+    for (a1, b1), (_, w1) in zip(offsets, corners):
+        for (a2, b2), (_, w2) in zip(offsets, corners):
+            phi += G * m * w1 * w2 / (h * np.sqrt((a1 - a2)**2 + (b1 - b2)**2 + 0.25))
+    return accel, phi
+
+
+# Métodos de cálculo de la fuerza disponibles, seleccionables con "force_method" de los parámetros de
+# la simulación.
+FORCE_METHODS = ("direct", "barnes_hut", "particle_mesh")
+
+
+def compute_accel(m, pos, params=None, targets=None, potential=False):
+    '''
+    Computa las aceleraciones con el método indicado en los parámetros de la simulación
+    ("force_method"); si no se indican parámetros se usa la suma directa. La suma directa y Barnes-Hut
+    usan el suavizado de Plummer de los parámetros ("softening"). Opcionalmente calcula en la misma
+    pasada el potencial gravitacional de las partículas (para la energía potencial).
+
+    :m: Masas de las partículas. Arreglo de numpy de N.
+    :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+    :params: Parámetros de la simulación (objeto de "SimulationParameters") o None.
+    :targets: Índices de las partículas cuya aceleración se calcula; si es None se calculan todas.
+    :potential: Si es True también se calcula el potencial de las partículas indicadas.
+    :return: Aceleraciones resultantes de las partículas indicadas. Arreglo de numpy de Nx2. Si
+    "potential" es True, tupla (aceleraciones, potenciales).
+    '''
+    method = getattr(params, "force_method", "direct")
+    if method == "direct":
+        if params is None:
+            return direct_accel(m, pos, targets=targets, potential=potential)
+        return direct_accel(m, pos, params.tile_size, params.workers, targets, potential, params.softening)
+    if method == "barnes_hut":
+        return barnes_hut_accel(m, pos, params.theta, targets=targets, potential=potential,
+                                softening=params.softening)
+    if method == "particle_mesh":
+        # La malla se resuelve para todas las partículas; luego se escogen las indicadas.
+        result = particle_mesh_accel(m, pos, params.pm_grid, params.pm_isolated, potential, params.pm_box)
+        if targets is None:
+            return result
+        return (result[0][targets], result[1][targets]) if potential else result[targets]
+    raise ValueError(f"Unknown force method: {method}")
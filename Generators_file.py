@@ -0,0 +1,169 @@
+import string
+
+import numpy as np
+
+from Forces_file import G
+
+# Caracteres de los nombres aleatorios (los mismos de "random_name").
+NAME_CHARACTERS = np.frombuffer((string.ascii_uppercase + string.digits).encode("ascii"), dtype="S1")
+# Radio de corte de la esfera de Plummer, en unidades del radio de escala: fuera de él hay menos del 1.5%
+# de la masa y las partículas quedarían muy alejadas del resto.
+PLUMMER_CUTOFF = 10.0
+
+
+def as_generator(rng=None):
+    '''
+    Convierte el generador de números aleatorios indicado en un generador de numpy ("Generator").
+
+    :rng: Objeto "numpy.random.Generator", semilla entera, None (semilla aleatoria), o el módulo "random"
+    o un objeto "random.Random" (del que se toma una semilla, de modo que el resultado es reproducible).
+    :return: Objeto "numpy.random.Generator".
+    '''
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if hasattr(rng, "getrandbits"):
+        return np.random.default_rng(rng.getrandbits(64))
+    return np.random.default_rng(rng)
+
+
+def random_colors(n, rng):
+    '''
+    Escoge n colores al azar, como "random_color", con una sola llamada al generador.
+
+    :n: Número de colores. Entero.
+    :rng: Generador de numpy.
+    :return: Lista de cadenas de caracteres con la representación hexadecimal de cada color.
+    '''
+    return ['#%06x' % color for color in rng.integers(0, 0xFFFFFF, n, endpoint=True).tolist()]
+
+
+def random_names(n, rng, length=5):
+    '''
+    Genera n nombres aleatorios de letras mayúsculas y números, como "random_name", con una sola llamada
+    al generador: los caracteres de cada nombre son una fila de un arreglo de bytes.
+
+    :n: Número de nombres. Entero.
+    :rng: Generador de numpy.
+    :length: Longitud de cada nombre. Entero positivo.
+    :return: Lista de cadenas de caracteres.
+    '''
+    characters = NAME_CHARACTERS[rng.integers(0, len(NAME_CHARACTERS), (n, length))]
+    return np.ascontiguousarray(characters).view(f"S{length}").ravel().astype(str).tolist()
+
+
+def _isotropic(rng, n):
+    # Direcciones unitarias al azar, distribuidas uniformemente sobre la esfera.
+    cos_theta = rng.uniform(-1, 1, n)
+    sin_theta = np.sqrt(1 - cos_theta**2)
+    phi = rng.uniform(0, 2 * np.pi, n)
+    return np.column_stack((sin_theta * np.cos(phi), sin_theta * np.sin(phi), cos_theta))
+
+
+def uniform_box(n, rng, mass_range=(1.0, 20.0), half_width=10.0, max_speed=10.0):
+    '''
+    Partículas con masa, posición y velocidad uniformes: masas en "mass_range" y cada componente de la
+    posición y de la velocidad entre -half_width y half_width, y entre -max_speed y max_speed. Con los
+    valores por defecto son como las partículas aleatorias de la interfaz.
+
+    :n: Número de partículas. Entero positivo.
+    :rng: Generador de numpy.
+    :mass_range: Masas mínima y máxima. Tupla de flotantes.
+    :half_width: Mitad del lado de la caja de las posiciones. Flotante positivo.
+    :max_speed: Valor máximo de cada componente de la velocidad. Flotante.
+    :return: Tupla (masas, posiciones, velocidades) de arreglos de numpy de N, Nx2 y Nx2.
+    '''
+    m = rng.uniform(mass_range[0], mass_range[1], n)
+    pos = rng.uniform(-half_width, half_width, (n, 2))
+    vel = rng.uniform(-max_speed, max_speed, (n, 2))
+    return m, pos, vel
+
+
+def plummer(n, rng, total_mass=1.0, scale=1.0):
+    '''
+    Esfera de Plummer de partículas de igual masa, proyectada al plano: las posiciones y velocidades se
+    muestrean en 3D (radio a partir de la masa encerrada, M(r)/M = r^3 / (r^2 + a^2)^(3/2), y rapidez por
+    rechazo con la distribución de Aarseth, Hénon y Wielen) y se conservan sus componentes x e y. El radio
+    se corta en "PLUMMER_CUTOFF" veces el radio de escala. El centro de masa queda en reposo en el origen.
+
+    :n: Número de partículas. Entero positivo.
+    :rng: Generador de numpy.
+    :total_mass: Masa total. Flotante positivo.
+    :scale: Radio de escala a de Plummer. Flotante positivo.
+    :return: Tupla (masas, posiciones, velocidades) de arreglos de numpy de N, Nx2 y Nx2.
+    '''
+    m = np.full(n, total_mass / n)
+    # Fracción de la masa encerrada muestreada hasta la del radio de corte, de modo que no hay que repetir
+    # las partículas que quedarían fuera.
+    cutoff = PLUMMER_CUTOFF**3 / (PLUMMER_CUTOFF**2 + 1) ** 1.5
+    enclosed = rng.uniform(0, cutoff, n)
+    r = scale / np.sqrt(enclosed ** (-2 / 3) - 1)
+    pos = r[:, np.newaxis] * _isotropic(rng, n)
+
+    # Rapidez en unidades de la de escape: q con densidad proporcional a q^2 (1 - q^2)^(7/2), cuyo máximo
+    # es menor que 0.1; se repiten solo las muestras rechazadas.
+    q = np.empty(n)
+    pending = np.arange(n)
+    while len(pending):
+        x, y = rng.uniform(0, 1, len(pending)), rng.uniform(0, 0.1, len(pending))
+        accepted = y < x**2 * (1 - x**2) ** 3.5
+        q[pending[accepted]] = x[accepted]
+        pending = pending[~accepted]
+    escape = np.sqrt(2 * G * total_mass / np.sqrt(r**2 + scale**2))
+    vel = (q * escape)[:, np.newaxis] * _isotropic(rng, n)
+
+    pos, vel = pos[:, :2], vel[:, :2]
+    pos -= m @ pos / total_mass
+    vel -= m @ vel / total_mass
+    return m, np.ascontiguousarray(pos), np.ascontiguousarray(vel)
+
+
+def kepler_disk(n, rng, central_mass=1.0, disk_mass=1e-3, r_min=0.5, r_max=5.0):
+    '''
+    Disco kepleriano: una partícula central (la primera) y n - 1 partículas de igual masa en órbitas
+    circulares en sentido antihorario, con densidad superficial uniforme entre "r_min" y "r_max". La
+    rapidez circular usa la masa central más la del disco dentro de cada radio. La partícula central se
+    mueve de modo que el momento lineal total es 0.
+
+    :n: Número de partículas, incluyendo la central. Entero mayor que 1.
+    :rng: Generador de numpy.
+    :central_mass: Masa de la partícula central. Flotante positivo.
+    :disk_mass: Masa total del disco. Flotante.
+    :r_min: Radio interior del disco. Flotante positivo.
+    :r_max: Radio exterior del disco. Flotante mayor que r_min.
+    :return: Tupla (masas, posiciones, velocidades) de arreglos de numpy de N, Nx2 y Nx2.
+    '''
+    k = n - 1
+    area = rng.uniform(0, 1, k)
+    r = np.sqrt(r_min**2 + area * (r_max**2 - r_min**2))
+    angle = rng.uniform(0, 2 * np.pi, k)
+    speed = np.sqrt(G * (central_mass + disk_mass * area) / r)
+
+    m = np.concatenate(([central_mass], np.full(k, disk_mass / max(k, 1))))
+    pos = np.zeros((n, 2))
+    vel = np.zeros((n, 2))
+    pos[1:, 0], pos[1:, 1] = r * np.cos(angle), r * np.sin(angle)
+    vel[1:, 0], vel[1:, 1] = -speed * np.sin(angle), speed * np.cos(angle)
+    vel[0] = -(m[1:] @ vel[1:]) / central_mass
+    return m, pos, vel
+
+
+# Distribuciones de partículas disponibles, según su nombre.
+DISTRIBUTIONS = {"uniform": uniform_box, "plummer": plummer, "kepler_disk": kepler_disk}
+
+
+def generate_particles(n, distribution="uniform", rng=None, **options):
+    '''
+    Genera de una vez las masas, posiciones, velocidades, colores y nombres de n partículas con la
+    distribución indicada, con un generador de numpy ("Generator"), sin ciclos de Python por partícula.
+
+    :n: Número de partículas. Entero positivo.
+    :distribution: Nombre de la distribución (llave de "DISTRIBUTIONS").
+    :rng: Generador de números aleatorios o semilla (ver "as_generator").
+    :options: Parámetros de la distribución.
+    :return: Diccionario con los arreglos "m", "pos" y "vel" y las listas "colors" y "names".
+    '''
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    rng = as_generator(rng)
+    m, pos, vel = DISTRIBUTIONS[distribution](n, rng, **options)
+    return {"m": m, "pos": pos, "vel": vel, "colors": random_colors(n, rng), "names": random_names(n, rng)}
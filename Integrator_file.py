@@ -0,0 +1,239 @@
+import numpy as np
+from numpy.linalg import norm
+
+from Forces_file import direct_accel_jerk
+from Profiler_file import PROFILER
+
+# Coeficientes de los métodos simplécticos de 4° orden (Yoshida 1990; Forest y Ruth 1990), que componen
+# tres subpasos de segundo orden de longitudes w1*dt, w0*dt y w1*dt.
+_CBRT2 = 2 ** (1 / 3)
+W1 = 1 / (2 - _CBRT2)
+W0 = -_CBRT2 / (2 - _CBRT2)
+
+
+class LeapfrogKDK:
+    '''
+    Integrador "leapfrog" sincronizado de segundo orden en la forma patada-deriva-patada (KDK): media
+    patada a la velocidad con la aceleración del inicio del intervalo, deriva completa de la posición con
+    dicha velocidad y media patada con la aceleración del final del intervalo. Todas las partículas se
+    actualizan a la vez, y la aceleración del final de un paso se reutiliza como la del inicio del
+    siguiente, por lo que se hace una sola evaluación de la fuerza por paso.
+
+    Métodos:
+        step(store, dt, params): Avanza todas las partículas del almacén un intervalo dt y devuelve el 
+        intervalo avanzado.
+    '''
+    force_evaluations_per_step = 1
+    adaptive = False
+
+
+    def kick_drift_kick(self, store, dt, params):
+        '''
+        Subpaso KDK de longitud dt; supone que "store.accel" es la aceleración en las posiciones actuales.
+        '''
+        store.kick_drift(dt / 2, dt, params)
+        store.comp_accel(params)
+        store.kick(dt / 2, params)
+
+
+    def step(self, store, dt, params):
+        '''
+        Avanza todas las partículas del almacén un intervalo dt.
+
+        :store: Almacén de partículas (objeto de "ParticleStore").
+        :dt: Longitud del intervalo (step size).
+        :params: Parámetros de la simulación (objeto de "SimulationParameters").
+        :return: Intervalo avanzado (dt).
+        '''
+        # La aceleración guardada solo se recalcula si dejó de ser válida (por ejemplo, al agregar
+        # partículas).
+        if not store.accel_valid:
+            store.comp_accel(params)
+        self.kick_drift_kick(store, dt, params)
+        return dt
+
+
+class Yoshida4(LeapfrogKDK):
+    '''
+    Integrador simpléctico de cuarto orden de Yoshida: composición de tres subpasos KDK de longitudes
+    w1*dt, w0*dt y w1*dt (w0 es negativo). Hace tres evaluaciones de la fuerza por paso, reutilizando la
+    aceleración entre subpasos, pero su error es de cuarto orden, por lo que permite usar un dt mucho
+    mayor para la misma precisión.
+    '''
+    force_evaluations_per_step = 3
+
+
+    def step(self, store, dt, params):
+        if not store.accel_valid:
+            store.comp_accel(params)
+        for weight in (W1, W0, W1):
+            self.kick_drift_kick(store, weight * dt, params)
+        return dt
+
+
+class ForestRuth:
+    '''
+    Integrador simpléctico de cuarto orden de Forest y Ruth en la forma deriva-patada-deriva: cuatro
+    derivas de la posición y tres patadas a la velocidad, con las aceleraciones evaluadas en las
+    posiciones intermedias. Hace tres evaluaciones de la fuerza por paso y no necesita la aceleración
+    del paso anterior.
+    '''
+    force_evaluations_per_step = 3
+    adaptive = False
+
+
+    def step(self, store, dt, params):
+        drifts = (W1 / 2, (W1 + W0) / 2, (W0 + W1) / 2, W1 / 2)
+        kicks = (W1, W0, W1)
+        store.pos += store.vel * (drifts[0] * dt)
+        # Cada patada se hace junto con la deriva siguiente.
+        for k in range(3):
+            store.comp_accel(params)
+            store.kick_drift(kicks[k] * dt, drifts[k + 1] * dt, params)
+        # La aceleración guardada corresponde a una posición intermedia, no a la final.
+        store.accel_valid = False
+        return dt
+
+
+class BlockTimestep:
+    '''
+    Integrador "leapfrog" patada-deriva-patada con intervalos individuales por bloques (potencias de 2):
+    cada partícula tiene un nivel k y avanza con su propio intervalo dt/2^k, de modo que solo las
+    partículas que lo necesitan usan intervalos pequeños. El nivel se escoge con el mismo criterio del
+    algoritmo de corrección, que el cambio de velocidad en un intervalo no supere épsilon:
+    |a| * dt/2^k <= eps, limitado a "max_block_level". En cada subpaso todas las partículas derivan
+    (lo cual es barato), pero solo las partículas activas (cuyo intervalo termina en dicho subpaso)
+    reciben patadas y se les calcula la fuerza, así que en sistemas con pocos encuentros cercanos el
+    número de evaluaciones se reduce en órdenes de magnitud frente a reducir el dt de todo el sistema.
+    Los niveles se reasignan al final de cada intervalo dt, cuando todas las partículas están
+    sincronizadas.
+
+    Atributos:
+        levels (arreglo de numpy de N): Nivel de cada partícula en el último paso.
+        force_evaluations (int): Número total de aceleraciones de partícula calculadas.
+    '''
+    adaptive = True
+
+
+    def __init__(self):
+        self.levels = None
+        self.force_evaluations = 0
+
+
+    def assign_levels(self, store, dt, params):
+        '''
+        Asigna el nivel de cada partícula a partir de su aceleración: el menor k tal que
+        |a| * dt/2^k <= eps.
+
+        :return: Niveles. Arreglo de numpy de enteros de N.
+        '''
+        accel = norm(store.accel, axis=1)
+        with np.errstate(divide="ignore"):
+            ratio = accel * dt / params.eps
+        levels = np.ceil(np.log2(np.maximum(ratio, 1.0)))
+        return np.minimum(levels, params.max_block_level).astype(np.int64)
+
+
+    def step(self, store, dt, params):
+        if not store.accel_valid:
+            store.comp_accel(params)
+            self.force_evaluations += len(store)
+        levels = self.levels = self.assign_levels(store, dt, params)
+        max_level = int(levels.max())
+        # Número de subpasos mínimos (de longitud dt/2^max_level) que dura el intervalo de cada partícula.
+        span = 2 ** (max_level - levels)
+        body_dt = dt / 2.0 ** levels
+        tick_dt = dt / 2 ** max_level
+        for tick in range(2 ** max_level):
+            # Media patada de las partículas cuyo intervalo comienza en este subpaso.
+            starting = np.flatnonzero(tick % span == 0)
+            store.vel[starting] += store.accel[starting] * (body_dt[starting, np.newaxis] / 2)
+            # Deriva de todas las partículas.
+            store.pos += store.vel * tick_dt
+            # Nueva fuerza y media patada de las partículas cuyo intervalo termina en este subpaso.
+            ending = np.flatnonzero((tick + 1) % span == 0)
+            store.comp_accel(params, ending)
+            self.force_evaluations += len(ending)
+            store.vel[ending] += store.accel[ending] * (body_dt[ending, np.newaxis] / 2)
+        # Al final del intervalo todas las partículas terminan su paso con la aceleración actualizada.
+        store.accel_valid = True
+        return dt
+
+
+class Hermite4:
+    '''
+    Integrador predictor-corrector de Hermite de cuarto orden (Makino y Aarseth 1992) con un intervalo
+    compartido por todas las partículas: predice posiciones y velocidades con la aceleración y el jerk
+    (derivada de la aceleración), calcula la aceleración y el jerk en la predicción en una sola pasada
+    vectorizada por todos los pares, y corrige con la interpolación de Hermite. El intervalo se escoge
+    en cada paso con el criterio de Aarseth, dt = eta * sqrt((|a||a2| + |j|^2) / (|j||a3| + |a2|^2)),
+    donde a2 y a3 son la segunda y tercera derivada de la aceleración, tomando el mínimo sobre las
+    partículas y permitiendo que crezca a lo sumo el doble por paso; por ello ignora el dt de los
+    parámetros (salvo como cota del primer intervalo) y el algoritmo de corrección. Usa siempre la suma
+    directa, sin importar "force_method".
+
+    Atributos:
+        jerk (arreglo de numpy de Nx2): Jerk de cada partícula en el tiempo actual.
+        next_dt (float): Intervalo escogido por el criterio de Aarseth para el siguiente paso.
+    '''
+    adaptive = True
+
+
+    def __init__(self):
+        self.jerk = None
+        self.next_dt = None
+
+
+    def step(self, store, dt, params):
+        if not store.accel_valid or self.jerk is None or len(self.jerk) != len(store):
+            store.accel, self.jerk = direct_accel_jerk(store.m, store.pos, store.vel, params.tile_size,
+                                                       params.softening)
+            store.accel_valid = True
+            # Primer intervalo: criterio de inicio de Aarseth, eta_s * |a| / |j| con eta_s = 0.01.
+            with np.errstate(divide="ignore"):
+                start_dt = 0.01 * np.min(norm(store.accel, axis=1) / norm(self.jerk, axis=1))
+            self.next_dt = float(min(dt, start_dt)) if np.isfinite(start_dt) else dt
+        dt = self.next_dt
+        pos0, vel0, accel0, jerk0 = store.pos.copy(), store.vel.copy(), store.accel.copy(), self.jerk
+
+        # Predictor.
+        store.pos += vel0 * dt + accel0 * (dt**2 / 2) + jerk0 * (dt**3 / 6)
+        store.vel += accel0 * dt + jerk0 * (dt**2 / 2)
+        with PROFILER.phase("force"):
+            accel1, jerk1 = direct_accel_jerk(store.m, store.pos, store.vel, params.tile_size,
+                                              params.softening)
+        PROFILER.count("force_evaluations", len(store))
+
+        # Corrector.
+        store.vel[:] = vel0 + (accel0 + accel1) * (dt / 2) + (jerk0 - jerk1) * (dt**2 / 12)
+        store.pos[:] = pos0 + (vel0 + store.vel) * (dt / 2) + (accel0 - accel1) * (dt**2 / 12)
+        store.accel, self.jerk = accel1, jerk1
+
+        # Criterio de Aarseth con las derivadas segunda y tercera de la aceleración al final del paso.
+        snap = (-6 * (accel0 - accel1) - dt * (4 * jerk0 + 2 * jerk1)) / dt**2
+        crackle = (12 * (accel0 - accel1) + 6 * dt * (jerk0 + jerk1)) / dt**3
+        snap = snap + crackle * dt
+        a, j, s, c = (norm(x, axis=1) for x in (accel1, jerk1, snap, crackle))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aarseth = params.hermite_eta * np.sqrt((a * s + j**2) / (j * c + s**2))
+        aarseth = aarseth[np.isfinite(aarseth)]
+        # Como en el algoritmo de corrección, el intervalo es un flotante de Python y no un escalar de numpy.
+        self.next_dt = float(min(aarseth.min(), 2 * dt)) if len(aarseth) else 2 * dt
+        return dt
+
+
+# Integradores disponibles, seleccionables con "integrator" de los parámetros de la simulación.
+INTEGRATORS = {"leapfrog": LeapfrogKDK, "yoshida4": Yoshida4, "forest_ruth": ForestRuth,
+               "block": BlockTimestep, "hermite": Hermite4}
+
+
+def make_integrator(name):
+    '''
+    Crea el integrador con el nombre indicado.
+
+    :name: Nombre del integrador (llave de "INTEGRATORS").
+    :return: Objeto del integrador.
+    '''
+    if name not in INTEGRATORS:
+        raise ValueError(f"Unknown integrator: {name}")
+    return INTEGRATORS[name]()
@@ -0,0 +1,158 @@
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Contexto vacío que se devuelve cuando el perfilador está desactivado, para que medir una fase no cueste
+# más que una llamada.
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    '''Contexto ("with") que mide la duración de una fase y la registra en el perfilador.'''
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    '''
+    Instrumentación liviana de la simulación: cronómetros por fase (cálculo de la fuerza, paso completo,
+    escritura de la trayectoria, dibujo, exportación) y contadores (evaluaciones de la fuerza, pasos,
+    reducciones del dt por el algoritmo de corrección, bytes exportados, etc.). De cada fase se guardan
+    las últimas "window" duraciones para calcular estadísticas recientes, además del total acumulado.
+    Desactivado (por defecto), medir una fase solo cuesta una llamada y contar, una comparación.
+
+    Atributos:
+        enabled (bool): Si se están registrando las mediciones.
+        window (int): Número de duraciones recientes que se guardan de cada fase.
+        phases (dict): {fase: [número de mediciones, tiempo total, deque de duraciones recientes]}.
+        counters (dict): {contador: valor acumulado}.
+
+    Métodos:
+        phase(name): Contexto ("with") que mide la duración de la fase indicada.
+        record(name, seconds): Registra una duración de la fase indicada.
+        count(name, value=1): Suma un valor al contador indicado.
+        stats(): Estadísticas de las fases y valores de los contadores.
+        summary(): Texto corto con las estadísticas, para el panel de estado de la interfaz.
+        dump(filename): Guarda las estadísticas en un archivo .json o .csv.
+        reset(): Borra todas las mediciones.
+    '''
+    def __init__(self, enabled=False, window=200):
+        self.enabled = enabled
+        self.window = window
+        self.reset()
+
+
+    def reset(self):
+        '''Borra todas las mediciones.'''
+        self.phases = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+
+    def phase(self, name):
+        '''
+        Contexto ("with") que mide la duración de la fase indicada.
+
+        :name: Nombre de la fase. Cadena de caracteres.
+        :return: Contexto.
+        '''
+        if not self.enabled:
+            return _DISABLED
+        return _Phase(self, name)
+
+
+    def record(self, name, seconds):
+        '''
+        Registra una duración de la fase indicada.
+
+        :name: Nombre de la fase. Cadena de caracteres.
+        :seconds: Duración en segundos. Flotante.
+        :return: N/A.
+        '''
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = [0, 0.0, deque(maxlen=self.window)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2].append(seconds)
+
+
+    def count(self, name, value=1):
+        '''
+        Suma un valor al contador indicado, si el perfilador está activado.
+
+        :name: Nombre del contador. Cadena de caracteres.
+        :value: Valor a sumar.
+        :return: N/A.
+        '''
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def stats(self):
+        '''
+        Estadísticas de las fases (número de mediciones, tiempo total, y media, mínimo y máximo de las
+        últimas "window" mediciones) y valores de los contadores.
+
+        :return: Diccionario {"elapsed_s": ..., "phases": {fase: {...}}, "counters": {contador: valor}}.
+        '''
+        phases = {}
+        for name, (calls, total, recent) in list(self.phases.items()):
+            recent = list(recent)
+            phases[name] = {"calls": calls, "total_s": total,
+                            "recent_mean_s": sum(recent) / len(recent) if recent else 0.0,
+                            "recent_min_s": min(recent, default=0.0),
+                            "recent_max_s": max(recent, default=0.0)}
+        return {"elapsed_s": time.perf_counter() - self.started, "phases": phases,
+                "counters": dict(self.counters)}
+
+
+    def summary(self):
+        '''
+        Texto corto con la media reciente de cada fase y el valor de cada contador.
+
+        :return: Cadena de caracteres, una línea por fase o contador.
+        '''
+        stats = self.stats()
+        lines = [f"{name}: {phase['recent_mean_s'] * 1e3:.2f} ms ({phase['calls']})"
+                 for name, phase in sorted(stats["phases"].items())]
+        lines += [f"{name}: {value}" for name, value in sorted(stats["counters"].items())]
+        return "\n".join(lines)
+
+
+    def dump(self, filename):
+        '''
+        Guarda las estadísticas en un archivo .json, o .csv con una fila por fase o contador.
+
+        :filename: Ruta del archivo.
+        :return: N/A.
+        '''
+        stats = self.stats()
+        if str(filename).lower().endswith(".csv"):
+            columns = ["kind", "name", "calls", "total_s", "recent_mean_s", "recent_min_s", "recent_max_s",
+                       "value"]
+            with open(filename, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                for name, phase in stats["phases"].items():
+                    writer.writerow({"kind": "phase", "name": name, **phase})
+                for name, value in stats["counters"].items():
+                    writer.writerow({"kind": "counter", "name": name, "value": value})
+        else:
+            with open(filename, "w") as f:
+                json.dump(stats, f, indent=1)
+
+
+# Perfilador compartido por todo el programa (núcleo, hilo de la simulación, interfaz y exportación).
+PROFILER = Profiler()
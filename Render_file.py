@@ -0,0 +1,387 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+
+# Modos de dibujo de la gráfica en vivo (ver "SceneRenderer").
+RENDER_MODES = ("lines", "collection")
+# Las estelas se vuelven a diezmar cuando el tamaño de un pixel cambia por más de este factor (al cambiar
+# los límites de la gráfica); entre tanto, cada punto nuevo se diezma con el tamaño anterior.
+RESOLUTION_FACTOR = 2.0
+
+
+class TrailBuffer:
+    '''
+    Estelas (trayectorias recientes) de todas las partículas para la gráfica, guardadas en un búfer
+    circular de numpy de capacidad fija, de modo que la memoria y el costo por cuadro no crecen con la
+    duración de la simulación. Cada muestra se escribe dos veces (en la posición k y en la k + capacidad)
+    para que la estela de cada partícula sea siempre un tramo contiguo del arreglo, que se puede pasar a
+    "line_obj.set_data" como una vista sin copiar.
+
+    Con una resolución ("set_resolution", el tamaño de un pixel en unidades de los datos) las estelas se
+    diezman para dibujarlas: un punto solo se dibuja si cae en un pixel distinto del punto anterior, de
+    modo que el número de puntos dibujados depende de cuántos pixeles recorre cada estela y no del número
+    de cuadros. La máscara de los puntos que se dibujan se actualiza al agregar cada cuadro, con una sola
+    operación para todas las partículas, y solo se recalcula completa cuando la resolución cambia por más
+    de "RESOLUTION_FACTOR". Los datos completos se conservan en el búfer (y en la trayectoria).
+
+    Atributos:
+        capacity (int): Número máximo de puntos de cada estela.
+        data (arreglo de numpy de Nx2x(2·capacidad)): Coordenadas x (fila 0) e y (fila 1) de cada
+        partícula.
+        counts (arreglo de numpy de N): Número de puntos guardados de cada partícula.
+        appended (int): Número de cuadros agregados.
+        keep (arreglo de numpy de Nx(2·capacidad)): Puntos que se dibujan con el diezmado (booleanos).
+        resolution (arreglo de numpy de R2): Tamaño de un pixel en x y en y con el que se diezman las
+        estelas, o None si no se diezman.
+
+    Métodos:
+        add_body(pos): Agrega la estela de una partícula nueva, con su posición inicial.
+        add_bodies(pos): Agrega de una vez las estelas de varias partículas nuevas.
+        append(pos): Agrega las posiciones actuales de todas las partículas.
+        set_resolution(resolution): Asigna el tamaño de un pixel con el que se diezman las estelas.
+        trail(i): Devuelve las coordenadas x e y de la estela de la partícula i (vistas, o los puntos
+        que se dibujan si se diezma).
+        last(): Devuelve el último punto de cada estela.
+        select(rows): Conserva solo las estelas indicadas, en el orden indicado.
+        clear(): Borra todas las estelas.
+    '''
+    def __init__(self, capacity=500):
+        self.capacity = max(int(capacity), 1)
+        self.clear()
+
+
+    def __len__(self):
+        return len(self.counts)
+
+
+    def clear(self):
+        '''Borra todas las estelas.'''
+        self.data = np.zeros((0, 2, 2 * self.capacity))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.appended = 0
+        self.keep = np.zeros((0, 2 * self.capacity), dtype=bool)
+        self.resolution = None
+
+
+    def add_body(self, pos):
+        '''
+        Agrega la estela de una partícula nueva; su primer punto es su posición inicial, guardado en la
+        posición del último cuadro agregado.
+
+        :pos: Posición inicial de la partícula. Arreglo de R2.
+        :return: N/A.
+        '''
+        self.add_bodies(np.reshape(pos, (1, 2)))
+
+
+    def add_bodies(self, pos):
+        '''
+        Agrega de una vez las estelas de varias partículas nuevas, con una sola copia de los arreglos.
+
+        :pos: Posiciones iniciales de las partículas. Arreglo de numpy de Kx2.
+        :return: N/A.
+        '''
+        rows = np.zeros((len(pos), 2, 2 * self.capacity))
+        keep = np.zeros((len(pos), 2 * self.capacity), dtype=bool)
+        last = (self.appended - 1) % self.capacity
+        rows[:, :, last] = rows[:, :, last + self.capacity] = pos
+        keep[:, last] = keep[:, last + self.capacity] = True
+        self.data = np.concatenate((self.data, rows))
+        self.keep = np.concatenate((self.keep, keep))
+        self.counts = np.concatenate((self.counts, np.ones(len(pos), dtype=np.int64)))
+
+
+    def append(self, pos):
+        '''
+        Agrega las posiciones actuales de todas las partículas a sus estelas.
+
+        :pos: Posiciones de las partículas. Arreglo de numpy de Nx2.
+        :return: N/A.
+        '''
+        slot = self.appended % self.capacity
+        if self.resolution is not None:
+            # Solo se dibujan los puntos que caen en un pixel distinto del punto anterior.
+            previous = self.data[:, :, (self.appended - 1) % self.capacity]
+            moved = (np.floor(pos / self.resolution) != np.floor(previous / self.resolution)).any(axis=1)
+            self.keep[:, slot] = self.keep[:, slot + self.capacity] = moved
+        self.data[:, :, slot] = self.data[:, :, slot + self.capacity] = pos
+        self.appended += 1
+        np.minimum(self.counts + 1, self.capacity, out=self.counts)
+
+
+    def select(self, rows):
+        '''
+        Conserva solo las estelas de las filas indicadas, en ese orden (por ejemplo, después de que se
+        eliminan partículas de la simulación).
+
+        :rows: Filas que se conservan. Arreglo de numpy de enteros.
+        :return: N/A.
+        '''
+        self.data = self.data[rows]
+        self.keep = self.keep[rows]
+        self.counts = self.counts[rows]
+
+
+    def set_resolution(self, resolution):
+        '''
+        Asigna el tamaño de un pixel con el que se diezman las estelas. Si es la primera vez, o si cambió
+        por más de "RESOLUTION_FACTOR" respecto al anterior, se recalcula la máscara de los puntos que se
+        dibujan de todas las estelas, de una vez; si no, se conserva la resolución anterior.
+
+        :resolution: Tamaño de un pixel en x y en y, en unidades de los datos. Tupla de R2, o None para
+        no diezmar.
+        :return: N/A.
+        '''
+        if resolution is None:
+            self.resolution = None
+            return
+        resolution = np.maximum(np.asarray(resolution, dtype=float), np.finfo(float).tiny)
+        if self.resolution is not None:
+            ratio = resolution / self.resolution
+            if np.all((ratio <= RESOLUTION_FACTOR) & (ratio >= 1 / RESOLUTION_FACTOR)):
+                return
+        self.resolution = resolution
+        # Los puntos de todas las estelas en orden, del más antiguo al más reciente.
+        end = (self.appended - 1) % self.capacity + self.capacity + 1
+        cells = np.floor(self.data[:, :, end - self.capacity:end] / resolution[:, np.newaxis])
+        keep = np.ones((len(self), self.capacity), dtype=bool)
+        keep[:, 1:] = (cells[:, :, 1:] != cells[:, :, :-1]).any(axis=1)
+        slots = np.arange(end - self.capacity, end) % self.capacity
+        self.keep[:, slots] = self.keep[:, slots + self.capacity] = keep
+
+
+    def trail(self, i):
+        '''
+        Devuelve la estela de la partícula i, del punto más antiguo al más reciente; si se diezma, solo
+        los puntos que se dibujan.
+
+        :i: Índice de la partícula. Entero.
+        :return: Tupla (x, y) de arreglos de numpy (vistas si no se diezma).
+        '''
+        end = (self.appended - 1) % self.capacity + self.capacity + 1
+        start = end - self.counts[i]
+        if self.resolution is not None:
+            keep = self.keep[i, start:end]
+            return self.data[i, 0, start:end][keep], self.data[i, 1, start:end][keep]
+        return self.data[i, 0, start:end], self.data[i, 1, start:end]
+
+
+    def last(self):
+        '''
+        Devuelve el último punto agregado de cada estela.
+
+        :return: Arreglo de numpy de Nx2.
+        '''
+        return self.data[:, :, (self.appended - 1) % self.capacity].copy()
+
+
+class Extents:
+    '''
+    Extremos (mínimo y máximo en cada eje) de todas las posiciones por las que han pasado las partículas,
+    actualizados en cada cuadro solo con las posiciones actuales, en tiempo O(N) sin importar cuánto ha
+    durado la simulación.
+
+    Atributos:
+        lo (arreglo de numpy de R2): Mínimo de x y de y.
+        hi (arreglo de numpy de R2): Máximo de x y de y.
+
+    Métodos:
+        update(pos): Extiende los extremos con las posiciones indicadas.
+        limits(margin=0.1): Límites de la gráfica con un margen relativo al rango.
+        clear(): Reinicia los extremos.
+    '''
+    def __init__(self):
+        self.clear()
+
+
+    def clear(self):
+        '''Reinicia los extremos.'''
+        self.lo = np.full(2, np.inf)
+        self.hi = np.full(2, -np.inf)
+
+
+    def update(self, pos):
+        '''
+        Extiende los extremos con las posiciones indicadas.
+
+        :pos: Posiciones. Arreglo de numpy de Nx2.
+        :return: N/A.
+        '''
+        if len(pos):
+            np.minimum(self.lo, pos.min(axis=0), out=self.lo)
+            np.maximum(self.hi, pos.max(axis=0), out=self.hi)
+
+
+    def within(self, xlim, ylim):
+        '''
+        Indica si todas las posiciones registradas caben en los límites indicados.
+
+        :xlim: Límites en x. Tupla (xmin, xmax).
+        :ylim: Límites en y. Tupla (ymin, ymax).
+        :return: Booleano.
+        '''
+        return bool(xlim[0] <= self.lo[0] and self.hi[0] <= xlim[1] and
+                    ylim[0] <= self.lo[1] and self.hi[1] <= ylim[1])
+
+
+    def limits(self, margin=0.1):
+        '''
+        Límites de la gráfica: los extremos con un espaciado de "margin" veces el rango en cada eje.
+
+        :margin: Fracción del rango que se deja de espacio a cada lado.
+        :return: Tupla ((xmin, xmax), (ymin, ymax)).
+        '''
+        delta = (self.hi - self.lo) * margin
+        return (self.lo[0] - delta[0], self.hi[0] + delta[0]), (self.lo[1] - delta[1], self.hi[1] + delta[1])
+
+
+class SceneRenderer:
+    '''
+    Objetos gráficos (artists de matplotlib) de las partículas en la gráfica en vivo. Tiene dos modos:
+    - "lines": una curva (ax.plot) por partícula, como en las primeras versiones del programa.
+    - "collection": todas las estelas en un solo LineCollection y las posiciones actuales en un solo
+    scatter, de modo que matplotlib dibuja dos objetos sin importar el número de partículas; es el modo
+    que se usa con "blitting" (solo se redibujan estos objetos sobre un fondo guardado).
+    En ambos modos, las estelas se pueden diezmar al tamaño de un pixel de la gráfica (ver "TrailBuffer"),
+    de modo que el costo de dibujarlas depende de la resolución de la pantalla y no de su longitud.
+
+    Atributos:
+        ax (Axes): La subgráfica de matplotlib en la que se dibujan las partículas.
+        mode (str): Modo de dibujo ("lines" o "collection").
+        decimate (bool): Si las estelas se diezman al tamaño de un pixel.
+        colors (list): Colores de las partículas.
+        lines (list): Curvas de las partículas (modo "lines").
+        collection (LineCollection): Estelas de todas las partículas (modo "collection").
+        scatter (PathCollection): Posiciones actuales de todas las partículas (modo "collection").
+
+    Métodos:
+        add_bodies(colors): Agrega los objetos gráficos de partículas nuevas.
+        select(rows): Conserva solo los objetos gráficos de las partículas indicadas.
+        update(trails, pos): Actualiza los objetos gráficos con las estelas y posiciones actuales.
+        pixel_size(): Tamaño de un pixel de la gráfica en unidades de los datos.
+        artists(): Devuelve la lista de objetos gráficos.
+        set_mode(mode): Cambia el modo de dibujo, recreando los objetos gráficos.
+        reset(): Olvida las partículas y crea objetos vacíos (después de "ax.clear()").
+    '''
+    def __init__(self, ax, mode="lines", decimate=False):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        self.ax = ax
+        self.mode = mode
+        self.decimate = decimate
+        self.colors = []
+        self.build()
+
+
+    def build(self):
+        '''Crea los objetos gráficos del modo actual para las partículas existentes.'''
+        self.lines = []
+        self.collection = self.scatter = None
+        if self.mode == "lines":
+            for color in self.colors:
+                line_obj, = self.ax.plot([], [], color=color, linestyle='-', linewidth=1)
+                self.lines.append(line_obj)
+        else:
+            self.collection = LineCollection([], colors=self.colors, linewidths=1)
+            self.ax.add_collection(self.collection, autolim=False)
+            self.scatter = self.ax.scatter(np.zeros(len(self.colors)), np.zeros(len(self.colors)),
+                                           c=self.colors or None, s=9, zorder=3)
+
+
+    def artists(self):
+        '''Devuelve la lista de objetos gráficos (los que se redibujan en cada cuadro).'''
+        if self.mode == "lines":
+            return list(self.lines)
+        return [self.collection, self.scatter]
+
+
+    def add_bodies(self, colors):
+        '''
+        Agrega los objetos gráficos de partículas nuevas.
+
+        :colors: Colores de las partículas nuevas. Lista de cadenas de caracteres.
+        :return: N/A.
+        '''
+        self.colors += list(colors)
+        if self.mode == "lines":
+            for color in colors:
+                line_obj, = self.ax.plot([], [], color=color, linestyle='-', linewidth=1)
+                self.lines.append(line_obj)
+        else:
+            self.collection.set_colors(self.colors)
+            self.scatter.set_facecolors(self.colors)
+            self.scatter.set_edgecolors(self.colors)
+
+
+    def select(self, rows):
+        '''
+        Conserva solo los objetos gráficos de las partículas de las filas indicadas, en ese orden, y
+        elimina los demás de la gráfica.
+
+        :rows: Filas que se conservan. Iterable de enteros.
+        :return: N/A.
+        '''
+        rows = [int(row) for row in rows]
+        self.colors = [self.colors[row] for row in rows]
+        if self.mode == "lines":
+            kept = set(rows)
+            for row, line_obj in enumerate(self.lines):
+                if row not in kept:
+                    line_obj.remove()
+            self.lines = [self.lines[row] for row in rows]
+        else:
+            self.collection.set_colors(self.colors)
+            self.scatter.set_facecolors(self.colors)
+            self.scatter.set_edgecolors(self.colors)
+
+
+    def pixel_size(self):
+        '''
+        Tamaño de un pixel de la gráfica en unidades de los datos, según los límites actuales y el tamaño
+        de la subgráfica en la pantalla.
+
+        :return: Tupla (ancho, alto) de un pixel.
+        '''
+        box = self.ax.get_window_extent()
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        return abs(x1 - x0) / max(box.width, 1.0), abs(y1 - y0) / max(box.height, 1.0)
+
+
+    def update(self, trails, pos):
+        '''
+        Actualiza los objetos gráficos con las estelas y las posiciones actuales de las partículas; si
+        "decimate" es True, las estelas se diezman al tamaño de un pixel.
+
+        :trails: Estelas de las partículas (objeto de "TrailBuffer").
+        :pos: Posiciones actuales. Arreglo de numpy de Nx2.
+        :return: Lista de objetos gráficos actualizados.
+        '''
+        trails.set_resolution(self.pixel_size() if self.decimate else None)
+        if self.mode == "lines":
+            # Cada estela es una vista del búfer, sin copiar.
+            for i, line_obj in enumerate(self.lines):
+                line_obj.set_data(*trails.trail(i))
+        else:
+            self.collection.set_segments([np.column_stack(trails.trail(i)) for i in range(len(trails))])
+            self.scatter.set_offsets(pos)
+        return self.artists()
+
+
+    def set_mode(self, mode):
+        '''
+        Cambia el modo de dibujo, eliminando los objetos gráficos actuales y creando los del nuevo modo.
+
+        :mode: Modo de dibujo ("lines" o "collection").
+        :return: N/A.
+        '''
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        for artist in self.artists():
+            artist.remove()
+        self.mode = mode
+        self.build()
+
+
+    def reset(self):
+        '''Olvida las partículas y crea objetos gráficos vacíos; se usa después de "ax.clear()".'''
+        self.colors = []
+        self.build()
@@ -0,0 +1,311 @@
+'''
+Reproducción de trayectorias grabadas: carga los archivos de la trayectoria (de la interfaz o de
+"batch.py run --trajectory") mapeándolos en memoria y permite ir a cualquier cuadro, o reproducirlos hacia
+adelante o hacia atrás a cualquier velocidad, sin volver a calcular las fuerzas.
+
+Uso:
+    python Replay_file.py corrida.traj
+    python Replay_file.py segmento1.traj segmento2.traj --trail-length 2000
+'''
+import argparse
+import sys
+
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from Trajectory_file import TrajectoryReader
+
+# Número máximo de puntos de cada estela dibujada: las estelas más largas se toman cada cierto número de
+# cuadros, de modo que el costo de dibujar no depende de su longitud.
+MAX_TRAIL_POINTS = 1000
+# Número de cuadros que se leen para estimar los límites de la gráfica de cada segmento.
+LIMIT_SAMPLES = 1000
+# Velocidades de reproducción que ofrece la interfaz, en cuadros de la trayectoria por cuadro dibujado.
+SPEEDS = (0.25, 0.5, 1, 2, 5, 10, 50, 100)
+
+
+class TrajectoryReplay:
+    '''
+    Recorre los cuadros de uno o varios archivos de la trayectoria (segmentos, por ejemplo antes y después
+    de agregar o fusionar partículas) como una sola secuencia. Los archivos se mapean en memoria, de modo
+    que ir a cualquier cuadro cuesta O(1) (solo se lee ese cuadro) sin importar la duración de la
+    simulación, y no se evalúa la física.
+
+    Atributos:
+        readers (list): Lectores de los segmentos (objetos de "TrajectoryReader") que tienen cuadros.
+        offsets (arreglo de numpy): Índice global del primer cuadro de cada segmento, más el total.
+        position (float): Posición actual en la secuencia (puede ser fraccionaria con velocidades menores
+        que 1).
+        speed (float): Cuadros que avanza "advance"; negativa para reproducir hacia atrás.
+
+    Métodos:
+        seek(index): Va al cuadro indicado.
+        advance(): Avanza "speed" cuadros y devuelve si aún no se llegó a un extremo.
+        current(): Estado del cuadro actual.
+        trails(length): Posiciones de los últimos "length" cuadros del segmento actual.
+        limits(segment, margin=0.1): Límites de la gráfica de un segmento.
+        close(): Libera los mapas en memoria.
+    '''
+    def __init__(self, trajectory_files):
+        self.readers = [reader for reader in map(TrajectoryReader, trajectory_files) if len(reader)]
+        self.offsets = np.cumsum([0] + [len(reader) for reader in self.readers])
+        self.position = 0.0
+        self.speed = 1.0
+
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+
+    @property
+    def index(self):
+        return int(self.position)
+
+
+    def locate(self, index):
+        '''
+        Segmento y cuadro dentro del segmento de un índice global.
+
+        :index: Índice global del cuadro. Entero.
+        :return: Tupla (número del segmento, índice del cuadro en el segmento).
+        '''
+        segment = int(np.searchsorted(self.offsets, index, side="right")) - 1
+        return segment, index - int(self.offsets[segment])
+
+
+    def seek(self, index):
+        '''
+        Va al cuadro indicado (limitado al rango de la secuencia).
+
+        :index: Índice global del cuadro. Entero.
+        :return: Estado del cuadro (ver "current").
+        '''
+        self.position = float(min(max(int(index), 0), len(self) - 1))
+        return self.current()
+
+
+    def advance(self):
+        '''
+        Avanza "speed" cuadros (retrocede si es negativa), deteniéndose en los extremos.
+
+        :return: False si se llegó al primer o último cuadro en la dirección de la reproducción; si no,
+        True.
+        '''
+        self.position = min(max(self.position + self.speed, 0.0), len(self) - 1.0)
+        return 0.0 < self.position < len(self) - 1 or self.speed == 0
+
+
+    def current(self):
+        '''
+        Estado del cuadro actual.
+
+        :return: Diccionario con el índice global ("index"), el segmento ("segment"), el número de
+        iteración ("frame"), el tiempo ("time"), las posiciones y velocidades ("pos" y "vel", vistas del
+        mapa en memoria) y los nombres y colores de las partículas del segmento.
+        '''
+        segment, local = self.locate(self.index)
+        reader = self.readers[segment]
+        record = reader.records[local]
+        return {"index": self.index, "segment": segment, "frame": int(record["frame"]),
+                "time": float(record["time"]), "pos": record["pos"], "vel": record["vel"],
+                "names": reader.names, "colors": reader.colors}
+
+
+    def trails(self, length, max_points=MAX_TRAIL_POINTS):
+        '''
+        Posiciones de los últimos "length" cuadros del segmento actual, hasta el cuadro actual, tomadas
+        cada cierto número de cuadros para no pasar de "max_points" puntos por partícula (el cuadro actual
+        siempre se incluye).
+
+        :length: Número de cuadros de las estelas. Entero positivo.
+        :max_points: Número máximo de puntos por partícula. Entero positivo.
+        :return: Arreglo de numpy de forma (N, puntos, 2), una estela por partícula.
+        '''
+        segment, local = self.locate(self.index)
+        step = max(-(-length // max_points), 1)
+        start = max(local - length + 1, 0)
+        # El rango se alinea al cuadro actual, para que sea el último punto de cada estela.
+        start += (local - start) % step
+        window = self.readers[segment].positions(start, local + 1, step)
+        return np.swapaxes(window, 0, 1)
+
+
+    def limits(self, segment, margin=0.1):
+        '''
+        Límites de la gráfica de un segmento, estimados con a lo sumo "LIMIT_SAMPLES" cuadros repartidos
+        a lo largo del segmento, con un espaciado de "margin" veces el rango en cada eje.
+
+        :segment: Número del segmento. Entero.
+        :margin: Fracción del rango que se deja de espacio a cada lado.
+        :return: Tupla ((xmin, xmax), (ymin, ymax)).
+        '''
+        reader = self.readers[segment]
+        step = max(len(reader) // LIMIT_SAMPLES, 1)
+        pos = np.asarray(reader.positions(0, None, step)).reshape(-1, 2)
+        lo, hi = pos.min(axis=0), pos.max(axis=0)
+        delta = np.maximum((hi - lo) * margin, 1e-12)
+        lo, hi = (lo - delta).tolist(), (hi + delta).tolist()
+        return (lo[0], hi[0]), (lo[1], hi[1])
+
+
+    def close(self):
+        '''Libera los mapas en memoria de los archivos (por ejemplo, antes de borrarlos).'''
+        self.readers = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+
+class ReplayWindow:
+    '''
+    Ventana de reproducción de una trayectoria grabada: una gráfica con las estelas y posiciones de las
+    partículas (un solo LineCollection y un solo scatter), un deslizador para ir a cualquier cuadro y
+    botones para reproducir hacia adelante o hacia atrás a la velocidad escogida. Solo lee los cuadros que
+    se dibujan de los archivos mapeados en memoria.
+
+    Atributos:
+        replay (TrajectoryReplay): Secuencia de cuadros que se reproduce.
+        trail_length (int): Número de cuadros de las estelas.
+        interval (int): Milisegundos entre cada cuadro dibujado.
+        playing (bool): Si se está reproduciendo.
+
+    Métodos:
+        draw(): Dibuja el cuadro actual.
+        play(direction): Reproduce hacia adelante (1) o hacia atrás (-1).
+        pause(): Detiene la reproducción.
+        close(): Cierra la ventana y libera los archivos.
+    '''
+    def __init__(self, replay, master=None, trail_length=500, interval=50):
+        # La interfaz solo se importa al abrir la ventana, para que la reproducción se pueda usar sin ella.
+        import tkinter as tk
+        from tkinter import ttk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        self.replay = replay
+        self.trail_length = max(int(trail_length), 1)
+        self.interval = interval
+        self.playing = False
+        self.segment = None
+        self.window = tk.Toplevel(master) if master is not None else tk.Tk()
+        self.window.title("Replay")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.fig = Figure(figsize=(7, 6))
+        self.ax = self.fig.add_subplot()
+        self.ax.grid(True)
+        self.collection = LineCollection([], linewidths=1)
+        self.ax.add_collection(self.collection, autolim=False)
+        self.scatter = self.ax.scatter([], [], s=9, zorder=3)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.canvas.get_tk_widget().grid(row=0, column=0, columnspan=6, sticky="NSEW")
+
+        controls = ttk.Frame(self.window)
+        controls.grid(row=1, column=0, columnspan=6, sticky="EW", padx=10, pady=5)
+        ttk.Button(controls, text="◀ Play", command=lambda: self.play(-1)).grid(row=0, column=0)
+        ttk.Button(controls, text="Pause", command=self.pause).grid(row=0, column=1)
+        ttk.Button(controls, text="Play ▶", command=lambda: self.play(1)).grid(row=0, column=2)
+        ttk.Label(controls, text="Speed:").grid(row=0, column=3, padx=(10, 0))
+        self.speed_var = tk.StringVar(value="1")
+        ttk.Combobox(controls, textvariable=self.speed_var, values=[str(speed) for speed in SPEEDS],
+                     width=6).grid(row=0, column=4)
+        self.status_label = ttk.Label(controls, text="")
+        self.status_label.grid(row=0, column=5, padx=10)
+        self.slider = tk.Scale(self.window, from_=0, to=max(len(replay) - 1, 0), orient="horizontal",
+                               showvalue=False, command=self.on_slide)
+        self.slider.grid(row=2, column=0, columnspan=6, sticky="EW", padx=10)
+        self.window.grid_rowconfigure(0, weight=1)
+        self.window.grid_columnconfigure(0, weight=1)
+
+        if len(replay):
+            self.draw()
+        self.after_id = self.window.after(self.interval, self.tick)
+
+
+    def speed(self):
+        # Velocidad escogida en cuadros de la trayectoria por cuadro dibujado; 1 si no es un número válido.
+        try:
+            return abs(float(self.speed_var.get())) or 1.0
+        except ValueError:
+            return 1.0
+
+
+    def play(self, direction):
+        '''
+        Reproduce hacia adelante (1) o hacia atrás (-1) a la velocidad escogida.
+
+        :direction: 1 o -1.
+        :return: N/A.
+        '''
+        if len(self.replay):
+            self.playing = True
+            self.replay.speed = direction * self.speed()
+
+
+    def pause(self):
+        '''Detiene la reproducción.'''
+        self.playing = False
+
+
+    def on_slide(self, value):
+        # El deslizador también llama a esta función cuando se mueve desde "tick", al cuadro que ya se
+        # dibujó; en ese caso no se hace nada, para no perder la parte fraccionaria de la posición.
+        if len(self.replay) and int(float(value)) != self.replay.index:
+            self.replay.seek(int(float(value)))
+            self.draw()
+
+
+    def tick(self):
+        '''Avanza y dibuja un cuadro si se está reproduciendo, y vuelve a programarse.'''
+        if self.playing:
+            self.replay.speed = np.sign(self.replay.speed) * self.speed()
+            self.playing = self.replay.advance()
+            self.draw()
+            self.slider.set(self.replay.index)
+        self.after_id = self.window.after(self.interval, self.tick)
+
+
+    def draw(self):
+        '''
+        Dibuja el cuadro actual: las estelas de los últimos "trail_length" cuadros y las posiciones. Al
+        pasar a otro segmento (con otras partículas) se cambian los colores y los límites de la gráfica.
+
+        :return: N/A.
+        '''
+        state = self.replay.current()
+        if state["segment"] != self.segment:
+            self.segment = state["segment"]
+            self.collection.set_colors(state["colors"])
+            self.scatter.set_facecolors(state["colors"])
+            self.scatter.set_edgecolors(state["colors"])
+            xlim, ylim = self.replay.limits(self.segment)
+            self.ax.set_xlim(*xlim)
+            self.ax.set_ylim(*ylim)
+        self.collection.set_segments(self.replay.trails(self.trail_length))
+        self.scatter.set_offsets(state["pos"])
+        self.status_label.config(text=f"Frame: {state['frame']}   t = {state['time']:.6g}   "
+                                      f"({state['index'] + 1}/{len(self.replay)})")
+        self.canvas.draw_idle()
+
+
+    def close(self):
+        '''Cierra la ventana y libera los archivos de la trayectoria.'''
+        self.playing = False
+        self.window.after_cancel(self.after_id)
+        self.replay.close()
+        self.window.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded trajectory files.")
+    parser.add_argument("trajectories", nargs="+", help="Trajectory files (.traj), in order.")
+    parser.add_argument("--trail-length", type=int, default=500, help="Frames of each trail.")
+    parser.add_argument("--interval", type=int, default=50, help="Milliseconds between drawn frames.")
+    args = parser.parse_args(argv)
+    replay = TrajectoryReplay(args.trajectories)
+    if not len(replay):
+        raise SystemExit("The trajectory files have no frames")
+    viewer = ReplayWindow(replay, trail_length=args.trail_length, interval=args.interval)
+    viewer.window.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+import csv
+import random
+import string
+
+import numpy as np
+from numpy.linalg import norm
+
+from Body_file import Body, ParticleStore
+from Diagnostics_file import Diagnostics
+from Encounters_file import merge_encounters
+from Forces_file import wrap_periodic
+from Generators_file import as_generator, generate_particles, random_colors, random_names
+from Integrator_file import make_integrator
+from Profiler_file import PROFILER
+
+# Encabezados de las columnas de las condiciones iniciales; son los mismos de la hoja "Particle Data" del
+# archivo .xlsx que guarda la interfaz, de modo que dicho archivo también se puede usar como entrada.
+STATE_HEADERS = ["Name", "Mass", "Position X", "Position Y", "Velocity X", "Velocity Y", "Color"]
+
+
+class SimulationParameters:
+    '''
+    Contiene los parámetros de la simulación
+
+    Atributos:
+        dt (float): El valor de diferencia entre dos tiempos consecutivos (delta t).
+        user_dt (float): El valor de dt ingresado por el usuario.
+        eps (float): El valor de épsilon para el algoritmo de corrección.
+        correctAlg_enabled (bool): Estado del algormitmo de corrección (Activado o desactiado)
+        animation_interval (int): milisegundos entre cada iteración de la animación.
+        force_method (str): Método de cálculo de la fuerza: "direct" (suma directa sobre todos los pares),
+        "barnes_hut" (árbol cuaternario de Barnes-Hut, O(N log N)) o "particle_mesh" (malla con FFT,
+        O(N + M log M)).
+        theta (float): Ángulo de apertura del método de Barnes-Hut.
+        pm_grid (int): Número de celdas por eje de la malla del método de partícula-malla.
+        pm_isolated (bool): Frontera aislada (True) o periódica (False) del método de partícula-malla.
+        pm_box (float): Lado de la caja periódica del método de partícula-malla, centrada en el origen; 
+        con frontera periódica las posiciones se envuelven a ella después de cada paso.
+        integrator (str): Integrador: "leapfrog" (patada-deriva-patada sincronizado, 2° orden), 
+        "yoshida4" o "forest_ruth" (simplécticos de 4° orden) o "block" (intervalos individuales por 
+        bloques de potencias de 2, que reemplazan al algoritmo de corrección) o "hermite" (Hermite de 
+        4° orden con intervalo adaptativo de Aarseth).
+        max_block_level (int): Nivel máximo del integrador "block": el menor intervalo es dt/2^nivel.
+        hermite_eta (float): Parámetro de precisión del criterio de Aarseth del integrador "hermite".
+        trajectory_stride (int): Cada cuántas iteraciones se guarda un cuadro en el archivo de la 
+        trayectoria.
+        trail_length (int): Número de puntos de la estela de cada partícula en la gráfica.
+        trail_decimation (bool): Si las estelas se diezman al tamaño de un pixel al dibujarlas.
+        render_mode (str): Modo de dibujo de la gráfica: "lines" (una curva por partícula) o 
+        "collection" (un solo LineCollection y un solo scatter, con "blitting").
+        steps_per_frame (int): Número de pasos de la simulación por cada cuadro dibujado.
+        tile_size (int): Número de partículas por bloque en la suma directa; la memoria temporal es 
+        O(N·tile_size).
+        workers (int): Número de hilos de la suma directa; si es None se usan todos los núcleos.
+        diagnostics_every (int): Cada cuántas iteraciones se registran la energía y los momentos; 0 
+        desactiva los diagnósticos.
+        energy_tolerance (float): Error relativo máximo de la energía; 0 no lo revisa.
+        energy_action (str): Qué hacer si se supera la tolerancia: "abort" (detener la simulación con un 
+        error) o "tighten" (reducir el dt a la mitad).
+        softening (float): Longitud de suavizado de Plummer de la fuerza (suma directa, Barnes-Hut y 
+        Hermite); 0 para la fuerza sin suavizar.
+        capture_radius (float): Distancia a la que dos partículas se fusionan después de cada paso; 0 
+        desactiva las fusiones.
+        backend (str): Backend de cálculo de la suma directa y de los integradores: "numpy", "numba" 
+        (kernels compilados) o "auto" (Numba si está instalado; si no, numpy).
+        fastmath (bool): Si los kernels de Numba se compilan con "fastmath" (más rápidos, sin respetar 
+        estrictamente IEEE 754).
+        precision (str): Tipo de dato de las posiciones, velocidades y trayectorias: "float64" o 
+        "float32" (la mitad de la memoria; las fuerzas se siguen acumulando en float64).
+
+    Métodos: N/A
+    '''
+    def __init__(self):
+        self.user_dt = 0.001
+        self.dt = self.user_dt
+        self.eps = 5.0
+        self.animation_interval = 50
+        self.correctAlg_enabled = False
+        self.force_method = "direct"
+        self.theta = 0.5
+        self.pm_grid = 256
+        self.pm_isolated = True
+        self.pm_box = 100.0
+        self.integrator = "leapfrog"
+        self.max_block_level = 12
+        self.hermite_eta = 0.02
+        self.trajectory_stride = 1
+        self.trail_length = 500
+        self.trail_decimation = True
+        self.render_mode = "lines"
+        self.steps_per_frame = 1
+        self.tile_size = 1024
+        self.workers = None
+        self.diagnostics_every = 0
+        self.energy_tolerance = 0.0
+        self.energy_action = "abort"
+        self.softening = 0.0
+        self.capture_radius = 0.0
+        self.backend = "auto"
+        self.fastmath = False
+        self.precision = "float64"
+
+
+def random_color(rng=random):
+    '''
+    Escoge un color al azar usando el método "randint" de la librería "random" hallando una
+    representación hexadecimal con números aleatorios.
+
+    :rng: Generador de números aleatorios (el módulo "random" o un objeto "random.Random").
+    :return: Cadena de caracteres de representación hexadecimal del color.
+    '''
+    return '#%06x' % rng.randint(0, 0xFFFFFF)# Genera un número de 6 dígitos (06) en hexadecimal (x).
+
+
+def random_name(length=5, rng=random):
+    '''
+    Arroja un nombre aleatorio usando el método "choices" de la librería "random" para escoger al azar
+    entre una letra mayúscula y un número de 0 a 9 5 veces para un nombre aleatorio de 5 caracteres.
+    Ejemplos: 6ALVF, 1O057, KFQB5.
+
+    :length: Longitud del nombre inicializada a 5 caracteres. Número entero positivo.
+    :rng: Generador de números aleatorios (el módulo "random" o un objeto "random.Random").
+    :return: Nombre aleatorio de 5 caracteres.
+    '''
+    return ''.join(rng.choices(string.ascii_uppercase + string.digits, k=length))
+
+
+class Simulation:
+    '''
+    Núcleo de la simulación, sin dependencias de la interfaz gráfica: contiene los parámetros, el almacén
+    de partículas y el contador de iteraciones, y avanza la simulación un paso a la vez. Lo usan tanto la
+    interfaz (main.py) como el ejecutor por lotes sin gráficos (batch.py).
+
+    Atributos:
+        params (SimulationParameters): Parámetros de la simulación.
+        store (ParticleStore): Almacén con las masas, posiciones y velocidades de todas las partículas.
+        frame (int): Número de iteraciones (pasos) ejecutadas.
+        time (float): Tiempo simulado transcurrido.
+        integrator: Integrador en uso, creado a partir del nombre "integrator" de los parámetros.
+        diagnostics (Diagnostics): Serie de tiempo de la energía y los momentos.
+        merged (int): Número de partículas absorbidas en fusiones.
+
+    Métodos:
+        add_particle(masa, pos0, vel0, color, name="body"): Crea la partícula con los parámetros indicados
+        en el almacén y devuelve su objeto.
+        add_particles(m, pos, vel, colors=None, names=None): Agrega varias partículas de una vez y 
+        devuelve la lista de sus objetos.
+        generate_particles(num_particles, distribution="uniform", rng=None, **options): Genera de una vez 
+        partículas con una distribución ("uniform", "plummer" o "kepler_disk").
+        generate_random_particles(num_particles, rng=random): Genera un número especificado de
+        partículas aleatorias y devuelve la lista de sus objetos.
+        remove_particle(body): Elimina una partícula en O(1).
+        step(): Avanza la simulación un intervalo dt con el integrador escogido y el algoritmo de
+        corrección.
+        merge_encounters(): Fusiona las partículas que están a menos de la distancia de captura.
+        clear(): Borra todas las partículas y reinicia el contador de iteraciones.
+    '''
+    def __init__(self, params=None):
+        self.params = params if params is not None else SimulationParameters()
+        self.store = ParticleStore(self.params.precision)
+        self.frame = 0
+        self.time = 0.0
+        self.integrator = None
+        self.integrator_name = None
+        self.diagnostics = Diagnostics()
+        self.merged = 0
+
+
+    @property
+    def bodies(self):
+        return self.store.bodies
+
+
+    def add_particle(self, masa, pos0, vel0, color, name="body"):
+        '''
+        Crea la partícula con los parámetros iniciales (masa, posición y velocidad inicial), color
+        y nombre indicados en el almacén de partículas.
+
+        :param masa: Masa de la partícula. Flotante.
+        :param pos0: Posición inicial de la partícula. Tupla de R2.
+        :param vel0: Velocidad inicial de la partícula. Tupla de R2.
+        :param color: Representación hexadecimal del color de la partícula. Cadena de caracteres.
+        :param name: Nombre de la partícula. Cadena de caracteres.
+        :return: Objeto de la partícula (Body).
+        '''
+        return Body(masa, pos0, vel0, color, name, store=self.store)
+
+
+    def add_particles(self, m, pos, vel, colors=None, names=None):
+        '''
+        Agrega varias partículas de una vez al almacén, copiando sus filas con una sola operación por 
+        arreglo.
+
+        :param m: Masas de las partículas. Arreglo de numpy de K.
+        :param pos: Posiciones iniciales. Arreglo de numpy de Kx2.
+        :param vel: Velocidades iniciales. Arreglo de numpy de Kx2.
+        :param colors: Colores de las partículas; si es None se escogen al azar.
+        :param names: Nombres de las partículas; si es None se escogen al azar.
+        :return: Lista de los objetos de las partículas agregadas.
+        '''
+        if colors is None or names is None:
+            rng = as_generator()
+            colors = random_colors(len(m), rng) if colors is None else colors
+            names = random_names(len(m), rng) if names is None else names
+        return self.store.extend(m, pos, vel, colors, names)
+
+
+    def generate_particles(self, num_particles, distribution="uniform", rng=None, **options):
+        '''
+        Genera de una vez las masas, posiciones, velocidades, colores y nombres de las partículas con la 
+        distribución indicada (ver "Generators_file"): "uniform" (caja uniforme), "plummer" (esfera de 
+        Plummer proyectada al plano) o "kepler_disk" (disco kepleriano alrededor de una masa central).
+
+        :param num_particles: Número de partículas a generar. Entero positivo.
+        :param distribution: Nombre de la distribución.
+        :param rng: Generador de numpy, semilla, o el módulo "random" o un objeto "random.Random".
+        :param options: Parámetros de la distribución.
+        :return: Lista de los objetos de las partículas generadas.
+        '''
+        particles = generate_particles(num_particles, distribution, rng, **options)
+        return self.add_particles(particles["m"], particles["pos"], particles["vel"], particles["colors"],
+                                  particles["names"])
+
+
+    def generate_random_particles(self, num_particles, rng=random):
+        '''
+        Genera un número especificado de partículas aleatorias con una masa de 1 a 20, posición y
+        velocidad entre (-10,-10) y (10,10), color y nombre aleatorios, todas de una vez con la 
+        distribución "uniform".
+
+        :param num_particles: número de partículas a generar. Entero positivo.
+        :param rng: Generador de números aleatorios (el módulo "random" o un objeto "random.Random" con
+        semilla para resultados reproducibles, o un generador de numpy).
+        :return: Lista de los objetos de las partículas generadas.
+        '''
+        return self.generate_particles(num_particles, "uniform", rng)
+
+
+    def remove_particle(self, body):
+        '''
+        Elimina una partícula en O(1), moviendo la última partícula a su fila (ver 
+        "ParticleStore.swap_remove"). El estado del integrador se descarta, ya que corresponde a las 
+        partículas anteriores.
+
+        :param body: Objeto de la partícula (Body).
+        :return: N/A.
+        '''
+        self.store.swap_remove(body.index)
+        self.integrator = None
+
+
+    def step(self):
+        '''
+        Avanza la simulación un intervalo dt con el integrador indicado en los parámetros (por defecto el
+        "leapfrog" patada-deriva-patada, que actualiza todas las partículas a la vez con las
+        aceleraciones calculadas en una sola pasada). Luego se aplica el algoritmo de corrección del dt si
+        está activado, se envuelven las posiciones a la caja periódica si el método de partícula-malla
+        tiene frontera periódica y, si hay una distancia de captura, se fusionan las partículas cercanas.
+
+        :return: N/A.
+        '''
+        store = self.store
+        params = self.params
+        if len(store) == 0:
+            return
+        if store.dtype != params.precision:
+            store.set_precision(params.precision)
+        # El integrador se crea de nuevo solo si el usuario escogió otro.
+        if self.integrator is None or self.integrator_name != params.integrator:
+            self.integrator = make_integrator(params.integrator)
+            self.integrator_name = params.integrator
+        # Diagnósticos: el primer registro es el estado inicial (referencia de la energía). En las
+        # iteraciones que se registran, las evaluaciones de la fuerza también calculan el potencial.
+        every = params.diagnostics_every
+        if every and len(self.diagnostics) == 0:
+            self.diagnostics.record(self)
+        record = bool(every) and (self.frame + 1) % every == 0
+        store.track_potential = record
+        store.potential_valid = False
+        old_vel = store.vel.copy()
+        # Los integradores adaptativos pueden avanzar un intervalo distinto del dt de los parámetros.
+        with PROFILER.phase("step"):
+            dt = self.integrator.step(store, params.dt, params)
+        PROFILER.count("steps")
+
+        # Algoritmo de corrección  del delta t; si la magnitud de la diferencia de dos velocidades
+        # es mayor a épsilon, el dt se corrige para que, dependiendo de la aceleración sufrida por
+        # el objeto, el cambio en la rapidez no sea mayor a este valor. Esto permite que, una vez se
+        # cumpla la desigualdad (se supere el épsilon), para la próxima iteración se corriga el dt. Si
+        # varias partículas superan el épsilon, se usa la mayor aceleración entre ellas.
+        # Con intervalos individuales cada partícula ya ajusta su propio intervalo, por lo que no se corrige
+        # el dt de todo el sistema.
+        if params.correctAlg_enabled and not self.integrator.adaptive:
+            exceeded = norm(store.vel - old_vel, axis=1) > params.eps
+            if exceeded.any():
+                # Se guarda como flotante de Python: con un escalar de numpy los arreglos de float32 se
+                # operarían en float64, y el resultado cambiaría al restaurar el dt de un punto de control.
+                params.dt = float(params.eps / norm(store.accel[exceeded], axis=1).max())
+                PROFILER.count("dt_reductions")
+        # Revisa que el usuario todavía desee corregir (y que el integrador no tenga intervalos 
+        # individuales). Si no, devuelve el dt al ingresado.
+        else:
+            params.dt = params.user_dt
+
+        # Con frontera periódica las partículas que salen de la caja entran por el lado opuesto.
+        if params.force_method == "particle_mesh" and not params.pm_isolated:
+            wrap_periodic(store.pos, params.pm_box)
+
+        self.frame += 1
+        self.time += dt
+        # Con las fusiones, un encuentro cercano no reduce el dt de todo el sistema casi a cero.
+        merged = self.merge_encounters() if params.capture_radius else []
+        if record and not merged:
+            self.diagnostics.record(self)
+
+
+    def merge_encounters(self):
+        '''
+        Fusiona las partículas que están a menos de la distancia de captura ("capture_radius"),
+        conservando la masa y el momento lineal, y las elimina del almacén. El estado del integrador se
+        descarta, ya que corresponde a las partículas anteriores; con los diagnósticos activados, la
+        energía después de la fusión (que no la conserva) es la nueva referencia.
+
+        :return: Lista de tuplas (partícula resultante, lista de partículas absorbidas).
+        '''
+        merged = merge_encounters(self.store, self.params.capture_radius)
+        if merged:
+            self.integrator = None
+            self.merged += sum(len(absorbed) for _, absorbed in merged)
+            if self.params.diagnostics_every:
+                self.diagnostics.rebase(self)
+        return merged
+
+
+    def clear(self):
+        '''Borra todas las partículas y reinicia el contador de iteraciones.'''
+        self.store.clear()
+        self.frame = 0
+        self.time = 0.0
+        self.diagnostics.reset()
+        self.merged = 0
+
+
+def load_initial_conditions(filename, simulation=None):
+    '''
+    Carga las condiciones iniciales de un archivo .csv con las columnas de "STATE_HEADERS", o de la hoja
+    "Particle Data" de un archivo .xlsx guardado por la interfaz (openpyxl solo se importa en este caso).
+
+    :filename: Ruta del archivo de condiciones iniciales.
+    :simulation: Simulación a la que se agregan las partículas; si es None se crea una nueva.
+    :return: La simulación con las partículas cargadas.
+    '''
+    if simulation is None:
+        simulation = Simulation()
+    if str(filename).lower().endswith(".xlsx"):
+        import openpyxl
+        ws = openpyxl.load_workbook(filename, read_only=True)["Particle Data"]
+        rows = ws.iter_rows(values_only=True)
+        headers = list(next(rows))
+        records = [dict(zip(headers, row)) for row in rows if row and row[0] is not None]
+    else:
+        with open(filename, newline="") as f:
+            records = list(csv.DictReader(f))
+    for record in records:
+        simulation.add_particle(float(record["Mass"]),
+                                (float(record["Position X"]), float(record["Position Y"])),
+                                (float(record["Velocity X"]), float(record["Velocity Y"])),
+                                record.get("Color") or random_color(), record.get("Name") or random_name())
+    return simulation
+
+
+def save_state(simulation, filename):
+    '''
+    Guarda el estado actual de las partículas en un archivo .csv con las columnas de "STATE_HEADERS",
+    que puede usarse de nuevo como condiciones iniciales.
+
+    :simulation: Simulación cuyo estado se guarda.
+    :filename: Ruta del archivo .csv.
+    :return: N/A.
+    '''
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(STATE_HEADERS)
+        for body in simulation.bodies:
+            writer.writerow([body.name, body.m, body.pos[0], body.pos[1], body.vel[0], body.vel[1],
+                             body.color])
@@ -0,0 +1,227 @@
+import json
+import os
+
+import numpy as np
+
+# Firma al inicio de cada archivo de trayectoria.
+MAGIC = b"NBTRAJ01"
+# El encabezado (firma, longitud y JSON) se rellena hasta un múltiplo de este tamaño, de modo que los
+# registros de los cuadros queden alineados en el archivo.
+HEADER_ALIGN = 64
+
+
+def frame_dtype(n_bodies, dtype="float64"):
+    '''
+    Tipo de dato (estructurado) de un registro de la trayectoria: número de iteración, tiempo, y
+    posiciones y velocidades de todas las partículas.
+
+    :n_bodies: Número de partículas. Entero.
+    :dtype: Tipo de dato de las posiciones y velocidades.
+    :return: Objeto de numpy.dtype.
+    '''
+    return np.dtype([("frame", "<i8"), ("time", "<f8"),
+                     ("pos", np.dtype(dtype).newbyteorder("<"), (n_bodies, 2)),
+                     ("vel", np.dtype(dtype).newbyteorder("<"), (n_bodies, 2))])
+
+
+def segment_filename(filename, segment):
+    '''
+    Nombre del archivo de un segmento de la trayectoria: el primero es el archivo indicado y los
+    siguientes (que se empiezan cuando cambia el número de partículas) le agregan su número antes de la
+    extensión, por ejemplo "corrida.traj", "corrida.1.traj", "corrida.2.traj".
+
+    :filename: Ruta del archivo de la trayectoria.
+    :segment: Número del segmento. Entero.
+    :return: Ruta del archivo del segmento.
+    '''
+    if segment == 0:
+        return str(filename)
+    root, extension = os.path.splitext(str(filename))
+    return f"{root}.{segment}{extension}"
+
+
+class TrajectoryWriter:
+    '''
+    Escribe la trayectoria de la simulación en un archivo binario al que se le agregan cuadros a medida
+    que avanza la simulación, en lugar de guardarla en listas en memoria. El archivo tiene un encabezado
+    (firma, longitud del encabezado y un JSON con el número de partículas, el tipo de dato, el paso de
+    salida y los nombres, colores y masas) seguido de registros de tamaño fijo, uno por cuadro guardado.
+    Los cuadros se acumulan en un bloque de tamaño fijo en memoria y se escriben al disco cuando se
+    llena, de modo que la memoria usada no crece con la duración de la simulación. Con "append" los
+    cuadros se agregan al final de un archivo existente (por ejemplo, al continuar desde un punto de
+    control), que debe tener el mismo número de partículas y tipo de dato.
+
+    Atributos:
+        filename (str): Ruta del archivo.
+        n_bodies (int): Número de partículas de cada cuadro.
+        dtype (numpy.dtype): Tipo de dato de las posiciones y velocidades guardadas.
+        stride (int): Solo se guardan los cuadros cuyo número de iteración es múltiplo de "stride".
+        frames_written (int): Número de cuadros escritos (incluyendo los que están en el bloque).
+
+    Métodos:
+        append(simulation): Recibe el estado actual de la simulación y lo guarda si le corresponde
+        según el paso de salida.
+        flush(): Escribe al disco los cuadros acumulados.
+        close(): Escribe los cuadros acumulados y cierra el archivo.
+    '''
+    def __init__(self, filename, store, stride=1, chunk_frames=256, dtype="float64", append=False):
+        self.filename = str(filename)
+        self.n_bodies = len(store)
+        self.dtype = np.dtype(dtype)
+        self.stride = max(int(stride), 1)
+        self.record = frame_dtype(self.n_bodies, dtype)
+        self.buffer = np.zeros(chunk_frames, dtype=self.record)
+        self.buffered = 0
+        self.frames_written = 0
+        if append and os.path.exists(self.filename):
+            reader = TrajectoryReader(self.filename)
+            if reader.n_bodies != self.n_bodies or reader.dtype != self.dtype:
+                raise ValueError(f"{self.filename} has {reader.n_bodies} bodies of {reader.dtype}, not "
+                                 f"{self.n_bodies} of {self.dtype}")
+            # Se escribe después del último registro completo.
+            self.frames_written = len(reader)
+            end = reader.header_size + len(reader) * self.record.itemsize
+            del reader
+            self.file = open(self.filename, "r+b")
+            self.file.truncate(end)
+            self.file.seek(end)
+            return
+        metadata = {"version": 1, "n_bodies": self.n_bodies, "dtype": np.dtype(dtype).str,
+                    "stride": self.stride, "names": [body.name for body in store.bodies],
+                    "colors": [body.color for body in store.bodies], "masses": store.m.tolist()}
+        text = json.dumps(metadata).encode("utf-8")
+        header_size = -(-(len(MAGIC) + 8 + len(text)) // HEADER_ALIGN) * HEADER_ALIGN
+        self.file = open(self.filename, "wb")
+        self.file.write(MAGIC + np.uint64(header_size).tobytes() + text.ljust(header_size - 16, b" "))
+        # El encabezado se escribe de inmediato para que el archivo se pueda leer mientras se escribe.
+        self.file.flush()
+
+
+    def append(self, simulation):
+        '''
+        Recibe el estado actual de la simulación y lo agrega al bloque si le corresponde según el paso
+        de salida; si el bloque se llena, se escribe al disco.
+
+        :simulation: Simulación (objeto de "Simulation").
+        :return: N/A.
+        '''
+        # El paso de salida se decide con el número de iteración y no con los cuadros recibidos, de modo
+        # que el espaciado de los cuadros no cambia al empezar otro archivo (después de una fusión o al
+        # continuar desde un punto de control).
+        if simulation.frame % self.stride:
+            return
+        row = self.buffer[self.buffered]
+        row["frame"] = simulation.frame
+        row["time"] = simulation.time
+        row["pos"] = simulation.store.pos
+        row["vel"] = simulation.store.vel
+        self.buffered += 1
+        self.frames_written += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+
+    def flush(self):
+        '''Escribe al disco los cuadros acumulados en el bloque.'''
+        if self.buffered:
+            self.file.write(self.buffer[:self.buffered].tobytes())
+            self.buffered = 0
+        self.file.flush()
+
+
+    def close(self):
+        '''Escribe los cuadros acumulados y cierra el archivo.'''
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    '''
+    Lee un archivo escrito por "TrajectoryWriter" mapeándolo en memoria (np.memmap): ningún cuadro se
+    carga hasta que se accede a él, y cualquier rango de cuadros se obtiene como una vista sin leer el
+    archivo completo. Si el archivo se sigue escribiendo, se ignora un posible registro incompleto al
+    final.
+
+    Atributos:
+        n_bodies (int): Número de partículas.
+        stride (int): Paso de salida con el que se escribió.
+        names (list), colors (list): Nombres y colores de las partículas.
+        masses (arreglo de numpy de N): Masas de las partículas.
+        header_size (int): Tamaño del encabezado en bytes (posición del primer registro).
+        records (np.memmap): Todos los registros; los campos son "frame", "time", "pos" y "vel".
+
+    Métodos:
+        frames(start, stop, step=1): Devuelve los registros del rango indicado (vista del mapa).
+        positions(start, stop, step=1) / velocities(...): Posiciones o velocidades del rango, de
+        forma (cuadros, N, 2).
+    '''
+    def __init__(self, filename):
+        self.filename = str(filename)
+        with open(self.filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{filename} is not a trajectory file")
+            header_size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            metadata = json.loads(f.read(header_size - 16).decode("utf-8"))
+        self.header_size = header_size
+        self.n_bodies = metadata["n_bodies"]
+        self.stride = metadata["stride"]
+        self.names = metadata["names"]
+        self.colors = metadata["colors"]
+        self.masses = np.array(metadata["masses"])
+        self.dtype = np.dtype(metadata["dtype"])
+        record = frame_dtype(self.n_bodies, self.dtype)
+        n_frames = (os.path.getsize(self.filename) - header_size) // record.itemsize
+        if n_frames > 0:
+            self.records = np.memmap(self.filename, dtype=record, mode="r", offset=header_size,
+                                     shape=(n_frames,))
+        else:
+            self.records = np.zeros(0, dtype=record)
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    def frames(self, start=0, stop=None, step=1):
+        '''
+        Devuelve los registros de los cuadros start..stop-1 (cada "step") como una vista del mapa en
+        memoria.
+
+        :return: Arreglo estructurado de numpy con los campos "frame", "time", "pos" y "vel".
+        '''
+        return self.records[start:stop:step]
+
+
+    def positions(self, start=0, stop=None, step=1):
+        return self.records["pos"][start:stop:step]
+
+
+    def velocities(self, start=0, stop=None, step=1):
+        return self.records["vel"][start:stop:step]
+
+
+def truncate_trajectory(filename, frame):
+    '''
+    Elimina del final de un archivo de la trayectoria los cuadros con número de iteración mayor o igual
+    a "frame" (por ejemplo, los escritos después del punto de control desde el que se continúa la
+    simulación, que se vuelven a calcular) y un posible registro incompleto.
+
+    :filename: Ruta del archivo.
+    :frame: Número de iteración del primer cuadro que se elimina. Entero.
+    :return: Número de cuadros que quedan en el archivo. Entero.
+    '''
+    reader = TrajectoryReader(filename)
+    kept = int(np.searchsorted(reader.records["frame"], frame, side="left"))
+    end = reader.header_size + kept * reader.records.dtype.itemsize
+    # El mapa en memoria se libera antes de acortar el archivo.
+    del reader
+    os.truncate(filename, end)
+    return kept
@@ -0,0 +1,186 @@
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Cuadro publicado por el hilo de la simulación: número de iteración, tiempo simulado, dt actual, copia
+# de las posiciones de todas las partículas (arreglo de numpy de Nx2) y tupla de sus objetos "Body" en el
+# mismo orden (cambia cuando se fusionan partículas).
+Snapshot = namedtuple("Snapshot", ["frame", "time", "dt", "pos", "bodies"])
+
+
+class SimulationWorker(threading.Thread):
+    '''
+    Hilo que avanza la simulación fuera del ciclo de eventos de Tk, de modo que una evaluación lenta de la
+    fuerza no congela la interfaz y un dibujo lento no detiene la física. Después de cada
+    "steps_per_frame" pasos publica una copia de las posiciones (un "Snapshot") en una cola acotada; si la
+    cola está llena se descarta el cuadro más antiguo, de modo que la interfaz siempre dibuja el más
+    reciente a su propio ritmo. Todo cambio a la simulación (pausar, continuar, agregar partículas, etc.)
+    se envía al hilo como un comando, que se ejecuta entre dos grupos de pasos.
+
+    Atributos:
+        simulation (Simulation): El núcleo de la simulación.
+        on_step: Función sin argumentos que se llama en el hilo después de cada paso (por ejemplo, para
+        guardar el cuadro en el archivo de la trayectoria), o None.
+        commands (queue.Queue): Cola de comandos para el hilo.
+        frames (queue.Queue): Cola acotada de cuadros publicados.
+        running (bool): Si la simulación está avanzando (True) o en pausa (False).
+        frames_dropped (int): Número de cuadros descartados sin dibujarse.
+        error (Exception): Último error ocurrido al avanzar la simulación (que la pausa) o al ejecutar un
+        comando, o None; la interfaz lo revisa periódicamente y lo muestra.
+
+    Métodos:
+        submit(function, *args): Ejecuta una función en el hilo y devuelve un "Future" con su resultado.
+        pause() / resume(): Pausa o continúa la simulación.
+        hold(): Contexto ("with") durante el cual la simulación está detenida y se puede modificar
+        desde otro hilo.
+        latest_frame(): Devuelve el cuadro más reciente, descartando los anteriores, o None.
+        drain(): Descarta todos los cuadros publicados.
+        stop(): Termina el hilo.
+    '''
+    def __init__(self, simulation, on_step=None, max_frames=2):
+        super().__init__(name="simulation-worker", daemon=True)
+        self.simulation = simulation
+        self.on_step = on_step
+        self.commands = queue.Queue()
+        self.frames = queue.Queue(maxsize=max(int(max_frames), 1))
+        self.running = False
+        self.frames_dropped = 0
+        self.error = None
+
+
+    def run(self):
+        while True:
+            # En pausa se espera al siguiente comando; avanzando, solo se toman los comandos pendientes.
+            # Si no hay partículas se espera un poco para no ocupar el procesador.
+            try:
+                if not self.running:
+                    command = self.commands.get()
+                elif len(self.simulation.store) == 0:
+                    command = self.commands.get(timeout=0.05)
+                else:
+                    command = self.commands.get_nowait()
+            except queue.Empty:
+                command = None
+            if command is not None:
+                function, args, future = command
+                if function is None:
+                    break
+                try:
+                    future.set_result(function(*args))
+                except Exception as error:
+                    future.set_exception(error)
+                    # Casi ningún comando se espera (agregar partículas, compilar los kernels...), por lo
+                    # que el error también se informa como los de los pasos, sin pausar la simulación.
+                    self.error = error
+                # Después de cada comando se publica el estado, para que la interfaz se actualice aunque
+                # la simulación esté en pausa.
+                self.publish()
+                continue
+            if len(self.simulation.store) == 0:
+                continue
+            try:
+                for _ in range(self.simulation.params.steps_per_frame):
+                    self.simulation.step()
+                    if self.on_step is not None:
+                        self.on_step()
+            except Exception as error:
+                self.error = error
+                self.running = False
+            self.publish()
+
+
+    def publish(self):
+        '''Publica una copia del estado actual; si la cola está llena se descarta el cuadro más antiguo.'''
+        simulation = self.simulation
+        snapshot = Snapshot(simulation.frame, simulation.time, simulation.params.dt,
+                            simulation.store.pos.copy(), tuple(simulation.store.bodies))
+        while True:
+            try:
+                self.frames.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+
+    def submit(self, function, *args):
+        '''
+        Envía un comando al hilo: la función se ejecuta en el hilo, entre dos grupos de pasos.
+
+        :function: Función a ejecutar.
+        :args: Argumentos de la función.
+        :return: Objeto "Future" con el resultado de la función.
+        '''
+        future = Future()
+        self.commands.put((function, args, future))
+        return future
+
+
+    def _set_running(self, running):
+        was_running = self.running
+        self.running = running
+        return was_running
+
+
+    def pause(self):
+        '''Pausa la simulación (comando).'''
+        return self.submit(self._set_running, False)
+
+
+    def resume(self):
+        '''Continúa la simulación (comando).'''
+        self.error = None
+        return self.submit(self._set_running, True)
+
+
+    @contextmanager
+    def hold(self):
+        '''
+        Detiene la simulación mientras dura el bloque "with", esperando a que termine el grupo de pasos
+        en curso, y la continúa al final si estaba avanzando. Dentro del bloque se puede leer o modificar
+        la simulación desde otro hilo sin carreras.
+        '''
+        was_running = self.pause().result()
+        try:
+            yield
+        finally:
+            if was_running:
+                self.resume()
+
+
+    def latest_frame(self):
+        '''
+        Devuelve el cuadro publicado más reciente, descartando los anteriores.
+
+        :return: Objeto "Snapshot", o None si no hay cuadros nuevos.
+        '''
+        snapshot = None
+        while True:
+            try:
+                newer = self.frames.get_nowait()
+            except queue.Empty:
+                return snapshot
+            if snapshot is not None:
+                self.frames_dropped += 1
+            snapshot = newer
+
+
+    def drain(self):
+        '''Descarta todos los cuadros publicados.'''
+        while True:
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                return
+
+
+    def stop(self):
+        '''Termina el hilo después del grupo de pasos en curso y espera a que acabe.'''
+        self.commands.put((None, (), None))
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,280 @@
+'''
+Ejecutor por lotes de la simulación, sin interfaz gráfica: carga las condiciones iniciales de un archivo,
+avanza la simulación el número de pasos indicado sin dibujar nada y guarda el estado final. Solo depende
+del núcleo de la simulación (numpy), por lo que puede ejecutarse en un servidor sin pantalla.
+
+También ejecuta barridos de parámetros (muchas simulaciones independientes repartidas entre procesos).
+
+Uso:
+    python batch.py run condiciones.csv --steps 1000 --output final.csv
+    python batch.py run condiciones.csv --steps 1000000 --checkpoint run.nbck --checkpoint-every 10000
+    python batch.py run --resume run.nbck --steps 500000 --checkpoint run.nbck --checkpoint-every 10000
+    python batch.py run condiciones.csv --steps 100000 --diagnostics-every 100 --diagnostics energia.csv
+    python batch.py run --random 100000 --distribution plummer --seed 1 --steps 100 --force-method barnes_hut
+    python batch.py sweep barrido.json --workers 8 --output resultados.csv --states finales.npz
+'''
+import argparse
+import os
+import sys
+import time
+
+from Backends_file import BACKEND_NAMES, params_backend
+from Body_file import PRECISIONS
+from Checkpoint_file import AutoCheckpoint, load_checkpoint, save_checkpoint
+from Diagnostics_file import ENERGY_ACTIONS, EnergyDriftError
+from Ensemble_file import load_sweep, run_ensemble, save_results, save_states
+from Forces_file import FORCE_METHODS
+from Generators_file import DISTRIBUTIONS
+from Integrator_file import INTEGRATORS
+from Profiler_file import PROFILER
+from Simulation_file import Simulation, load_initial_conditions, save_state
+from Trajectory_file import TrajectoryReader, TrajectoryWriter, segment_filename, truncate_trajectory
+
+
+def add_parameter_arguments(parser):
+    '''
+    Agrega al analizador de argumentos las opciones que corresponden a los atributos de
+    "SimulationParameters".
+
+    :parser: Analizador (o subanalizador) de argparse.
+    :return: N/A.
+    '''
+    parser.add_argument("--dt", type=float, help="Time step (dt).")
+    parser.add_argument("--eps", type=float, help="Epsilon of the correction algorithm.")
+    parser.add_argument("--correct", action="store_true", help="Enable the correction algorithm.")
+    parser.add_argument("--force-method", choices=FORCE_METHODS, help="Gravity solver.")
+    parser.add_argument("--theta", type=float, help="Barnes-Hut opening angle.")
+    parser.add_argument("--pm-grid", type=int, help="Particle-mesh grid size per axis.")
+    parser.add_argument("--pm-periodic", action="store_true",
+                        help="Periodic particle-mesh boundary on a fixed box (see --pm-box).")
+    parser.add_argument("--pm-box", type=float, help="Side of the periodic box, centered on the origin.")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), help="Time integrator.")
+    parser.add_argument("--tile-size", type=int, help="Targets per tile of the direct-sum kernel.")
+    parser.add_argument("--workers", type=int, help="Threads of the direct-sum kernel.")
+    parser.add_argument("--backend", choices=BACKEND_NAMES,
+                        help="Compute backend (auto uses Numba if installed).")
+    parser.add_argument("--fastmath", action="store_true", help="Compile the Numba kernels with fastmath.")
+    parser.add_argument("--precision", choices=PRECISIONS,
+                        help="Storage precision of positions, velocities and trajectories.")
+    parser.add_argument("--softening", type=float, help="Plummer softening length.")
+    parser.add_argument("--capture-radius", type=float, help="Merge bodies closer than this distance.")
+    parser.add_argument("--diagnostics-every", type=int, help="Steps between energy/momentum records.")
+    parser.add_argument("--energy-tolerance", type=float, help="Maximum relative energy error.")
+    parser.add_argument("--energy-action", choices=ENERGY_ACTIONS,
+                        help="Abort the run or halve dt when the tolerance is exceeded.")
+
+
+def apply_parameter_arguments(params, args):
+    '''
+    Asigna a los parámetros de la simulación las opciones ingresadas en la línea de comandos.
+
+    :params: Parámetros de la simulación (objeto de "SimulationParameters").
+    :args: Argumentos analizados por argparse.
+    :return: N/A.
+    '''
+    if args.dt is not None:
+        params.user_dt = params.dt = args.dt
+    if args.eps is not None:
+        params.eps = args.eps
+    if args.correct:
+        params.correctAlg_enabled = True
+    if args.force_method is not None:
+        params.force_method = args.force_method
+    if args.theta is not None:
+        params.theta = args.theta
+    if args.pm_grid is not None:
+        params.pm_grid = args.pm_grid
+    if args.pm_periodic:
+        params.pm_isolated = False
+    if args.pm_box is not None:
+        params.pm_box = args.pm_box
+    if args.integrator is not None:
+        params.integrator = args.integrator
+    if args.tile_size is not None:
+        params.tile_size = args.tile_size
+    if args.workers is not None:
+        params.workers = args.workers
+    if args.backend is not None:
+        params.backend = args.backend
+    if args.fastmath:
+        params.fastmath = True
+    if args.precision is not None:
+        params.precision = args.precision
+    if args.softening is not None:
+        params.softening = args.softening
+    if args.capture_radius is not None:
+        params.capture_radius = args.capture_radius
+    if args.diagnostics_every is not None:
+        params.diagnostics_every = args.diagnostics_every
+    if args.energy_tolerance is not None:
+        params.energy_tolerance = args.energy_tolerance
+    if args.energy_action is not None:
+        params.energy_action = args.energy_action
+
+
+def open_trajectory(args, simulation, segment):
+    '''
+    Abre el archivo de un segmento de la trayectoria de "run" (ver "segment_filename") y guarda en él el
+    estado actual de la simulación.
+
+    :args: Argumentos de la línea de comandos.
+    :simulation: Simulación (objeto de "Simulation").
+    :segment: Número del segmento. Entero.
+    :return: Objeto de "TrajectoryWriter".
+    '''
+    trajectory = TrajectoryWriter(segment_filename(args.trajectory, segment), simulation.store,
+                                  stride=args.stride, dtype=simulation.params.precision)
+    trajectory.append(simulation)
+    return trajectory
+
+
+def resume_trajectory(args, simulation):
+    '''
+    Continúa la trayectoria de una corrida desde un punto de control sin perder los cuadros anteriores:
+    se eliminan los cuadros escritos después del punto de control (y los segmentos que solo tienen esos
+    cuadros) y se agregan los nuevos al último segmento, o a uno nuevo si cambió el número de partículas
+    o la precisión.
+
+    :args: Argumentos de la línea de comandos.
+    :simulation: Simulación restaurada (objeto de "Simulation").
+    :return: Tupla (objeto de "TrajectoryWriter", número de segmentos).
+    '''
+    files = []
+    while os.path.exists(segment_filename(args.trajectory, len(files))):
+        files.append(segment_filename(args.trajectory, len(files)))
+    while files and truncate_trajectory(files[-1], simulation.frame) == 0:
+        os.remove(files.pop())
+    if files:
+        reader = TrajectoryReader(files[-1])
+        if reader.n_bodies == len(simulation.store) and reader.dtype == simulation.store.dtype:
+            trajectory = TrajectoryWriter(files[-1], simulation.store, stride=args.stride,
+                                          dtype=simulation.params.precision, append=True)
+            trajectory.append(simulation)
+            return trajectory, len(files)
+    return open_trajectory(args, simulation, len(files)), len(files) + 1
+
+
+def run(args):
+    '''
+    Ejecuta el subcomando "run": avanza la simulación el número de pasos indicado, desde las condiciones
+    iniciales, desde un punto de control o con partículas generadas con una distribución.
+    '''
+    if args.resume:
+        simulation = load_checkpoint(args.resume)
+    elif args.initial_conditions:
+        simulation = load_initial_conditions(args.initial_conditions)
+    elif args.random:
+        simulation = Simulation()
+        simulation.generate_particles(args.random, args.distribution, args.seed)
+    else:
+        raise SystemExit("run: either initial conditions, --resume or --random is required")
+    apply_parameter_arguments(simulation.params, args)
+    if args.profile:
+        PROFILER.enabled = True
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = AutoCheckpoint(simulation, args.checkpoint, args.checkpoint_every)
+    trajectory = None
+    segments = 0
+    if args.trajectory and args.resume:
+        trajectory, segments = resume_trajectory(args, simulation)
+    elif args.trajectory:
+        trajectory = open_trajectory(args, simulation, segments)
+        segments += 1
+    # La compilación de los kernels de Numba no se cuenta en el tiempo de la corrida.
+    params_backend(simulation.params).warm_up(simulation.params.precision)
+    start = time.perf_counter()
+    first_frame = simulation.frame
+    aborted = None
+    try:
+        for _ in range(args.steps):
+            simulation.step()
+            if trajectory is not None:
+                # Cada registro es de tamaño fijo: si una fusión cambió el número de partículas, se
+                # cierra el segmento y se empieza otro archivo con las partículas restantes.
+                if trajectory.n_bodies != len(simulation.store):
+                    trajectory.close()
+                    trajectory = open_trajectory(args, simulation, segments)
+                    segments += 1
+                else:
+                    trajectory.append(simulation)
+            if checkpoint is not None:
+                checkpoint()
+    except EnergyDriftError as error:
+        aborted = error
+    elapsed = time.perf_counter() - start
+    steps = simulation.frame - first_frame
+    if trajectory is not None:
+        trajectory.close()
+    print(f"{len(simulation.store)} bodies, {simulation.frame} steps, t = {simulation.time:.6g} "
+          f"in {elapsed:.3f} s ({steps / max(elapsed, 1e-12):.1f} steps/s, "
+          f"{params_backend(simulation.params).name} backend, {simulation.params.precision})")
+    if simulation.merged:
+        print(f"{simulation.merged} bodies merged")
+    if segments > 1:
+        print(f"trajectory written in {segments} segments ({args.trajectory} to "
+              f"{segment_filename(args.trajectory, segments - 1)})")
+    last = simulation.diagnostics.last()
+    if last is not None:
+        print(f"relative energy error {last['energy_error']:.3e}, "
+              f"dt halved {simulation.diagnostics.tightened} time(s)")
+    if checkpoint is not None:
+        save_checkpoint(simulation, args.checkpoint)
+    if args.profile:
+        PROFILER.dump(args.profile)
+    if args.output:
+        save_state(simulation, args.output)
+    if args.diagnostics:
+        simulation.diagnostics.save(args.diagnostics)
+    if aborted is not None:
+        print(f"run aborted: {aborted}", file=sys.stderr)
+        sys.exit(1)
+
+
+def sweep(args):
+    '''Ejecuta el subcomando "sweep": ejecuta un barrido de parámetros en varios procesos.'''
+    rows, states = run_ensemble(load_sweep(args.spec), workers=args.workers)
+    save_results(rows, args.output)
+    if args.states:
+        save_states(states, args.states)
+    print(f"{len(rows)} runs saved to {args.output}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless N-body simulation runner.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run N steps from an initial-conditions file.")
+    run_parser.add_argument("initial_conditions", nargs="?", help="Initial conditions (.csv or .xlsx).")
+    run_parser.add_argument("--resume", help="Checkpoint file to resume from instead.")
+    run_parser.add_argument("--random", type=int, help="Generate this many bodies instead.")
+    run_parser.add_argument("--distribution", choices=list(DISTRIBUTIONS), default="uniform",
+                            help="Distribution of the generated bodies.")
+    run_parser.add_argument("--seed", type=int, help="Seed of the generated bodies.")
+    run_parser.add_argument("-n", "--steps", type=int, required=True, help="Number of steps.")
+    run_parser.add_argument("-o", "--output", help="CSV file for the final state.")
+    run_parser.add_argument("-t", "--trajectory", help="Binary trajectory file to stream frames to "
+                            "(a new numbered segment file after each merge).")
+    run_parser.add_argument("--stride", type=int, default=1,
+                            help="Write the frames whose step is a multiple of k.")
+    run_parser.add_argument("--checkpoint", help="Checkpoint file, rewritten atomically.")
+    run_parser.add_argument("--checkpoint-every", type=int, default=1000,
+                            help="Steps between checkpoints.")
+    run_parser.add_argument("--profile", help="Dump per-phase timings and counters (.json or .csv).")
+    run_parser.add_argument("--diagnostics", help="Energy/momentum time series (.csv or .npz).")
+    add_parameter_arguments(run_parser)
+    run_parser.set_defaults(func=run)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Run a parameter sweep across processes.")
+    sweep_parser.add_argument("spec", help="JSON sweep specification.")
+    sweep_parser.add_argument("-w", "--workers", type=int, help="Number of processes.")
+    sweep_parser.add_argument("-o", "--output", default="sweep_results.csv", help="Result table (CSV).")
+    sweep_parser.add_argument("--states", help="NPZ file for the final states.")
+    sweep_parser.set_defaults(func=sweep)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+'''
+Conjunto de pruebas de rendimiento (benchmarks) de la simulación, sin interfaz gráfica: cálculo de la
+fuerza con cada método, pasos completos con cada integrador, actualización y dibujo de la gráfica (con el
+backend Agg de matplotlib, sin pantalla), deriva del tiempo por cuadro en una ejecución larga y exportación
+de los datos. Las entradas se generan con una semilla fija, de modo que son reproducibles, y los
+resultados se guardan en un archivo JSON que puede compararse con uno anterior (línea base): si alguna
+prueba es más lenta que la línea base por más del umbral indicado, el programa termina con código 1.
+
+Uso:
+    python bench.py --output resultados.json
+    python bench.py --quick --only force step
+    python bench.py --output nuevos.json --baseline resultados.json --threshold 0.2
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from Backends_file import get_backend, numba_available
+from Forces_file import barnes_hut_accel, direct_accel, particle_mesh_accel
+from Generators_file import uniform_box
+from Simulation_file import Simulation
+
+SUITES = ("force", "step", "render", "drift", "export")
+
+
+def random_system(n, seed=0):
+    '''
+    Genera un sistema aleatorio reproducible de n partículas: masas entre 1 y 20, posiciones y
+    velocidades entre (-10,-10) y (10,10), como las partículas aleatorias de la interfaz.
+
+    :n: Número de partículas. Entero positivo.
+    :seed: Semilla del generador.
+    :return: Tupla (masas, posiciones, velocidades) de arreglos de numpy.
+    '''
+    return uniform_box(n, np.random.default_rng(seed))
+
+
+def random_simulation(n, seed=0, **params):
+    '''
+    Crea una simulación con un sistema aleatorio reproducible de n partículas (el de "random_system"),
+    generadas de una vez con la distribución "uniform".
+
+    :n: Número de partículas. Entero positivo.
+    :seed: Semilla del generador.
+    :params: Atributos de "SimulationParameters" a cambiar.
+    :return: Simulación (objeto de "Simulation").
+    '''
+    simulation = Simulation()
+    for name, value in params.items():
+        setattr(simulation.params, name, value)
+    simulation.generate_particles(n, "uniform", np.random.default_rng(seed))
+    return simulation
+
+
+def measure(function, repeat):
+    '''
+    Mide el tiempo de una función: se ejecuta una vez para calentar (cachés, hilos, compilación) y luego
+    "repeat" veces.
+
+    :function: Función sin argumentos.
+    :repeat: Número de repeticiones medidas.
+    :return: Diccionario con la mediana, el mínimo y el máximo en segundos.
+    '''
+    function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "max_s": max(times),
+            "repeat": repeat}
+
+
+def bench_force(sizes, repeat, direct_max):
+    '''Cálculo de todas las aceleraciones con cada método de fuerza.'''
+    results = []
+    for n in sizes:
+        m, pos, _ = random_system(n)
+        methods = {"barnes_hut": lambda: barnes_hut_accel(m, pos),
+                   "particle_mesh": lambda: particle_mesh_accel(m, pos)}
+        # La suma directa es O(N^2), por lo que solo se mide hasta "direct_max" partículas.
+        if n <= direct_max:
+            methods["direct"] = lambda: direct_accel(m, pos)
+            # Kernel compilado, si Numba está instalado (la primera llamada de "measure" lo compila).
+            if numba_available():
+                methods["direct_numba"] = lambda: get_backend("numba").compute_accel(m, pos)
+        for method, function in methods.items():
+            results.append({"name": f"force.{method}", "n": n, **measure(function, repeat)})
+    return results
+
+
+def bench_step(sizes, repeat, direct_max):
+    '''Un paso completo de la simulación con cada integrador (suma directa).'''
+    results = []
+    for n in sizes:
+        if n > direct_max:
+            continue
+        for integrator in ("leapfrog", "yoshida4", "block", "hermite"):
+            simulation = random_simulation(n, integrator=integrator)
+            results.append({"name": f"step.{integrator}", "n": n, **measure(simulation.step, repeat)})
+    return results
+
+
+def _figure():
+    # El backend Agg dibuja en memoria, sin pantalla.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    return fig, ax
+
+
+def bench_render(sizes, repeat, frames=10):
+    '''
+    Actualización de las estelas y dibujo completo de la gráfica con cada modo de dibujo; cada medición
+    agrega y dibuja "frames" cuadros.
+    '''
+    from Render_file import Extents, SceneRenderer, TrailBuffer
+
+    results = []
+    for n in sizes:
+        if n > 10000:
+            continue
+        _, pos, vel = random_system(n)
+        # "collection_lod": estelas diezmadas al tamaño de un pixel.
+        for name, mode, decimate in (("lines", "lines", False), ("collection", "collection", False),
+                                     ("collection_lod", "collection", True)):
+            fig, ax = _figure()
+            trails, extents = TrailBuffer(500), Extents()
+            renderer = SceneRenderer(ax, mode, decimate)
+            for p in pos:
+                trails.add_body(p)
+            renderer.add_bodies(["#1f77b4"] * n)
+
+            def draw_frames():
+                for _ in range(frames):
+                    pos[:] += vel * 0.001
+                    trails.append(pos)
+                    extents.update(pos)
+                    renderer.update(trails, pos)
+                    xlim, ylim = extents.limits(0.1)
+                    ax.set_xlim(*xlim)
+                    ax.set_ylim(*ylim)
+                    fig.canvas.draw()
+
+            result = measure(draw_frames, repeat)
+            result["frame_s"] = result["median_s"] / frames
+            results.append({"name": f"render.{name}", "n": n, **result})
+            fig.clf()
+    return results
+
+
+def bench_drift(n, frames):
+    '''
+    Deriva del tiempo por cuadro en una ejecución larga: se avanza la simulación, se guarda la
+    trayectoria y se actualizan las estelas y la gráfica en cada cuadro, y se compara el tiempo medio
+    del primer y del último 10 % de los cuadros. Una razón cercana a 1 indica que el costo de cada
+    cuadro no crece con la duración de la simulación.
+    '''
+    from Render_file import Extents, SceneRenderer, TrailBuffer
+    from Trajectory_file import TrajectoryWriter
+
+    simulation = random_simulation(n)
+    fig, ax = _figure()
+    trails, extents = TrailBuffer(simulation.params.trail_length), Extents()
+    renderer = SceneRenderer(ax, "collection")
+    for p in simulation.store.pos:
+        trails.add_body(p)
+    renderer.add_bodies(["#1f77b4"] * n)
+    handle, filename = tempfile.mkstemp(suffix=".traj")
+    os.close(handle)
+    times = []
+    try:
+        with TrajectoryWriter(filename, simulation.store) as trajectory:
+            for _ in range(frames):
+                start = time.perf_counter()
+                simulation.step()
+                trajectory.append(simulation)
+                trails.append(simulation.store.pos)
+                extents.update(simulation.store.pos)
+                renderer.update(trails, simulation.store.pos)
+                xlim, ylim = extents.limits(0.1)
+                ax.set_xlim(*xlim)
+                ax.set_ylim(*ylim)
+                fig.canvas.draw()
+                times.append(time.perf_counter() - start)
+    finally:
+        os.remove(filename)
+    tenth = max(frames // 10, 1)
+    first, last = statistics.mean(times[:tenth]), statistics.mean(times[-tenth:])
+    return [{"name": "drift.frame", "n": n, "frames": frames, "median_s": statistics.median(times),
+             "first_s": first, "last_s": last, "drift_ratio": last / first}]
+
+
+def bench_export(repeat, n, frames):
+    '''Exportación de "frames" cuadros de n partículas a cada formato.'''
+    from Export_file import EXPORT_FORMATS, export_data, particle_state
+    from Trajectory_file import TrajectoryWriter
+
+    # Aquí se necesitan los nombres y colores de las partículas, por lo que se crean sus objetos.
+    simulation = Simulation()
+    simulation.generate_random_particles(n, rng=random.Random(0))
+    directory = tempfile.mkdtemp()
+    trajectory_file = os.path.join(directory, "bench.traj")
+    with TrajectoryWriter(trajectory_file, simulation.store) as trajectory:
+        for _ in range(frames):
+            simulation.step()
+            trajectory.append(simulation)
+    state = particle_state(simulation)
+    results = []
+    try:
+        for extension in EXPORT_FORMATS:
+            filename = os.path.join(directory, "bench" + extension)
+            try:
+                result = measure(lambda: export_data(filename, state, [trajectory_file]), repeat)
+            except ImportError:
+                # Formato opcional (por ejemplo, .parquet sin pyarrow).
+                continue
+            size = os.path.getsize(filename)
+            result.update({"frames": frames, "bytes": size, "frames_per_s": frames / result["median_s"],
+                           "bytes_per_s": size / result["median_s"]})
+            results.append({"name": "export" + extension, "n": n, **result})
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    return results
+
+
+def machine_info():
+    '''Datos de la máquina y de las versiones, para poder interpretar los resultados.'''
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, threshold):
+    '''
+    Compara los resultados con una línea base: una prueba es una regresión si su mediana es mayor que
+    la de la línea base por más de la fracción "threshold".
+
+    :results: Lista de resultados.
+    :baseline: Diccionario del archivo JSON de la línea base.
+    :threshold: Fracción de tolerancia (0.2 = 20 % más lento).
+    :return: Lista de tuplas (nombre, N, razón nuevo/base, es regresión).
+    '''
+    base = {(row["name"], row["n"]): row for row in baseline["results"]}
+    rows = []
+    for row in results:
+        key = (row["name"], row["n"])
+        if key in base:
+            ratio = row["median_s"] / base[key]["median_s"]
+            rows.append((row["name"], row["n"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark suite of the N-body simulation.")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES), help="Suites to run.")
+    parser.add_argument("--sizes", nargs="+", type=int, help="Numbers of bodies (default 10 ... 100000).")
+    parser.add_argument("--direct-max", type=int, default=10000,
+                        help="Largest N for the O(N^2) direct sum and full steps.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case.")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and short runs.")
+    parser.add_argument("-o", "--output", help="JSON file for the results.")
+    parser.add_argument("--baseline", help="JSON results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or ([10, 100, 1000] if args.quick else [10, 100, 1000, 10000, 100000])
+    repeat = 2 if args.quick else args.repeat
+    results = []
+    for suite in args.only:
+        start = time.perf_counter()
+        if suite == "force":
+            results += bench_force(sizes, repeat, args.direct_max)
+        elif suite == "step":
+            results += bench_step(sizes, repeat, args.direct_max)
+        elif suite == "render":
+            results += bench_render([n for n in sizes if n <= 1000], repeat)
+        elif suite == "drift":
+            results += bench_drift(50, 300 if args.quick else 3000)
+        elif suite == "export":
+            results += bench_export(repeat, 10, 1000 if args.quick else 10000)
+        print(f"{suite}: {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    for row in results:
+        extra = f"  drift x{row['drift_ratio']:.2f}" if "drift_ratio" in row else ""
+        print(f"{row['name']:<24} N={row['n']:<7} {row['median_s'] * 1e3:10.3f} ms{extra}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.threshold)
+        regressions = [row for row in rows if row[3]]
+        for name, n, ratio, regressed in rows:
+            print(f"{name:<24} N={n:<7} x{ratio:.2f}{'  REGRESSION' if regressed else ''}")
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,88 +1,111 @@
-import random
-import string
+import os
+import tempfile
+from contextlib import nullcontext
 import tkinter as tk
 import tkinter.colorchooser as colorchooser
 
 import matplotlib.pyplot as plt
 import matplotlib.animation as anim
-import numpy as np
-import openpyxl # Ejecutar en la terminal "python3 -m pip install openpyx"
 
-from numpy.linalg import norm
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from openpyxl.styles import Font, Alignment, Border, Side
 from tkinter import ttk, filedialog, messagebox
 
-from Body_file import Body
-
-# Constante gravitacional en Unidades astronómicas, masas solares y años.
-G = 4 * np.pi**2 
-
-class SimulationParameters:
-    '''
-    Contiene los parámetros de la simulación
-
-    Atributos:
-        dt (float): El valor de diferencia entre dos tiempos consecutivos (delta t).
-        user_dt (float): El valor de dt ingresado por el usuario.
-        eps (float): El valor de épsilon para el algoritmo de corrección.
-        correctAlg_enabled (bool): Estado del algormitmo de corrección (Activado o desactiado)
-        animation_interval (int): milisegundos entre cada iteración de la animación.
-
-    Métodos: N/A
-    '''
-    def __init__(self):
-        self.user_dt = 0.001
-        self.dt = self.user_dt
-        self.eps = 5.0
-        self.animation_interval = 50
-        self.correctAlg_enabled = False
+from Backends_file import params_backend
+from Checkpoint_file import load_checkpoint, save_checkpoint
+from Export_file import ExportJob, particle_state
+from Profiler_file import PROFILER
+from Render_file import Extents, SceneRenderer, TrailBuffer
+from Replay_file import ReplayWindow, TrajectoryReplay
+from Simulation_file import Simulation
+from Trajectory_file import TrajectoryWriter
+from Worker_file import SimulationWorker
 
 
 class ParticleManager:
     '''
-    Contiene las funciones que manejarán las partículas y sus parámetros iniciales en la simulación.
+    Contiene las funciones que manejarán las partículas y sus parámetros iniciales en la simulación, 
+    junto con sus gráficas y el guardado de sus datos. La física está en el núcleo de la simulación 
+    (objeto de "Simulation"), que no depende de la interfaz.
     
     Atributos:
-        bodies (list): La lista de las partículas en la simulación. Es una lista de tuplas cada una de las 
-        cuales contiene el objeto, sus posiciones en x, sus posiciones en y, su gráfica (ax.plot) y sus
-        velocidades a lo largo de la simulación.
-        Xall (list): La lista de todas las posiciones en x de todas las partículas a lo largo de toda la 
-        simulación.
-        Yall (list): La lista de todas las posiciones en x de todas las partículas a lo largo de toda la 
-        simulación.
-        frame_data (list): Los datos del cuadro actual de la simulación.
-        saved_filename (str): Nombre del archivo a guardar si el usuario desea guardar los datos simulados.
+        simulation (Simulation): El núcleo de la simulación, con el almacén de partículas ("store") que 
+        guarda las masas, posiciones y velocidades de todas las partículas en arreglos de numpy.
+        ax (Axes): La subgráfica de matplotlib en la que se dibujan las partículas.
+        bodies (list): La lista de las partículas (objetos de "Body") en la simulación.
+        renderer (SceneRenderer): Los objetos gráficos de las partículas (una curva por partícula, o un 
+        solo LineCollection y un solo scatter para todas según "render_mode").
+        trails (TrailBuffer): Las estelas de las partículas, en un búfer circular de "trail_length" 
+        puntos por partícula.
+        shown (list): Las partículas (objetos de "Body") que tienen estela y gráfica, en el orden de sus 
+        filas en "trails".
+        extents (Extents): Los extremos de todas las posiciones por las que han pasado las partículas, 
+        usados para los límites de la gráfica.
+        trajectory (TrajectoryWriter): El escritor que guarda en un archivo temporal las posiciones y 
+        velocidades de cada cuadro (cada "trajectory_stride" cuadros) en lugar de mantenerlas en memoria.
+        trajectory_files (list): Los archivos temporales de la trayectoria; se empieza uno nuevo cada vez 
+        que cambia el número de partículas.
+        worker (SimulationWorker): El hilo que avanza la simulación fuera de la interfaz, o None si la 
+        simulación se avanza en la misma función de la animación. Con el hilo, todo cambio a la 
+        simulación se le envía como un comando.
+        export_job (ExportJob): El hilo de la última exportación de los datos, o None.
+        replay (ReplayWindow): La última ventana de reproducción de la trayectoria, o None.
 
     Métodos:
         add_particle(masa, pos0, vel0, color, name="body"): Crea la partícula con los parámetros 
         iniciales (masa, posición y velocidad inicial), color y nombre indicados, la agrega a 
-        la lista de partículas y crea su correspondiente curva en la gráfica.
+        la lista de partículas y crea su correspondiente gráfica.
 
         generate_random_particles(num_particles): Genera un número especificado de partículas aleatorias 
         haciendo uso del módulo random y funciones random_color() y random_name().
 
+        sync_bodies(pos, bodies=None): Crea las estelas y gráficas de las partículas agregadas a la 
+        simulación que aún no las tienen y elimina las de las partículas fusionadas.
+
+        hold(): Contexto durante el cual el hilo de la simulación (si lo hay) está detenido.
+
         clear_particles(): Borra todas las partículas de la lista, eliminándolas de la simulación y 
-        borra los datos de la gráfica y de Xall y Yall.
+        borra los datos de la gráfica, de las estelas y de los extremos.
+
+        record_frame(): Guarda el cuadro actual de la simulación en el archivo de la trayectoria.
+
+        close_trajectory(): Cierra el archivo actual de la trayectoria.
+
+        export_data(): Maneja la opción de guardar la información de la simulación: el estado actual y 
+        los datos de cada cuadro, en un archivo .xlsx (Excel), .csv, .npz o .parquet escrito en un hilo 
+        aparte.
 
-        save_particle_data(): Maneja la opción de guardar la información actual de la simulación. Usa 
-        la librería openpyxl para crear un archivo de tipo .xlsl (Excel) donde se va a guardar la 
-        masa, posición, velocidad y color de cada partícula, si el usuario lo desea.
+        save_checkpoint(): Guarda un punto de control binario con todo el estado de la simulación.
 
-        save_frame_data():
+        restore_checkpoint(): Borra las partículas y restaura la simulación desde un punto de control.
+
+        open_replay(): Abre la ventana de reproducción de la trayectoria grabada.
     '''
-    def __init__(self):
-        self.bodies = []
-        self.Xall = []
-        self.Yall = []
-        self.frame_data = []
+    def __init__(self, simulation, ax, threaded=False):
+        self.simulation = simulation
+        self.ax = ax
+        self.trails = TrailBuffer(simulation.params.trail_length)
+        self.shown = []
+        self.extents = Extents()
+        self.renderer = SceneRenderer(ax, simulation.params.render_mode, simulation.params.trail_decimation)
+        self.trajectory = None
+        self.trajectory_files = []
+        self.export_job = None
+        self.replay = None
+        self.worker = None
+        if threaded:
+            self.worker = SimulationWorker(simulation, on_step=self.record_frame)
+            self.worker.start()
+
+
+    @property
+    def bodies(self):
+        return self.simulation.bodies
 
 
     def add_particle(self, masa, pos0, vel0, color, name="body"):
         '''
         Crea la partícula con los parámetros iniciales (masa, posición y velocidad inicial), color 
-        y nombre indicados, la agrega a la lista de partículas y crea su correspondiente curva 
-        en la gráfica.
+        y nombre indicados, la agrega a la lista de partículas y crea su correspondiente gráfica.
 
         :param masa: Masa de la partícula. Flotante.
         :param pos0: Posición inicial de la partícula. Tupla de R2.
@@ -90,210 +113,233 @@ class ParticleManager:
         :param color: Representación hexadecimal del color de la partícula. Cadena de caracteres.
         :return: N/A.
         '''
-        new_body = Body(masa, pos0, vel0, color, name) # Crea un cuerpo (objeto de la clase Body) con los 
-        # parámetros indicados.
-        line_obj, = ax.plot([], [], color=color, linestyle='-', linewidth=1) # Crea la gráfica del objeto.
-        self.bodies.append((new_body, [new_body.pos[0]], [new_body.pos[1]], line_obj, [new_body.vel]))
-        # Se agrega la información de la partícula a la lista de partículas 'bodies'.
+        # Crea un cuerpo (objeto de la clase Body) con los parámetros indicados en el almacén de 
+        # partículas; con el hilo de la simulación se le envía como comando, y la estela y la gráfica se 
+        # crean al recibir el siguiente cuadro.
+        if self.worker is not None:
+            self.worker.submit(self.simulation.add_particle, masa, pos0, vel0, color, name)
+        else:
+            self.simulation.add_particle(masa, pos0, vel0, color, name)
+            self.sync_bodies(self.simulation.store.pos)
     
 
     def generate_random_particles(self, num_particles):
         '''
-        Genera un número especificado de partículas aleatorias haciendo uso del módulo random y 
-        funciones random_color() y random_name().
+        Genera un número especificado de partículas aleatorias haciendo uso del núcleo de la simulación,
+        que usa el módulo random y las funciones random_color() y random_name().
 
         :param num_particles: número de partículas a generar. Entero positivo.
         :return: N/A.
         '''
 
-        for k in range(num_particles):
-            # Se inicializan los parámetros aleatoriamente para cada partícula a agregar.
-            masa = random.uniform(1, 20)
-            pos0 = (random.uniform(-10, 10), random.uniform(-10, 10))
-            vel0 = (random.uniform(-10, 10), random.uniform(-10, 10))
-            color = random_color()
-            name = random_name()
-            new_body = Body(masa, pos0, vel0, color, name)
-            line_obj, = ax.plot([], [], color=color, linestyle='-', linewidth=1) # Se inicializa la gráfica 
-            # de cada partícula.
-            self.bodies.append((new_body, [new_body.pos[0]], [new_body.pos[1]], line_obj, [new_body.vel]))
-            # Se ingresa la partícula a la lista.
+        # Refiérase a los comentarios de la función "add_particle" puesto que sigue la misma lógica.
+        if self.worker is not None:
+            self.worker.submit(self.simulation.generate_random_particles, num_particles)
+        else:
+            self.simulation.generate_random_particles(num_particles)
+            self.sync_bodies(self.simulation.store.pos)
+
+
+    def sync_bodies(self, pos, bodies=None):
+        '''
+        Crea las estelas y las gráficas de las partículas que se agregaron a la simulación y que aún no 
+        las tienen, a partir de sus posiciones en el cuadro recibido. Si se eliminaron partículas (por 
+        fusiones), se descartan sus estelas y gráficas y las demás se reordenan como en la simulación.
+
+        :pos: Posiciones de todas las partículas en el cuadro. Arreglo de numpy de Nx2.
+        :bodies: Objetos "Body" de las partículas en el cuadro, en el mismo orden; si es None se usan 
+        los de la simulación.
+        :return: N/A.
+        '''
+        bodies = self.bodies if bodies is None else bodies
+        shown = self.shown
+        # Mientras solo se agreguen partículas, las que ya se dibujan son el inicio de la lista; una 
+        # eliminación desplaza o quita la última de ellas.
+        if shown and (len(bodies) < len(shown) or bodies[len(shown) - 1] is not shown[-1]):
+            rows_of = {id(body): row for row, body in enumerate(shown)}
+            rows, new = [], []
+            for k, body in enumerate(bodies):
+                row = rows_of.get(id(body))
+                if row is None:
+                    new.append(k)
+                    row = len(shown) + len(new) - 1
+                rows.append(row)
+            self.add_trails(pos, bodies, new)
+            self.trails.select(rows)
+            self.renderer.select(rows)
+            self.shown = list(bodies)
+            return
+        known = len(shown)
+        if len(bodies) > known:
+            self.add_trails(pos, bodies, range(known, len(bodies)))
+            self.shown += bodies[known:]
+
+
+    def add_trails(self, pos, bodies, indices):
+        '''Crea de una vez las estelas y las gráficas de las partículas de los índices indicados.'''
+        self.trails.add_bodies(pos[indices])
+        self.renderer.add_bodies([bodies[k].color for k in indices])
+
+
+    def hold(self):
+        '''
+        Contexto ("with") durante el cual el hilo de la simulación, si lo hay, está detenido, de modo 
+        que se pueden leer o modificar la simulación y el archivo de la trayectoria desde la interfaz.
+        '''
+        return self.worker.hold() if self.worker is not None else nullcontext()
     
 
     def clear_particles(self):
         '''
         Borra todas las partículas de la lista, eliminándolas de la simulación y borra los datos de la 
-        gráfica y de Xall y Yall.
+        gráfica, de las estelas y de los extremos.
         '''
-        self.bodies = []
-        self.Xall.clear()
-        self.Yall.clear()
-        ax.clear()
-        ax.grid(True) 
-        fig_canvas.draw()
-
+        # Se espera a que termine la exportación en curso, que lee los archivos de la trayectoria.
+        if self.export_job is not None:
+            self.export_job.join()
+        # La ventana de reproducción tiene mapeados los archivos de la trayectoria que se van a borrar.
+        if self.replay is not None and self.replay.window.winfo_exists():
+            self.replay.close()
+        with self.hold():
+            self.simulation.clear()
+            # Se cierran y borran los archivos de la trayectoria.
+            self.close_trajectory()
+            for filename in self.trajectory_files:
+                os.remove(filename)
+            self.trajectory_files = []
+            # Se descartan los cuadros anteriores al borrado que no se han dibujado.
+            if self.worker is not None:
+                self.worker.drain()
+        self.trails = TrailBuffer(self.simulation.params.trail_length)
+        self.shown = []
+        self.extents.clear()
+        self.ax.clear()
+        self.ax.grid(True) 
+        self.renderer.reset()
+        self.ax.figure.canvas.draw()
+
+
+    def record_frame(self):
+        '''
+        Guarda el cuadro actual de la simulación en el archivo temporal de la trayectoria, con la precisión 
+        de las posiciones y velocidades. Si cambió el número de partículas o la precisión (o aún no hay 
+        archivo), se cierra el archivo actual y se empieza uno nuevo.
 
-    def save_particle_data(self):
+        :return: N/A.
+        '''
+        store = self.simulation.store
+        if (self.trajectory is None or self.trajectory.n_bodies != len(store) 
+                or self.trajectory.dtype != store.dtype):
+            self.close_trajectory()
+            handle, filename = tempfile.mkstemp(suffix=".traj")
+            os.close(handle)
+            self.trajectory = TrajectoryWriter(filename, store, 
+                                               stride=self.simulation.params.trajectory_stride, 
+                                               dtype=store.dtype)
+            self.trajectory_files.append(filename)
+        with PROFILER.phase("trajectory"):
+            self.trajectory.append(self.simulation)
+
+
+    def close_trajectory(self):
+        '''Cierra el archivo actual de la trayectoria, escribiendo los cuadros pendientes.'''
+        if self.trajectory is not None:
+            self.trajectory.close()
+            self.trajectory = None
+
+
+    def export_data(self):
         '''
-        Función encargada de crear un archivo .xlsx con los datos de las partículas en el tiempo actual e 
-        crear una segunda hoja para posteriormente guardar la información de la simulación en cada tiempo 
-        (frame).
+        Maneja la opción de guardar la información de la simulación: el estado actual de cada partícula 
+        (masa, posición, velocidad y color) y la posición y velocidad en cada cuadro, leídas de los 
+        archivos de la trayectoria. El formato depende de la extensión escogida: .xlsx (Excel, con las 
+        hojas "Particle Data" y "Frame Data"), .csv, .npz o .parquet. El archivo se escribe en un hilo 
+        aparte, para no congelar la interfaz.
 
-        :return: N/A
+        :return: Hilo de la exportación (objeto de "ExportJob"), o None si no se exporta.
         '''
         filename = filedialog.asksaveasfilename(defaultextension=".xlsx", \
-                                                filetypes=[("Excel files", "*.xlsx")])
-        
-        if filename:
-            # Si se ingresó un nombre, se crea un archivo .xlsx.
-            wb = openpyxl.Workbook()
-            ws = wb.active # Accede a la hoja 1 creada por defecto.
-            ws.title = "Particle Data"
-            headers = ["Name", "Mass", "Position X", "Position Y", "Velocity X", "Velocity Y", "Color"]
-            ws.append(headers) # La primera fila tendrá los nombres de las variables a organizar.
-            header_font = Font(bold=True) # Configura el estilo de las palabras del encabezado a negrilla.
-            # Configura las líneas de las casillas del encabezado a delgadas.
-            border = Border(left=Side(border_style="thin"), right=Side(border_style="thin"),
-                        top=Side(border_style="thin"), bottom=Side(border_style="thin"))
-            
-            # Configura las casillas de la primera fila con los atributos anteriores.
-            for cell in ws[1]: 
-                cell.font = header_font
-                cell.border = border
-                # Alínea los textos al centro de las casillas.
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            # Accede a las tuplas de 'bodies' para guardar la posición y velocidad actual de cada 
-            # partícula en la hoja de cálculo (solo se usa el primer elemento, que corresponde al 
-            # objeto de cada partícula).
-            for body, _, _, _, _ in self.bodies:
-                ws.append([
-                    body.name,
-                    body.m,
-                    body.pos[0],
-                    body.pos[1],
-                    body.vel[0],
-                    body.vel[1],
-                    body.color
-                ])  
-
-            # Se configura cada fila después del encabezado (min_row = 2) de la misma forma que el 
-            # encabezado sin las negrillas.
-            for row in ws.iter_rows(min_row=2, max_col=len(headers), max_row=ws.max_row):
-                for cell in row:
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            # Itera sobre cada columna para ajustar su ancho dependiendo del elemento más largo.
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    # Se usa un "try: [...] \except: pass" para ignorar casillas vacías que aparecen cuando 
-                    # dos o más partículas se crean en tiempos distintos.
-                    try:
-                        # 15 se escogió para no ajustar el ancho para flotantes tan largos por estética.
-                        if len(str(cell.value)) > max_length and len(str(cell.value)) <= 15:
-                            max_length = len(cell.value) # Se ajusta la longitud máxima a la máxima hasta 
-                            # entonces.
-                    except:
-                            pass
-                # Se le suman 2 espacios para no verse tan apiñados los valores.
-                adjusted_width = max_length + 2 
-                # Se ajusta el ancho de la columna actual.
-                ws.column_dimensions[column_letter].width = adjusted_width
-            # Se crea la segunda hoja donde se guardará la información por cada iteración (frame) de 
-            # la simulación.
-            ws_frames = wb.create_sheet(title="Frame Data")
-            frame_headers = ["Frame"]
-            # Se crea la lista del encabezado de dicha hoja donde van los nombres de las variables para 
-            # cada masa
-            for body in self.bodies:
-                frame_headers.append(f"{body[0].name} PosX")
-                frame_headers.append(f"{body[0].name} PosY")
-                frame_headers.append(f"{body[0].name} VelX")
-                frame_headers.append(f"{body[0].name} VelY")
-            # Se escribe dicha lista como encabezado a la hoja.
-            ws_frames.append(frame_headers)
-
-            # Configura el encabezado de la misma forma que en la primera hoja.
-            for cell in ws_frames[1]:
-                cell.font = header_font
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-
-            # Ajusta el ancho de las columnas de la misma forma que en la primera hoja.
-            for column in ws_frames.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length and len(str(cell.value)) <= 15:
-                            max_length = len(cell.value)
-                    except:
-                            pass
-                adjusted_width = (max_length + 2)
-                ws_frames.column_dimensions[column_letter].width = adjusted_width
-            wb.save(filename)
-            # Se guarda el nombre del archivo para actualizaciones en cada iteración; se usa en la 
-            # próxima función.
-            self.saved_filename = filename  
-
-
-    def save_frame_data(self):
+                                                filetypes=[("Excel files", "*.xlsx"), 
+                                                           ("CSV files", "*.csv"), 
+                                                           ("NumPy files", "*.npz"), 
+                                                           ("Parquet files", "*.parquet")])
+        if not filename:
+            return None
+        if self.export_job is not None and self.export_job.is_alive():
+            messagebox.showwarning("Export Running", "Please wait for the current export to finish.")
+            return None
+        # Con el hilo de la simulación detenido se copia el estado actual y se escriben al disco los 
+        # cuadros pendientes de la trayectoria; luego la simulación puede seguir mientras se exporta.
+        with self.hold():
+            state = particle_state(self.simulation)
+            if self.trajectory is not None:
+                self.trajectory.flush()
+            trajectory_files = list(self.trajectory_files)
+        self.export_job = ExportJob(filename, state, trajectory_files)
+        self.export_job.start()
+        return self.export_job
+
+
+    def save_checkpoint(self):
         '''
-        Función encargada de guardar en la segunda hoja del archivo creado por la función anterior los 
-        datos de la simulación en cada tiempo (frame).
+        Guarda un punto de control con todo el estado de la simulación (a diferencia del archivo .xlsx, 
+        se puede cargar de nuevo y continuar exactamente donde quedó).
 
-        :return: None o N/A.
+        :return: N/A.
         '''
-        # Se maneja el error de que el usuario no ingrese un nombre para el archivo.
-        if not hasattr(self, 'saved_filename'):
-            # El método "hasattr(obj, attr)" verifica que el objeto 'obj' tenga el atributo "attr"; en este
-            # caso se verifica que en esta clase exista el atributo "saved_filename" creado al ingresar un
-            # nombre para el archivo.
-            messagebox.showerror("Error", "Primero guarda los datos de las partículas.")
-            return # Para acabar la función retornando "None" en caso de no haber ingresado un nombre.
-    
-        # Se vuelve a abrir el libro de excel.
-        wb = openpyxl.load_workbook(self.saved_filename)
-        # Se accede a la segunda hoja.
-        ws_frames = wb["Frame Data"]
-        # Se guarda cada lista de "frame_data" de cada tiempo (frame) en cada fila de la segunda hoja. 
-        for frame in self.frame_data:
-            ws_frames.append(frame)
-        
-        # Guarda el archivo y avisa al usuario que ha sido guardado exitosamente.
-        wb.save(self.saved_filename)
-        messagebox.showinfo("Datos Guardados", f"Datos guardados en {self.saved_filename}")
-    
-    
-# Este objeto contendrá los parámetros de la simulación.
-simulation_params = SimulationParameters()
-# Este objeto será el responsable de gestionar las partículas.
-particle_manager = ParticleManager()
-
-
-def random_color():
-    '''
-    Escoge un color al azar usando el método "randint" de la librería "random" hallando una 
-    representación hexadecimal con números aleatorios.
+        filename = filedialog.asksaveasfilename(defaultextension=".nbck", \
+                                                filetypes=[("Checkpoint files", "*.nbck")])
+        if filename:
+            with self.hold():
+                save_checkpoint(self.simulation, filename)
+            messagebox.showinfo("Punto de Control Guardado", f"Punto de control guardado en {filename}")
 
-    :return: Cadena de caracteres de representación hexadecimal del color.
-    '''
-    return '#%06x' % random.randint(0, 0xFFFFFF)# Genera un número de 6 dígitos (06) en hexadecimal (x).
 
+    def restore_checkpoint(self):
+        '''
+        Borra las partículas actuales y restaura la simulación desde un punto de control.
 
-def random_name(length=5):
-    '''
-    Arroja un nombre aleatorio usando el método "choices" de la librería "random" para escoger al azar 
-    entre una letra mayúscula y un número de 0 a 9 5 veces para un nombre aleatorio de 5 caracteres. 
-    Ejemplos: 6ALVF, 1O057, KFQB5.
+        :return: None o N/A.
+        '''
+        filename = filedialog.askopenfilename(filetypes=[("Checkpoint files", "*.nbck")])
+        if not filename:
+            return
+        self.clear_particles()
+        try:
+            with self.hold():
+                load_checkpoint(filename, self.simulation)
+                self.sync_bodies(self.simulation.store.pos)
+        except ValueError as error:
+            messagebox.showerror("Invalid Checkpoint", str(error))
+
+
+    def open_replay(self):
+        '''
+        Abre una ventana que reproduce la trayectoria grabada hasta ahora (o, si no hay, los archivos de 
+        trayectoria que escoja el usuario), leyendo los cuadros de los archivos mapeados en memoria, sin 
+        volver a calcular las fuerzas ni detener la simulación.
 
-    :length: Longitud del nombre inicializada a 5 caracteres. Número entero positivo.
-    :return: Nombre aleatorio de 5 caracteres.
-    '''
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
+        :return: Ventana de reproducción (objeto de "ReplayWindow"), o None.
+        '''
+        # Se escriben al disco los cuadros pendientes, para que la reproducción llegue al cuadro actual.
+        with self.hold():
+            if self.trajectory is not None:
+                self.trajectory.flush()
+            trajectory_files = list(self.trajectory_files)
+        if not trajectory_files:
+            trajectory_files = filedialog.askopenfilenames(filetypes=[("Trajectory files", "*.traj")])
+        replay = TrajectoryReplay(trajectory_files) if trajectory_files else None
+        if replay is None or not len(replay):
+            messagebox.showwarning("Replay", "There are no recorded frames to replay.")
+            return None
+        self.replay = ReplayWindow(replay, self.ax.figure.canvas.get_tk_widget().winfo_toplevel(), 
+                                   self.simulation.params.trail_length)
+        return self.replay
+    
+    
+# Este objeto es el núcleo de la simulación y contiene sus parámetros.
+simulation = Simulation()
+simulation_params = simulation.params
 
 
 # Dos funciones similares para verificar los valores ingresados de dt y epsilon
@@ -339,6 +385,45 @@ def verify_eps_input(entry, label):
         messagebox.showerror("Invalid Input", "Please enter a valid number for epsilon")
 
 
+def verify_length_input(entry, label, name):
+    '''
+    Función encargada de comprobar una longitud no negativa de los parámetros para ser asignada: el 
+    suavizado de Plummer ("softening") o la distancia de captura de las fusiones ("capture_radius"). 
+    Ambos evitan que un encuentro cercano reduzca el dt de todo el sistema casi a cero; 0 los desactiva.
+
+    :label: La etiqueta que muestra el valor actual.
+    :name: Nombre del atributo de "SimulationParameters".
+    :return: N/A.
+    '''
+    # Refiérase a los comentarios de la función "verify_dt_input" puesto que sigue la misma lógica.
+    try:
+        value = float(entry.get())
+        if value < 0:
+            raise ValueError("The length must not be negative.")
+        setattr(simulation_params, name, value)
+        label.config(text=str(value))
+    except ValueError:
+        messagebox.showerror("Invalid Input", "Please enter a non-negative number")
+
+
+def verify_steps_input(entry, label):
+    '''
+    Función encargada de comprobar el número de pasos de la simulación por cada cuadro dibujado.
+
+    :label: La etiqueta que muestra el valor actual del número de pasos por cuadro.
+    :return: N/A
+    '''
+    # Refiérase a los comentarios de la función "verify_dt_input" puesto que sigue la misma lógica.
+    try:
+        steps_value = int(entry.get())
+        if steps_value <= 0:
+            raise ValueError("Steps per frame must be a positive integer.")
+        simulation_params.steps_per_frame = steps_value
+        label.config(text=str(steps_value))
+    except ValueError:
+        messagebox.showerror("Invalid Input", "Please enter a valid integer for steps per frame")
+
+
 def add_particle():
     '''
     Función a ejecutar al presionar el botón que agrega partículas no aleatorias. Recibe todos los 
@@ -398,71 +483,79 @@ def generate_random_particles():
 
 def animate(frame):
     '''
-    Función a ejecutar en cada iteración de la animación (parámetro del FuncAnimation). Actualiza la 
-    lista de partículas del "particle_manager" con los datos de la iteración y ajusta la gráfica.
+    Función a ejecutar en cada iteración de la animación (parámetro del FuncAnimation). Dibuja el 
+    cuadro más reciente publicado por el hilo de la simulación (o, sin hilo, avanza la simulación) y 
+    ajusta la gráfica.
 
     :frame: número de la iteración actual.
-    :return: None o N/A. 
+    :return: Lista de los objetos gráficos actualizados (para el "blitting"). 
     '''
-    if len(particle_manager.bodies) == 0:
-        return
-    # "frame_data" es una lista que contiene la información de la iteración actual para ser guardada
-    # en el archivo si el usuario lo desea.
-    frame_data = [frame] 
-    # Se accede a la lista de cuerpos de la simulación para ser actualizada.
-    for body, x_data, y_data, line_obj, vel_data in particle_manager.bodies:
-
-        # Pasos de la integración "leapfrog": Se actualiza la velocidad a la mitad del intervalo y 
-        # se calcula la posición al final con dicha velocidad.
-        old_vel = body.vel.copy()
-        body.update_vel([b[0] for b in particle_manager.bodies], simulation_params.dt)
-        body.update_pos(simulation_params.dt)
-        new_vel = body.vel.copy()
-
-        # Algoritmo de corrección  del delta t; si la magnitud de la diferencia de dos velocidades
-        # es mayor a épsilon, el dt se corrige para que, dependiendo de la aceleración sufrida por 
-        # el objeto, el cambio en la rapidez no sea mayor a este valor. Esto permite que, una vez se 
-        # cumpla la desigualdad (se supere el épsilon), para la próxima iteración se corriga el dt.
-        if simulation_params.correctAlg_enabled and norm(old_vel - new_vel) > simulation_params.eps:
-            simulation_params.dt = simulation_params.eps / norm(body.r_accel)
-
-        # Se agregan las posiciones y velocidades actuales de la partícula a sus respectivas listas
-        # en la lista de partículas y a la lista de todas las posiciones en X y en Y.
-        x_data.append(body.pos[0])
-        y_data.append(body.pos[1])
-        vel_data.append(body.vel)
-        particle_manager.Xall.append(body.pos[0])
-        particle_manager.Yall.append(body.pos[1])
-
-        # Se actualiza la gráfica de la partícula con los datos actuales de posición.
-        line_obj.set_data(x_data, y_data)
-        
-        # A frame_data se le agregan los datos actuales.
-        frame_data.append(body.pos[0])
-        frame_data.append(body.pos[1])
-        frame_data.append(body.vel[0])
-        frame_data.append(body.vel[1])
-    
-    # Revisa que el usuario todavía desee corregir. Si no lo desea, devuelve el dt al ingresado.
-    if not simulation_params.correctAlg_enabled:
-        simulation_params.dt = simulation_params.user_dt
-    
-    # Agrega los datos de la iteración a la lista de los datos de la simulación.
-    particle_manager.frame_data.append(frame_data)
+    worker = particle_manager.worker
+    if worker is not None:
+        report_worker_error()
+        # Se toma el cuadro más reciente, descartando los que no alcanzaron a dibujarse; si el hilo aún 
+        # no ha publicado uno nuevo, no hay nada que actualizar.
+        snapshot = worker.latest_frame()
+        if snapshot is None:
+            return particle_manager.renderer.artists()
+        pos, bodies = snapshot.pos, snapshot.bodies
+    else:
+        if len(particle_manager.bodies) == 0:
+            return []
+        # Se avanza la simulación "steps_per_frame" pasos (integración y algoritmo de corrección) en el 
+        # núcleo por cada cuadro dibujado, de modo que la velocidad de la simulación no está limitada por 
+        # el costo de dibujar. Se guarda la posición y velocidad de cada paso en el archivo de la 
+        # trayectoria, para ser guardadas en el archivo .xlsx si el usuario lo desea.
+        for _ in range(simulation_params.steps_per_frame):
+            simulation.step()
+            particle_manager.record_frame()
+        pos, bodies = simulation.store.pos, simulation.store.bodies
+    # Se crean las gráficas de las partículas agregadas desde el último cuadro y se eliminan las de las 
+    # partículas fusionadas.
+    particle_manager.sync_bodies(pos, bodies)
+    if len(pos) == 0 or len(pos) != len(particle_manager.trails):
+        return particle_manager.renderer.artists()
+    with PROFILER.phase("draw"):
+        artists = draw_frame(pos)
+    PROFILER.count("frames_drawn")
+    return artists
+
+
+def draw_frame(pos):
+    '''
+    Agrega las posiciones del cuadro a las estelas y actualiza las gráficas y los límites de la gráfica.
+
+    :pos: Posiciones de todas las partículas en el cuadro. Arreglo de numpy de Nx2.
+    :return: Lista de los objetos gráficos actualizados.
+    '''
+    # Se agregan las posiciones actuales de todas las partículas a sus estelas y a los extremos de todas 
+    # las posiciones.
+    particle_manager.trails.append(pos)
+    particle_manager.extents.update(pos)
+
+    # Se actualizan las gráficas de las partículas con sus estelas.
+    artists = particle_manager.renderer.update(particle_manager.trails, pos)
     
-    # Estos "deltas" se usan para dejar un espaciado, que se escogió como 1/10 del rango de posiciones
-    # en su respectivo eje, entre la partícula más lejana en cada eje y el borde de la gráfica. 
-    axdelta = (max(particle_manager.Xall) - min(particle_manager.Xall))/10
-    aydelta = (max(particle_manager.Yall) - min(particle_manager.Yall))/10
-    # Se actualizan los límites de la gráfica para mostrar todas las trayectorias de las partículas:
-    # si las partículas se acercan, la gráfica se mantiene; si las partículas se alejan, la gráfica 
-    # se expande.
-    ax.set_xlim(min(particle_manager.Xall) - axdelta, max(particle_manager.Xall) + axdelta)
-    ax.set_ylim(min(particle_manager.Yall) - aydelta, max(particle_manager.Yall) + aydelta)
-    print("\n")
-    ax.grid(True)
-    # Dibuja la nueva gráfica en el lienzo de tkinter.
-    fig_canvas.draw()
+    # Se actualizan los límites de la gráfica para mostrar todas las trayectorias de las partículas, 
+    # dejando un espaciado de 1/10 del rango de posiciones en su respectivo eje: si las partículas se 
+    # acercan, la gráfica se mantiene; si las partículas se alejan, la gráfica se expande.
+    if particle_manager.renderer.mode == "lines":
+        xlim, ylim = particle_manager.extents.limits(0.1)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*ylim)
+        ax.grid(True)
+        # Dibuja la nueva gráfica en el lienzo de tkinter.
+        fig_canvas.draw()
+    elif not particle_manager.extents.within(ax.get_xlim(), ax.get_ylim()):
+        # Con "blitting" solo se redibujan las partículas sobre el fondo guardado, por lo que los límites 
+        # solo se cambian cuando alguna partícula sale de la gráfica, con un espaciado mayor (1/4 del 
+        # rango) para que esto ocurra pocas veces; en ese caso se redibuja todo (ejes y cuadrícula) y 
+        # FuncAnimation guarda el nuevo fondo.
+        xlim, ylim = particle_manager.extents.limits(0.25)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*ylim)
+        fig_canvas.draw()
+    return artists
 
 
 animation = None
@@ -471,16 +564,23 @@ animation = None
 def start_animation(canvas):
     '''A ejecutar al presionar el botón que comienza la animación.'''
     global animation
-    # Si no existía animación, se asigna a la variable la animación de "FuncAnimation"
+    if particle_manager.worker is not None:
+        particle_manager.worker.resume()
+    # Si no existía animación, se asigna a la variable la animación de "FuncAnimation". En el modo 
+    # "collection" se usa "blitting": en cada cuadro solo se redibujan los objetos de las partículas.
     if animation is None:
-        animation = anim.FuncAnimation(fig, animate, \
-                                       interval=simulation_params.animation_interval, blit=False)
+        animation = anim.FuncAnimation(fig, animate, init_func=particle_manager.renderer.artists, \
+                                       interval=simulation_params.animation_interval, \
+                                       blit=particle_manager.renderer.mode == "collection", \
+                                       cache_frame_data=False)
     canvas.draw()
 
 
 def pause_animation():
     '''Pausa la animación si existe. Se ejecuta al presionar su respectivo botón.'''
     global animation
+    if particle_manager.worker is not None:
+        particle_manager.worker.pause()
     if animation is not None:
         animation.event_source.stop()
 
@@ -489,17 +589,137 @@ def resume_animation():
     '''Continúa la animación si está pausada. Se ejcuta al presionar su respectivo botón.'''
     global animation
     if animation is not None:
+        if particle_manager.worker is not None:
+            particle_manager.worker.resume()
         animation.event_source.start()
 
 
+def toggle_fast_render(var):
+    '''
+    Cambia entre el modo de dibujo rápido (un solo LineCollection y un solo scatter con "blitting") y el 
+    modo de una curva por partícula. Si la animación ya comenzó, se reinicia con el nuevo modo.
+    '''
+    global animation
+    simulation_params.render_mode = "collection" if var.get() else "lines"
+    particle_manager.renderer.set_mode(simulation_params.render_mode)
+    particle_manager.renderer.update(particle_manager.trails, particle_manager.trails.last())
+    if animation is not None:
+        animation.event_source.stop()
+        animation = None
+        start_animation(fig_canvas)
+    else:
+        fig_canvas.draw()
+
+
+def save_data():
+    '''
+    Se ejecuta al presionar el botón de guardar los datos: comienza la exportación en un hilo aparte y 
+    revisa periódicamente si terminó para avisar al usuario.
+    '''
+    job = particle_manager.export_data()
+    if job is not None:
+        window.after(200, check_export, job)
+
+
+def check_export(job):
+    '''Avisa al usuario cuando termina la exportación (o si falló); si no ha terminado, vuelve a revisar.'''
+    if job.is_alive():
+        window.after(200, check_export, job)
+    elif job.error is not None:
+        messagebox.showerror("Export Error", str(job.error))
+    else:
+        messagebox.showinfo("Datos Guardados", f"Datos guardados en {job.filename}")
+
+
+def status_text():
+    '''
+    Texto del panel de estado: iteración, tiempo simulado, dt y número de partículas, cuadros descartados 
+    por el hilo de la simulación, el último registro de los diagnósticos (error relativo de la energía y 
+    momentos) y, si la instrumentación está activada, las estadísticas recientes de cada fase y los 
+    contadores.
+    '''
+    lines = [f"Frame: {simulation.frame}   t = {simulation.time:.6g}   dt = {simulation_params.dt:.3g}", 
+             f"Bodies: {len(particle_manager.trails)}   Backend: {params_backend(simulation_params).name}"
+             f"   Precision: {simulation.store.dtype.name}"]
+    if particle_manager.worker is not None:
+        lines.append(f"Dropped frames: {particle_manager.worker.frames_dropped}")
+    last = simulation.diagnostics.last()
+    if simulation_params.capture_radius:
+        lines.append(f"Merged bodies: {simulation.merged}")
+    if simulation_params.diagnostics_every and last is not None:
+        lines.append(f"Energy error: {last['energy_error']:.3e}")
+        lines.append(f"P = ({last['momentum_x']:.4g}, {last['momentum_y']:.4g})   "
+                     f"L = {last['angular_momentum']:.4g}")
+    if PROFILER.enabled:
+        lines.append(PROFILER.summary())
+    return "\n".join(lines)
+
+
+def report_worker_error():
+    '''
+    Muestra al usuario el último error del hilo de la simulación, si hay: de un paso (que pausa la 
+    simulación) o de un comando enviado al hilo (agregar o generar partículas, compilar los kernels).
+    '''
+    worker = particle_manager.worker
+    if worker is not None and worker.error is not None:
+        error, worker.error = worker.error, None
+        messagebox.showerror("Simulation Error", str(error))
+
+
+def update_status(label):
+    '''
+    Actualiza el panel de estado, muestra los errores del hilo de la simulación (también mientras la 
+    animación no corre) y vuelve a programarse cada medio segundo.
+    '''
+    label.config(text=status_text())
+    report_worker_error()
+    window.after(500, update_status, label)
+
+
+def warm_up_backend():
+    '''Compila (o carga del caché) los kernels del backend de cálculo, para que no retrasen el primer 
+    cuadro.'''
+    params_backend(simulation_params).warm_up(simulation_params.precision)
+
+
+def toggle_diagnostics(var, every=10):
+    '''
+    Activa o desactiva los diagnósticos: registro de la energía y los momentos cada "every" iteraciones. 
+    Al activarlos, el estado actual es la referencia del error de la energía.
+    '''
+    with particle_manager.hold():
+        simulation.diagnostics.reset()
+        simulation_params.diagnostics_every = every if var.get() else 0
+
+
+def toggle_profiling(var):
+    '''Activa o desactiva la instrumentación (cronómetros por fase y contadores).'''
+    if var.get():
+        PROFILER.reset()
+    PROFILER.enabled = var.get()
+
+
+def dump_profile():
+    '''Guarda las estadísticas de la instrumentación en un archivo .json o .csv.'''
+    filename = filedialog.asksaveasfilename(defaultextension=".json", \
+                                            filetypes=[("JSON files", "*.json"), ("CSV files", "*.csv")])
+    if filename:
+        PROFILER.dump(filename)
+
+
 def close_window():
-    '''Cierra la ventana de Tkinter.'''
+    '''
+    Cierra la ventana de Tkinter, borra los archivos temporales de la trayectoria y termina el hilo de la 
+    simulación.
+    '''
+    particle_manager.clear_particles()
+    if particle_manager.worker is not None:
+        particle_manager.worker.stop()
     window.destroy()
 
 
 def toggle_correct_alg(var):
     '''Activa el algoritmo de corrección al ser presionado su respectivo botón.'''
-    print("***")
     simulation_params.correctAlg_enabled = var.get()
 
 
@@ -515,144 +735,230 @@ def choose_color():
         color_entry.delete(0, tk.END)
         color_entry.insert(0, color_code)
 
-# Se crea la ventana de Tkinter.
-window = tk.Tk()
-window.title("Particle Simulation")
-
-# Se crea la gráfica y se inicializa la subgráfica (subplot) en la cual se dibujará.
-fig, ax = plt.subplots()
-ax.set_xlim(0, 15)
-ax.set_ylim(0, 15)
-ax.grid(True)
-
-# Se crea un cuadro (frame) de tkinter donde estarán colocados todos los controles de la simulación.
-controls_frame = ttk.Frame(window)
-controls_frame.grid(row=0, column=0, columnspan=3, padx=10, pady=10, sticky="NSEW")
-
-# A continuación se crean las etiquetas, entradas y botones (si aplican) de cada control:
-# Control de dt:
-ttk.Label(controls_frame, text="Time Step (dt)").grid(row=0, column=0, padx=10, pady=10)# Etiqueta
-dt_input = ttk.Entry(controls_frame)# Entrada
-dt_input.grid(row=0, column=1, padx=10, pady=10)
-dt_button = ttk.Button(controls_frame, text="Assign dt", \
-                       command=lambda: verify_dt_input(dt_input, dt_label))# Botón
-dt_button.grid(row=0, column=2, padx=10, pady=10)
-dt_label = ttk.Label(controls_frame, text=str(simulation_params.user_dt))# Etiqueta del valor.
-dt_label.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
-
-# Control de epsilon:
-ttk.Label(controls_frame, text="Epsilon").grid(row=2, column=0, padx=10, pady=10)
-eps_input = ttk.Entry(controls_frame)
-eps_input.grid(row=2, column=1, padx=10, pady=10)
-eps_button = ttk.Button(controls_frame, text="Assign Epsilon", \
-                        command=lambda: verify_eps_input(eps_input, eps_label))
-eps_button.grid(row=2, column=2, padx=10, pady=10)
-eps_label = ttk.Label(controls_frame, text=str(simulation_params.eps))
-eps_label.grid(row=3, column=0, columnspan=3, padx=10, pady=10)
-
-# Control de selección de algoritmo de corrección:
-correctAlg_checkbutton_var = tk.BooleanVar()# Variable de tipo booleana (True o False)
-correctAlg_checkbutton = ttk.Checkbutton(
-    controls_frame, text="Enable Correction Algorithm", variable=correctAlg_checkbutton_var,
-    command=lambda: toggle_correct_alg(correctAlg_checkbutton_var)
-)# Botón de selección
-correctAlg_checkbutton.grid(row=4, column=0, columnspan=3, padx=10, pady=10)
-
-# Para crear una partícula:
-# Masa:
-ttk.Label(controls_frame, text="Mass").grid(row=5, column=0, padx=10, pady=10)
-masa_entry = ttk.Entry(controls_frame)
-masa_entry.grid(row=5, column=1, padx=10, pady=10)
-
-# Posición inicial en x:
-ttk.Label(controls_frame, text="Position X").grid(row=6, column=0, padx=10, pady=10)
-posx_entry = ttk.Entry(controls_frame)
-posx_entry.grid(row=6, column=1, padx=10, pady=10)
-
-# Posición inicial en y:
-ttk.Label(controls_frame, text="Position Y").grid(row=7, column=0, padx=10, pady=10)
-posy_entry = ttk.Entry(controls_frame)
-posy_entry.grid(row=7, column=1, padx=10, pady=10)
-
-# Velocidad inicial en x:
-ttk.Label(controls_frame, text="Velocity X").grid(row=8, column=0, padx=10, pady=10)
-velx_entry = ttk.Entry(controls_frame)
-velx_entry.grid(row=8, column=1, padx=10, pady=10)
-
-# Velocidad inicial en y:
-ttk.Label(controls_frame, text="Velocity Y").grid(row=9, column=0, padx=10, pady=10)
-vely_entry = ttk.Entry(controls_frame)
-vely_entry.grid(row=9, column=1, padx=10, pady=10)
-
-# Color:
-ttk.Label(controls_frame, text="Color").grid(row=10, column=0, padx=10, pady=10)
-color_entry = ttk.Entry(controls_frame)
-color_entry.grid(row=10, column=1, padx=10, pady=10)
-color_button = ttk.Button(controls_frame, text="Choose Color", command=choose_color)
-color_button.grid(row=10, column=2, padx=10, pady=10)
-
-# Nombre:
-ttk.Label(controls_frame, text="Name").grid(row=11, column=0, padx=10, pady=10)
-name_entry = ttk.Entry(controls_frame)
-name_entry.grid(row=11, column=1, padx=10, pady=10)
-
-# Botón para agregar la partícula con los parámetros anteriores:
-add_button = ttk.Button(
-    controls_frame, text="Add Particle", command=add_particle
-)
-add_button.grid(row=12, column=0, columnspan=3, padx=10, pady=10)
-
-# Para generar partículas aleatorias:
-ttk.Label(controls_frame, text="Number of particles").grid(row=13, column=0, padx=10, pady=10)
-num_particles_entry = ttk.Entry(controls_frame)
-num_particles_entry.grid(row=13, column=1, padx=10, pady=10)
-generate_button = ttk.Button(
-    controls_frame, text="Generate Random Particles", command=generate_random_particles
-)
-generate_button.grid(row=13, column=2, padx=10, pady=10)
-
-# Para comenzar la animación:
-begin_button = ttk.Button(
-    controls_frame, text="Begin Animation", command=lambda: start_animation(fig_canvas)
-)
-begin_button.grid(row=0, column=3, padx=10, pady=10)
-
-# Para pausar la animación:
-pause_button = ttk.Button(
-    controls_frame, text="Pause Animation", command=pause_animation
-)
-pause_button.grid(row=1, column=3, padx=10)
-
-# Para continuar la animación:
-resume_button = ttk.Button(
-    controls_frame, text="Continue Animation", command=resume_animation
-)
-resume_button.grid(row=2, column=3, padx=10)
-
-# Para borrar todas las partículas:
-clear_button = ttk.Button(
-    controls_frame, text="Clear Particles", command=particle_manager.clear_particles
-)
-clear_button.grid(row=3, column=3, columnspan=3, padx=10, pady=10)
-
-# Para cerrar la ventana:
-close_button = ttk.Button(
-    controls_frame, text="Close", command=close_window
-)
-close_button.grid(row=5, column=3, padx=10)
-
-# Para guardar la información de la simulación en un archivo:
-save_button = ttk.Button(
-    controls_frame, text="Save current data", \
-    command=lambda: [particle_manager.save_particle_data(), particle_manager.save_frame_data()]
-)
-save_button.grid(row=4, column=3, padx=10)
-
-# Se crea otro cuadro (frame) para la gráfica.
-fig_frame = ttk.Frame(window)
-fig_frame.grid(row = 0, column = 4) # Se coloca a la derecha de todos los otros botones.
-fig_canvas = FigureCanvasTkAgg(fig, master=fig_frame)
-fig_canvas.get_tk_widget().grid(row=0, column=1, sticky="NSEW")
-window.grid_rowconfigure(0, weight=1)
-window.grid_columnconfigure(1, weight=1)
-window.mainloop()
\ No newline at end of file
+# La interfaz solo se construye al ejecutar este archivo, de modo que importarlo no crea ventanas.
+if __name__ == "__main__":
+    # Se crea la ventana de Tkinter.
+    window = tk.Tk()
+    window.title("Particle Simulation")
+
+    # Se crea la gráfica y se inicializa la subgráfica (subplot) en la cual se dibujará.
+    fig, ax = plt.subplots()
+    ax.set_xlim(0, 15)
+    ax.set_ylim(0, 15)
+    ax.grid(True)
+
+    # Este objeto será el responsable de gestionar las partículas y sus gráficas; la simulación avanza en
+    # un hilo aparte.
+    particle_manager = ParticleManager(simulation, ax, threaded=True)
+    # Los kernels de Numba (si está instalado) se compilan en el hilo de la simulación mientras se 
+    # agregan las partículas, antes del primer cuadro.
+    particle_manager.worker.submit(warm_up_backend)
+
+    # Se crea un cuadro (frame) de tkinter donde estarán colocados todos los controles de la simulación.
+    controls_frame = ttk.Frame(window)
+    controls_frame.grid(row=0, column=0, columnspan=3, padx=10, pady=10, sticky="NSEW")
+
+    # A continuación se crean las etiquetas, entradas y botones (si aplican) de cada control:
+    # Control de dt:
+    ttk.Label(controls_frame, text="Time Step (dt)").grid(row=0, column=0, padx=10, pady=10)# Etiqueta
+    dt_input = ttk.Entry(controls_frame)# Entrada
+    dt_input.grid(row=0, column=1, padx=10, pady=10)
+    dt_button = ttk.Button(controls_frame, text="Assign dt", \
+                           command=lambda: verify_dt_input(dt_input, dt_label))# Botón
+    dt_button.grid(row=0, column=2, padx=10, pady=10)
+    dt_label = ttk.Label(controls_frame, text=str(simulation_params.user_dt))# Etiqueta del valor.
+    dt_label.grid(row=1, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control de epsilon:
+    ttk.Label(controls_frame, text="Epsilon").grid(row=2, column=0, padx=10, pady=10)
+    eps_input = ttk.Entry(controls_frame)
+    eps_input.grid(row=2, column=1, padx=10, pady=10)
+    eps_button = ttk.Button(controls_frame, text="Assign Epsilon", \
+                            command=lambda: verify_eps_input(eps_input, eps_label))
+    eps_button.grid(row=2, column=2, padx=10, pady=10)
+    eps_label = ttk.Label(controls_frame, text=str(simulation_params.eps))
+    eps_label.grid(row=3, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control de selección de algoritmo de corrección:
+    correctAlg_checkbutton_var = tk.BooleanVar()# Variable de tipo booleana (True o False)
+    correctAlg_checkbutton = ttk.Checkbutton(
+        controls_frame, text="Enable Correction Algorithm", variable=correctAlg_checkbutton_var,
+        command=lambda: toggle_correct_alg(correctAlg_checkbutton_var)
+    )# Botón de selección
+    correctAlg_checkbutton.grid(row=4, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control de pasos de la simulación por cada cuadro dibujado:
+    ttk.Label(controls_frame, text="Steps per Frame").grid(row=14, column=0, padx=10, pady=10)
+    steps_input = ttk.Entry(controls_frame)
+    steps_input.grid(row=14, column=1, padx=10, pady=10)
+    steps_button = ttk.Button(controls_frame, text="Assign Steps", \
+                              command=lambda: verify_steps_input(steps_input, steps_label))
+    steps_button.grid(row=14, column=2, padx=10, pady=10)
+    steps_label = ttk.Label(controls_frame, text=str(simulation_params.steps_per_frame))
+    steps_label.grid(row=15, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control del modo de dibujo rápido:
+    fast_render_var = tk.BooleanVar(value=simulation_params.render_mode == "collection")
+    fast_render_checkbutton = ttk.Checkbutton(
+        controls_frame, text="Fast Rendering (blitting)", variable=fast_render_var,
+        command=lambda: toggle_fast_render(fast_render_var)
+    )
+    fast_render_checkbutton.grid(row=16, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control de la instrumentación (cronómetros por fase y contadores):
+    profiling_var = tk.BooleanVar(value=PROFILER.enabled)
+    profiling_checkbutton = ttk.Checkbutton(
+        controls_frame, text="Enable Profiling", variable=profiling_var,
+        command=lambda: toggle_profiling(profiling_var)
+    )
+    profiling_checkbutton.grid(row=17, column=0, columnspan=2, padx=10, pady=10)
+    dump_button = ttk.Button(controls_frame, text="Dump Profile", command=dump_profile)
+    dump_button.grid(row=17, column=2, padx=10, pady=10)
+
+    # Control de los diagnósticos (energía, momento lineal y momento angular):
+    diagnostics_var = tk.BooleanVar(value=bool(simulation_params.diagnostics_every))
+    diagnostics_checkbutton = ttk.Checkbutton(
+        controls_frame, text="Energy Diagnostics", variable=diagnostics_var,
+        command=lambda: toggle_diagnostics(diagnostics_var)
+    )
+    diagnostics_checkbutton.grid(row=18, column=0, columnspan=3, padx=10, pady=10)
+
+    # Control del suavizado de Plummer y de la distancia de captura de las fusiones:
+    ttk.Label(controls_frame, text="Softening").grid(row=19, column=0, padx=10, pady=10)
+    softening_input = ttk.Entry(controls_frame)
+    softening_input.grid(row=19, column=1, padx=10, pady=10)
+    softening_button = ttk.Button(controls_frame, text="Assign Softening", \
+                                  command=lambda: verify_length_input(softening_input, softening_label,
+                                                                      "softening"))
+    softening_button.grid(row=19, column=2, padx=10, pady=10)
+    softening_label = ttk.Label(controls_frame, text=str(simulation_params.softening))
+    softening_label.grid(row=20, column=0, columnspan=3, padx=10, pady=10)
+
+    ttk.Label(controls_frame, text="Capture Radius").grid(row=21, column=0, padx=10, pady=10)
+    capture_input = ttk.Entry(controls_frame)
+    capture_input.grid(row=21, column=1, padx=10, pady=10)
+    capture_button = ttk.Button(controls_frame, text="Assign Radius", \
+                                command=lambda: verify_length_input(capture_input, capture_label,
+                                                                    "capture_radius"))
+    capture_button.grid(row=21, column=2, padx=10, pady=10)
+    capture_label = ttk.Label(controls_frame, text=str(simulation_params.capture_radius))
+    capture_label.grid(row=22, column=0, columnspan=3, padx=10, pady=10)
+
+    # Panel de estado, actualizado cada medio segundo:
+    status_label = ttk.Label(controls_frame, text="", justify="left", font=("TkFixedFont", 9))
+    status_label.grid(row=9, column=3, rowspan=10, padx=10, pady=10, sticky="NW")
+
+    # Para crear una partícula:
+    # Masa:
+    ttk.Label(controls_frame, text="Mass").grid(row=5, column=0, padx=10, pady=10)
+    masa_entry = ttk.Entry(controls_frame)
+    masa_entry.grid(row=5, column=1, padx=10, pady=10)
+
+    # Posición inicial en x:
+    ttk.Label(controls_frame, text="Position X").grid(row=6, column=0, padx=10, pady=10)
+    posx_entry = ttk.Entry(controls_frame)
+    posx_entry.grid(row=6, column=1, padx=10, pady=10)
+
+    # Posición inicial en y:
+    ttk.Label(controls_frame, text="Position Y").grid(row=7, column=0, padx=10, pady=10)
+    posy_entry = ttk.Entry(controls_frame)
+    posy_entry.grid(row=7, column=1, padx=10, pady=10)
+
+    # Velocidad inicial en x:
+    ttk.Label(controls_frame, text="Velocity X").grid(row=8, column=0, padx=10, pady=10)
+    velx_entry = ttk.Entry(controls_frame)
+    velx_entry.grid(row=8, column=1, padx=10, pady=10)
+
+    # Velocidad inicial en y:
+    ttk.Label(controls_frame, text="Velocity Y").grid(row=9, column=0, padx=10, pady=10)
+    vely_entry = ttk.Entry(controls_frame)
+    vely_entry.grid(row=9, column=1, padx=10, pady=10)
+
+    # Color:
+    ttk.Label(controls_frame, text="Color").grid(row=10, column=0, padx=10, pady=10)
+    color_entry = ttk.Entry(controls_frame)
+    color_entry.grid(row=10, column=1, padx=10, pady=10)
+    color_button = ttk.Button(controls_frame, text="Choose Color", command=choose_color)
+    color_button.grid(row=10, column=2, padx=10, pady=10)
+
+    # Nombre:
+    ttk.Label(controls_frame, text="Name").grid(row=11, column=0, padx=10, pady=10)
+    name_entry = ttk.Entry(controls_frame)
+    name_entry.grid(row=11, column=1, padx=10, pady=10)
+
+    # Botón para agregar la partícula con los parámetros anteriores:
+    add_button = ttk.Button(
+        controls_frame, text="Add Particle", command=add_particle
+    )
+    add_button.grid(row=12, column=0, columnspan=3, padx=10, pady=10)
+
+    # Para generar partículas aleatorias:
+    ttk.Label(controls_frame, text="Number of particles").grid(row=13, column=0, padx=10, pady=10)
+    num_particles_entry = ttk.Entry(controls_frame)
+    num_particles_entry.grid(row=13, column=1, padx=10, pady=10)
+    generate_button = ttk.Button(
+        controls_frame, text="Generate Random Particles", command=generate_random_particles
+    )
+    generate_button.grid(row=13, column=2, padx=10, pady=10)
+
+    # Para comenzar la animación:
+    begin_button = ttk.Button(
+        controls_frame, text="Begin Animation", command=lambda: start_animation(fig_canvas)
+    )
+    begin_button.grid(row=0, column=3, padx=10, pady=10)
+
+    # Para pausar la animación:
+    pause_button = ttk.Button(
+        controls_frame, text="Pause Animation", command=pause_animation
+    )
+    pause_button.grid(row=1, column=3, padx=10)
+
+    # Para continuar la animación:
+    resume_button = ttk.Button(
+        controls_frame, text="Continue Animation", command=resume_animation
+    )
+    resume_button.grid(row=2, column=3, padx=10)
+
+    # Para borrar todas las partículas:
+    clear_button = ttk.Button(
+        controls_frame, text="Clear Particles", command=particle_manager.clear_particles
+    )
+    clear_button.grid(row=3, column=3, columnspan=3, padx=10, pady=10)
+
+    # Para cerrar la ventana:
+    close_button = ttk.Button(
+        controls_frame, text="Close", command=close_window
+    )
+    close_button.grid(row=5, column=3, padx=10)
+
+    # Para guardar la información de la simulación en un archivo:
+    save_button = ttk.Button(
+        controls_frame, text="Save current data", command=save_data
+    )
+    save_button.grid(row=4, column=3, padx=10)
+
+    # Para guardar y cargar puntos de control de la simulación:
+    checkpoint_button = ttk.Button(
+        controls_frame, text="Save Checkpoint", command=particle_manager.save_checkpoint
+    )
+    checkpoint_button.grid(row=6, column=3, padx=10)
+    restore_button = ttk.Button(
+        controls_frame, text="Load Checkpoint", command=particle_manager.restore_checkpoint
+    )
+    restore_button.grid(row=7, column=3, padx=10)
+
+    # Para revisar la trayectoria grabada sin volver a simularla:
+    replay_button = ttk.Button(
+        controls_frame, text="Replay", command=particle_manager.open_replay
+    )
+    replay_button.grid(row=8, column=3, padx=10)
+
+    # Se crea otro cuadro (frame) para la gráfica.
+    fig_frame = ttk.Frame(window)
+    fig_frame.grid(row = 0, column = 4) # Se coloca a la derecha de todos los otros botones.
+    fig_canvas = FigureCanvasTkAgg(fig, master=fig_frame)
+    fig_canvas.get_tk_widget().grid(row=0, column=1, sticky="NSEW")
+    window.grid_rowconfigure(0, weight=1)
+    window.grid_columnconfigure(1, weight=1)
+    update_status(status_label)
+    window.mainloop()
\ No newline at end of file
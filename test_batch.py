@@ -0,0 +1,87 @@
+'''
+Pruebas del ejecutor por lotes ("batch.py run"). Se ejecutan con "python -m pytest".
+'''
+import numpy as np
+
+import batch
+from Checkpoint_file import load_checkpoint
+from Diagnostics_file import DIAGNOSTIC_FIELDS
+from Trajectory_file import TrajectoryReader, segment_filename
+
+
+def test_run_with_merges_writes_trajectory_segments(tmp_path, capsys):
+    # Las fusiones cambian el número de partículas durante la corrida: cada cambio debe empezar un nuevo
+    # segmento de la trayectoria en lugar de fallar al escribir el cuadro.
+    trajectory = tmp_path / "corrida.traj"
+    output = tmp_path / "final.csv"
+    batch.main(["run", "--random", "200", "--seed", "1", "--steps", "50", "--capture-radius", "0.5",
+                "-t", str(trajectory), "--stride", "3", "-o", str(output)])
+    assert "bodies merged" in capsys.readouterr().out
+    assert output.exists()
+
+    readers = []
+    segment = 0
+    while (tmp_path / segment_filename(trajectory.name, segment)).exists():
+        readers.append(TrajectoryReader(tmp_path / segment_filename(trajectory.name, segment)))
+        segment += 1
+    assert len(readers) > 1
+    assert readers[0].n_bodies == 200
+    counts = [reader.n_bodies for reader in readers]
+    assert counts == sorted(counts, reverse=True) and len(set(counts)) == len(counts)
+    # Los cuadros de todos los segmentos cubren la corrida completa, en orden, sin repetirse y con el
+    # mismo espaciado aunque las fusiones empiecen otro archivo.
+    frames = np.concatenate([reader.frames()["frame"] for reader in readers])
+    assert np.array_equal(frames, np.arange(0, 51, 3))
+
+
+def test_resume_keeps_merge_count(tmp_path, capsys):
+    # El número de partículas fusionadas se guarda en el punto de control, de modo que el resumen al
+    # continuar cuenta también las fusiones anteriores.
+    checkpoint = str(tmp_path / "corrida.nbck")
+    batch.main(["run", "--random", "200", "--seed", "1", "--steps", "25", "--capture-radius", "0.5",
+                "--checkpoint", checkpoint])
+    merged = load_checkpoint(checkpoint).merged
+    assert merged > 0
+    capsys.readouterr()
+    batch.main(["run", "--resume", checkpoint, "--steps", "25", "--checkpoint", checkpoint])
+    resumed = load_checkpoint(checkpoint)
+    assert resumed.merged >= merged
+    assert f"{resumed.merged} bodies merged" in capsys.readouterr().out
+
+
+def test_resume_continues_diagnostics(tmp_path):
+    # La serie de los diagnósticos de una corrida continuada desde un punto de control es la misma que la
+    # de una corrida sin interrupciones, con el error de la energía medido desde el inicio.
+    options = ["--random", "20", "--seed", "2", "--diagnostics-every", "10", "--energy-tolerance", "1",
+               "--energy-action", "tighten"]
+    full = str(tmp_path / "completa.npz")
+    batch.main(["run", *options, "--steps", "200", "--diagnostics", full])
+    checkpoint = str(tmp_path / "corrida.nbck")
+    resumed = str(tmp_path / "continuada.npz")
+    batch.main(["run", *options, "--steps", "100", "--checkpoint", checkpoint])
+    batch.main(["run", "--resume", checkpoint, "--steps", "100", "--diagnostics", resumed])
+
+    expected, series = np.load(full), np.load(resumed)
+    assert len(series["frame"]) == len(expected["frame"]) == 21
+    for field in DIAGNOSTIC_FIELDS:
+        assert np.array_equal(series[field], expected[field]), field
+
+
+def test_resume_appends_to_the_trajectory(tmp_path):
+    # Al continuar desde un punto de control la trayectoria anterior se conserva, y los cuadros escritos
+    # después del punto de control se reemplazan por los calculados de nuevo, sin repetirse.
+    options = ["--random", "20", "--seed", "3"]
+    full = str(tmp_path / "completa.traj")
+    batch.main(["run", *options, "--steps", "60", "-t", full])
+
+    trajectory = str(tmp_path / "corrida.traj")
+    checkpoint = str(tmp_path / "corrida.nbck")
+    batch.main(["run", *options, "--steps", "30", "-t", trajectory, "--checkpoint", checkpoint])
+    # Una corrida continuada que falla en el paso 40, antes de guardar otro punto de control.
+    batch.main(["run", "--resume", checkpoint, "--steps", "10", "-t", trajectory])
+    assert len(TrajectoryReader(trajectory)) == 41
+    batch.main(["run", "--resume", checkpoint, "--steps", "30", "-t", trajectory])
+
+    records, expected = TrajectoryReader(trajectory).frames(), TrajectoryReader(full).frames()
+    assert np.array_equal(records["frame"], np.arange(61))
+    assert np.array_equal(records["pos"], expected["pos"])
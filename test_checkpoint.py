@@ -0,0 +1,91 @@
+'''
+Pruebas de los puntos de control ("Checkpoint_file"). Se ejecutan con "python -m pytest".
+'''
+import os
+
+import numpy as np
+import pytest
+
+import Checkpoint_file
+from Checkpoint_file import AutoCheckpoint, load_checkpoint, save_checkpoint
+from Generators_file import plummer
+from Integrator_file import INTEGRATORS
+from Simulation_file import Simulation
+
+
+def cluster(integrator="leapfrog", precision="float64"):
+    simulation = Simulation()
+    params = simulation.params
+    # Con el algoritmo de corrección el dt también forma parte del estado.
+    params.integrator, params.precision, params.softening = integrator, precision, 0.01
+    params.correctAlg_enabled, params.eps = True, 2.0
+    simulation.add_particles(*plummer(20, np.random.default_rng(5)))
+    return simulation
+
+
+def advance(simulation, steps):
+    for _ in range(steps):
+        simulation.step()
+    return simulation
+
+
+@pytest.mark.parametrize("precision", ["float64", "float32"])
+@pytest.mark.parametrize("integrator", list(INTEGRATORS))
+def test_resumed_simulation_is_bit_exact(tmp_path, integrator, precision):
+    filename = tmp_path / "corrida.nbck"
+    simulation = advance(cluster(integrator, precision), 30)
+    save_checkpoint(simulation, filename)
+    advance(simulation, 30)
+
+    resumed = advance(load_checkpoint(filename), 30)
+    assert (resumed.frame, resumed.time, resumed.params.dt) == (simulation.frame, simulation.time,
+                                                                simulation.params.dt)
+    assert resumed.store.dtype == simulation.store.dtype
+    for field in ("m", "pos", "vel", "accel"):
+        np.testing.assert_array_equal(getattr(resumed.store, field), getattr(simulation.store, field))
+    assert [body.name for body in resumed.store.bodies] == [body.name for body in simulation.store.bodies]
+
+
+def test_corrupt_checkpoint_is_rejected(tmp_path):
+    filename = tmp_path / "corrida.nbck"
+    save_checkpoint(advance(cluster(), 5), filename)
+    content = bytearray(filename.read_bytes())
+    for position in (40, len(content) - 70):
+        # Un byte cambiado en el encabezado JSON o en los datos de un arreglo.
+        corrupt = content.copy()
+        corrupt[position] ^= 0xFF
+        filename.write_bytes(bytes(corrupt))
+        with pytest.raises(ValueError, match="corrupt"):
+            load_checkpoint(filename)
+    filename.write_bytes(bytes(content[:len(content) // 2]))
+    with pytest.raises(ValueError):
+        load_checkpoint(filename)
+    filename.write_bytes(b"no es un punto de control")
+    with pytest.raises(ValueError):
+        load_checkpoint(filename)
+
+
+def test_failed_save_keeps_the_previous_checkpoint(tmp_path, monkeypatch):
+    filename = tmp_path / "corrida.nbck"
+    simulation = advance(cluster(), 5)
+    save_checkpoint(simulation, filename)
+    previous = filename.read_bytes()
+
+    def fail(descriptor):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(Checkpoint_file.os, "fsync", fail)
+    with pytest.raises(OSError):
+        save_checkpoint(advance(simulation, 5), filename)
+    # El archivo anterior queda intacto y no queda el archivo temporal.
+    assert filename.read_bytes() == previous
+    assert os.listdir(tmp_path) == ["corrida.nbck"]
+
+
+def test_auto_checkpoint_saves_every_n_steps(tmp_path):
+    simulation = cluster()
+    checkpoint = AutoCheckpoint(simulation, tmp_path / "corrida.nbck", 10)
+    for _ in range(25):
+        simulation.step()
+        checkpoint()
+    assert checkpoint.saved == 2
+    assert load_checkpoint(checkpoint.filename).frame == 20
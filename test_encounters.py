@@ -0,0 +1,70 @@
+'''
+Pruebas de la detección y fusión de encuentros cercanos ("Encounters_file"). Se ejecutan con
+"python -m pytest".
+'''
+import numpy as np
+import pytest
+
+from Encounters_file import encounter_groups, find_close_pairs, merge_encounters
+from Simulation_file import Simulation
+
+
+def brute_force_pairs(pos, radius):
+    i, j = np.triu_indices(len(pos), 1)
+    close = np.linalg.norm(pos[i] - pos[j], axis=1) < radius
+    return set(zip(i[close].tolist(), j[close].tolist()))
+
+
+@pytest.mark.parametrize("radius", [0.05, 0.3, 2.0])
+def test_close_pairs_match_the_brute_force(radius):
+    rng = np.random.default_rng(6)
+    # Partículas uniformes y grupos compactos, con coordenadas negativas y varias por celda.
+    pos = np.concatenate([rng.uniform(-5, 5, (400, 2)), rng.normal([2.0, -3.0], 0.1, (100, 2))])
+    i, j = find_close_pairs(pos, radius)
+    assert (i < j).all()
+    pairs = set(zip(i.tolist(), j.tolist()))
+    # Cada par aparece una sola vez.
+    assert len(pairs) == len(i)
+    assert pairs == brute_force_pairs(pos, radius)
+
+
+def test_close_pairs_on_a_grid():
+    # Partículas en los bordes de las celdas, a exactamente la distancia de captura de sus vecinas.
+    pos = np.stack(np.meshgrid(np.arange(5.0), np.arange(5.0)), axis=-1).reshape(-1, 2)
+    assert len(find_close_pairs(pos, 1.0)[0]) == 0
+    assert set(zip(*(a.tolist() for a in find_close_pairs(pos, 1.5)))) == brute_force_pairs(pos, 1.5)
+    assert len(find_close_pairs(pos[:1], 1.0)[0]) == 0
+
+
+def test_encounter_groups_join_chains():
+    assert encounter_groups(6, np.array([0, 1, 4]), np.array([1, 2, 5])).tolist() == [0, 0, 0, 3, 4, 4]
+    # Una cadena larga con los pares en desorden forma un solo grupo.
+    k = np.random.default_rng(7).permutation(29)
+    labels = encounter_groups(31, k, k + 1)
+    assert labels.tolist() == [0] * 30 + [30]
+
+
+def test_merge_conserves_mass_and_momentum():
+    simulation = Simulation()
+    # A, B y C forman una cadena (A-B y B-C a menos de la distancia de captura, A-C no); D y E son otro
+    # par y F queda sola.
+    m = np.array([1.0, 3.0, 2.0, 1.0, 1.0, 5.0])
+    pos = np.array([[0.0, 0.0], [0.8, 0.0], [1.6, 0.0], [10.0, 10.0], [10.5, 10.0], [-10.0, 0.0]])
+    vel = np.array([[1.0, 0.0], [0.0, 2.0], [-1.0, 1.0], [3.0, 0.0], [-1.0, 0.0], [0.0, 1.0]])
+    names = list("ABCDEF")
+    simulation.add_particles(m, pos, vel, colors=["#000000"] * 6, names=names)
+    store = simulation.store
+
+    merged = merge_encounters(store, 1.0)
+    assert sorted((body.name, sorted(b.name for b in absorbed)) for body, absorbed in merged) == \
+        [("B", ["A", "C"]), ("D", ["E"])]
+    # La más masiva del grupo conserva su nombre; en el empate de D y E, la de menor índice.
+    assert [body.name for body in store.bodies] == ["B", "D", "F"]
+    assert len(store) == 3
+    np.testing.assert_allclose(store.m, [6.0, 2.0, 5.0])
+    np.testing.assert_allclose(store.m.sum(), m.sum())
+    np.testing.assert_allclose(store.m @ store.vel, m @ vel)
+    np.testing.assert_allclose(store.m @ store.pos, m @ pos)
+    np.testing.assert_allclose(store.pos[0], (m[:3] @ pos[:3]) / 6.0)
+    np.testing.assert_allclose(store.vel[2], [0.0, 1.0])
+    assert merge_encounters(store, 1.0) == []
@@ -0,0 +1,88 @@
+'''
+Pruebas de la exportación de los datos ("Export_file"). Se ejecutan con "python -m pytest".
+'''
+import csv
+
+import numpy as np
+import pytest
+
+import batch
+from Export_file import export_data, particle_state
+from Simulation_file import STATE_HEADERS, load_initial_conditions
+from Trajectory_file import TrajectoryReader, segment_filename
+
+# B empieza junto a A y se fusiona con ella en el primer paso; A es la más masiva y conserva su nombre.
+BODIES = [["A", 10, 0, 0, 0, 0, "#ff0000"], ["B", 1, 0.05, 0, 0, 0, "#00ff00"],
+          ["C", 1, 5, 0, 0, 1, "#0000ff"], ["D", 1, -5, 0, 0, -1, "#000000"]]
+
+
+@pytest.fixture
+def merged_run(tmp_path):
+    # Corrida en la que una fusión divide la trayectoria en dos segmentos: [A, B, C, D] y [A, C, D].
+    conditions = tmp_path / "condiciones.csv"
+    with open(conditions, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(STATE_HEADERS)
+        writer.writerows(BODIES)
+    trajectory = tmp_path / "corrida.traj"
+    final = tmp_path / "final.csv"
+    batch.main(["run", str(conditions), "--steps", "5", "--capture-radius", "0.2", "-t", str(trajectory),
+                "-o", str(final)])
+    files = [segment_filename(trajectory, k) for k in range(2)]
+    readers = [TrajectoryReader(filename) for filename in files]
+    assert [reader.names for reader in readers] == [["A", "B", "C", "D"], ["A", "C", "D"]]
+    return particle_state(load_initial_conditions(final)), files, readers
+
+
+def test_csv_rows_follow_each_segment_bodies(tmp_path, merged_run):
+    state, files, readers = merged_run
+    filename = str(tmp_path / "datos.csv")
+    assert export_data(filename, state, files) == sum(len(reader) for reader in readers)
+
+    with open(tmp_path / "datos_bodies.csv", newline="") as f:
+        bodies = {(int(row["segment"]), int(row["body"])): row["Name"] for row in csv.DictReader(f)}
+    assert bodies == {(s, k): name for s, reader in enumerate(readers) for k, name in enumerate(reader.names)}
+
+    data = np.loadtxt(filename, delimiter=",", skiprows=2)
+    for frame, _, segment, body, x, y, vx, vy in data:
+        reader = readers[int(segment)]
+        local = int(np.flatnonzero(reader.frames()["frame"] == frame)[0])
+        assert [x, y] == reader.positions()[local, int(body)].tolist()
+        assert [vx, vy] == reader.velocities()[local, int(body)].tolist()
+
+
+def test_xlsx_writes_a_header_per_segment(tmp_path, merged_run):
+    openpyxl = pytest.importorskip("openpyxl")
+    state, files, readers = merged_run
+    filename = str(tmp_path / "datos.xlsx")
+    export_data(filename, state, files)
+
+    rows = list(openpyxl.load_workbook(filename, read_only=True)["Frame Data"].iter_rows(values_only=True))
+    headers = None
+    checked = 0
+    for row in rows:
+        row = [value for value in row if value is not None]
+        if row[0] == "Frame":
+            headers = row
+            continue
+        # Los segmentos tienen distinto número de partículas, y por lo tanto de columnas.
+        reader = next(reader for reader in readers if len(headers) == 1 + 4 * reader.n_bodies)
+        local = int(np.flatnonzero(reader.frames()["frame"] == row[0])[0])
+        assert len(row) == len(headers)
+        for k, name in enumerate(reader.names):
+            assert headers[1 + 4 * k] == f"{name} PosX"
+            # Excel guarda 15 dígitos significativos.
+            assert np.allclose(row[1 + 4 * k:3 + 4 * k], reader.positions()[local, k], rtol=1e-14)
+        checked += 1
+    assert checked == sum(len(reader) for reader in readers)
+    assert sum(row[0] == "Frame" for row in rows) == 2
+
+
+def test_npz_keeps_each_segment_names(tmp_path, merged_run):
+    state, files, readers = merged_run
+    filename = str(tmp_path / "datos.npz")
+    export_data(filename, state, files)
+    data = np.load(filename)
+    for segment, reader in enumerate(readers):
+        assert data[f"segment{segment}_names"].tolist() == reader.names
+        assert np.array_equal(data[f"segment{segment}_pos"], reader.positions())
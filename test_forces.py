@@ -0,0 +1,81 @@
+'''
+Pruebas de los métodos de cálculo de la fuerza ("Forces_file"). Se ejecutan con "python -m pytest".
+'''
+import numpy as np
+import pytest
+
+from Forces_file import G, barnes_hut_accel, barnes_hut_error, direct_accel, particle_mesh_accel
+from Generators_file import plummer, uniform_box
+from Simulation_file import Simulation
+
+# Cota del error relativo medio de Barnes-Hut para cada ángulo de apertura (alrededor del doble del
+# medido con 2000 partículas, uniformes o de Plummer).
+BARNES_HUT_MEAN_ERROR = {0.2: 0.004, 0.3: 0.01, 0.5: 0.03, 0.7: 0.07, 1.0: 0.2}
+
+
+@pytest.mark.parametrize("distribution", [uniform_box, plummer])
+def test_barnes_hut_error_is_bounded_for_each_theta(distribution):
+    m, pos, _ = distribution(2000, np.random.default_rng(0))
+    errors = barnes_hut_error(m, pos, thetas=tuple(BARNES_HUT_MEAN_ERROR))
+    means = [errors[theta][0] for theta in BARNES_HUT_MEAN_ERROR]
+    for theta, bound in BARNES_HUT_MEAN_ERROR.items():
+        assert errors[theta][0] < bound, theta
+    # Un ángulo de apertura mayor abre menos celdas y nunca es más preciso en promedio.
+    assert means == sorted(means)
+
+
+def test_barnes_hut_with_theta_zero_is_the_direct_sum():
+    m, pos, _ = uniform_box(500, np.random.default_rng(1))
+    assert barnes_hut_error(m, pos, thetas=(0.0,))[0.0][1] < 1e-12
+    accel, phi = barnes_hut_accel(m, pos, theta=0.0, potential=True, softening=0.1)
+    expected, expected_phi = direct_accel(m, pos, potential=True, softening=0.1)
+    # Solo difieren por redondeo: el orden de las sumas es distinto.
+    scale = np.abs(expected).max()
+    np.testing.assert_allclose(accel, expected, rtol=1e-10, atol=1e-12 * scale)
+    np.testing.assert_allclose(phi, expected_phi, rtol=1e-10)
+
+
+def test_barnes_hut_targets_match_the_full_evaluation():
+    m, pos, _ = plummer(300, np.random.default_rng(2))
+    targets = np.array([0, 17, 150, 299])
+    np.testing.assert_allclose(barnes_hut_accel(m, pos, 0.5, targets=targets),
+                               barnes_hut_accel(m, pos, 0.5)[targets], rtol=1e-12)
+
+
+def test_isolated_particle_mesh_converges_to_the_direct_sum():
+    m, pos, _ = uniform_box(2000, np.random.default_rng(0))
+    reference = direct_accel(m, pos)
+    relative = lambda grid: np.median(np.linalg.norm(particle_mesh_accel(m, pos, grid) - reference, axis=1)
+                                      / np.linalg.norm(reference, axis=1))
+    # La fuerza está suavizada a la escala de una celda: el error se reduce al refinar la malla.
+    assert relative(512) < 0.04 < relative(128)
+
+
+def test_periodic_particle_mesh_uses_a_fixed_box():
+    box = 100.0
+    m, pos, _ = uniform_box(500, np.random.default_rng(3))
+    accel = particle_mesh_accel(m, pos, 128, isolated=False, box=box)
+    # Las imágenes periódicas de las posiciones dan la misma fuerza.
+    shifted = particle_mesh_accel(m, pos + [box, -2 * box], 128, isolated=False, box=box)
+    np.testing.assert_allclose(shifted, accel, atol=1e-10 * np.abs(accel).max())
+
+    # Dos partículas en lados opuestos de la caja están a 10 unidades a través de la frontera, y se
+    # atraen hacia ella.
+    pair = particle_mesh_accel(np.ones(2), np.array([[-45.0, 0.0], [45.0, 0.0]]), 256, isolated=False,
+                               box=box)
+    np.testing.assert_allclose(pair[:, 0], [-G / 10**2, G / 10**2], rtol=0.05)
+    with pytest.raises(ValueError):
+        particle_mesh_accel(m, pos, 128, isolated=False)
+
+
+def test_periodic_simulation_wraps_positions_into_the_box():
+    simulation = Simulation()
+    params = simulation.params
+    params.force_method, params.pm_isolated, params.pm_box, params.pm_grid = "particle_mesh", False, 10.0, 64
+    simulation.add_particles(np.ones(3), np.array([[4.9, 0.0], [0.0, -4.9], [0.0, 0.0]]),
+                             np.array([[50.0, 0.0], [0.0, -50.0], [0.0, 0.0]]))
+    for _ in range(20):
+        simulation.step()
+        assert (np.abs(simulation.store.pos) <= 5.0).all()
+    # Las partículas cruzaron la frontera y entraron por el lado opuesto.
+    assert simulation.store.pos[0, 0] < 0 < simulation.store.pos[1, 1]
@@ -0,0 +1,151 @@
+'''
+Pruebas de los integradores ("Integrator_file"). Se ejecutan con "python -m pytest".
+'''
+import numpy as np
+import pytest
+
+from Forces_file import G, direct_accel, direct_accel_jerk
+from Generators_file import plummer
+from Profiler_file import PROFILER
+from Simulation_file import Simulation
+
+
+def kepler_orbit(integrator, dt, e=0.5):
+    # Órbita de Kepler de semieje 1 alrededor de una masa 1 (periodo 1), empezando en el apoastro, con
+    # una partícula de prueba de masa despreciable.
+    simulation = Simulation()
+    params = simulation.params
+    params.integrator, params.user_dt, params.dt = integrator, dt, dt
+    r = 1 + e
+    v = np.sqrt(G * (1 - e) / r)
+    simulation.add_particles(np.array([1.0, 1e-9]), np.array([[0.0, 0.0], [r, 0.0]]),
+                             np.array([[0.0, 0.0], [0.0, v]]))
+    return simulation
+
+
+def orbit_error(integrator, steps, e=0.5):
+    # Distancia entre la posición relativa después de un periodo y la inicial.
+    simulation = kepler_orbit(integrator, 1.0 / steps, e)
+    start = simulation.store.pos[1] - simulation.store.pos[0]
+    for _ in range(steps):
+        simulation.step()
+    return np.linalg.norm(simulation.store.pos[1] - simulation.store.pos[0] - start)
+
+
+def orbit_energy(simulation):
+    # Energía específica del movimiento relativo, con la masa total de las dos partículas.
+    store = simulation.store
+    r, v = store.pos[1] - store.pos[0], store.vel[1] - store.vel[0]
+    return v @ v / 2 - G * store.m.sum() / np.linalg.norm(r)
+
+
+@pytest.mark.parametrize("integrator, order", [("leapfrog", 2), ("yoshida4", 4), ("forest_ruth", 4)])
+def test_kepler_orbit_converges_with_the_order_of_the_integrator(integrator, order):
+    errors = [orbit_error(integrator, steps) for steps in (500, 1000, 2000)]
+    # Al reducir el dt a la mitad el error se divide por alrededor de 2^orden (algo más en el método de
+    # Forest y Ruth, cuyo término principal del error casi se anula tras un periodo completo).
+    for coarse, fine in zip(errors, errors[1:]):
+        assert order - 0.5 < np.log2(coarse / fine) < order + 1.5
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    # Activa el perfilador para contar las evaluaciones de la fuerza.
+    monkeypatch.setattr(PROFILER, "enabled", True)
+    PROFILER.reset()
+    yield PROFILER
+    PROFILER.reset()
+
+
+def force_evaluations(simulation, time):
+    # Número de aceleraciones de partícula calculadas al avanzar la simulación hasta el tiempo indicado.
+    PROFILER.reset()
+    while simulation.time < time - 1e-12:
+        simulation.step()
+    return PROFILER.stats()["counters"]["force_evaluations"]
+
+
+def close_binary(integrator, dt):
+    # Binaria circular de separación 0.01 (periodo de 7e-4) con ocho partículas lejanas en órbitas
+    # circulares alrededor de ella.
+    simulation = Simulation()
+    params = simulation.params
+    params.integrator, params.user_dt, params.dt, params.eps = integrator, dt, dt, 1.0
+    v = np.sqrt(G * 2 / 0.01) / 2
+    m, pos, vel = [1.0, 1.0], [[0.005, 0.0], [-0.005, 0.0]], [[0.0, v], [0.0, -v]]
+    for k in range(8):
+        angle, r = 2 * np.pi * k / 8, 10 + k
+        v = np.sqrt(G * 2 / r)
+        m.append(1e-3)
+        pos.append([r * np.cos(angle), r * np.sin(angle)])
+        vel.append([-v * np.sin(angle), v * np.cos(angle)])
+    simulation.add_particles(np.array(m), np.array(pos), np.array(vel))
+    return simulation
+
+
+def test_leapfrog_evaluates_the_force_once_per_step(profiler):
+    simulation = kepler_orbit("leapfrog", 1e-3)
+    for _ in range(100):
+        simulation.step()
+    # La aceleración del final de un paso se reutiliza al inicio del siguiente: además de la evaluación
+    # inicial, se calcula una vez por paso la aceleración de cada partícula.
+    assert profiler.stats()["counters"]["force_evaluations"] == 2 * (100 + 1)
+
+
+def test_block_timestep_with_a_large_eps_is_the_leapfrog():
+    # Con un épsilon grande todas las partículas quedan en el nivel 0 y avanzan juntas con el dt.
+    block, leapfrog = close_binary("block", 1e-5), close_binary("leapfrog", 1e-5)
+    block.params.eps = 1e9
+    for _ in range(50):
+        block.step()
+        leapfrog.step()
+    assert not block.integrator.levels.any()
+    np.testing.assert_allclose(block.store.pos, leapfrog.store.pos, rtol=1e-12, atol=1e-14)
+    np.testing.assert_allclose(block.store.vel, leapfrog.store.vel, rtol=1e-12, atol=1e-12)
+
+
+def test_block_timestep_only_refines_the_close_binary(profiler):
+    reference = close_binary("leapfrog", 1e-3 / 2048)
+    force_evaluations(reference, 0.01)
+    block = close_binary("block", 1e-3)
+    block_evaluations = force_evaluations(block, 0.01)
+    # La binaria usa el intervalo dt/2^9 y las partículas lejanas el dt completo.
+    assert block.integrator.levels.tolist() == [9, 9] + [0] * 8
+    leapfrog = close_binary("leapfrog", 1e-3 / 2**9)
+    leapfrog_evaluations = force_evaluations(leapfrog, 0.01)
+
+    # Con la misma precisión que reducir el dt de todo el sistema al de la binaria, se calculan muchas
+    # menos aceleraciones.
+    error = lambda simulation: np.linalg.norm(simulation.store.pos - reference.store.pos, axis=1).max()
+    assert error(block) < 1.1 * error(leapfrog)
+    assert block_evaluations < leapfrog_evaluations / 4
+
+
+@pytest.mark.parametrize("softening", [0.0, 0.05])
+def test_jerk_is_the_derivative_of_the_acceleration(softening):
+    m, pos, vel = plummer(50, np.random.default_rng(4))
+    # Bloques de 16 partículas: la suma por bloques no cambia el resultado.
+    accel, jerk = direct_accel_jerk(m, pos, vel, 16, softening)
+    np.testing.assert_allclose(accel, direct_accel(m, pos, softening=softening), rtol=1e-12, atol=1e-12)
+    h = 1e-5
+    derivative = (direct_accel(m, pos + vel * h, softening=softening)
+                  - direct_accel(m, pos - vel * h, softening=softening)) / (2 * h)
+    assert np.abs(jerk - derivative).max() < 1e-4 * np.abs(jerk).max()
+
+
+def test_hermite_energy_error_shrinks_with_eta():
+    worst = []
+    for eta in (0.02, 0.01, 0.005):
+        simulation = kepler_orbit("hermite", 1e-3, e=0.9)
+        simulation.params.hermite_eta = eta
+        energy = orbit_energy(simulation)
+        error = 0.0
+        while simulation.time < 1:
+            simulation.step()
+            error = max(error, abs(orbit_energy(simulation) / energy - 1))
+        worst.append(error)
+    # El mayor error de la energía en un periodo, que ocurre en el periastro (a una distancia de 0.1),
+    # es de cuarto orden en eta.
+    assert worst[0] < 1e-7
+    for coarse, fine in zip(worst, worst[1:]):
+        assert coarse / fine > 8
@@ -0,0 +1,24 @@
+'''
+Pruebas del almacén de partículas ("Body_file"). Se ejecutan con "python -m pytest".
+'''
+import numpy as np
+import pytest
+
+from Simulation_file import Simulation
+
+
+def test_invalid_particles_leave_the_store_unchanged():
+    simulation = Simulation()
+    simulation.generate_particles(20, "uniform", 0)
+    simulation.step()
+    pos = simulation.store.pos.copy()
+    with pytest.raises(ValueError):
+        simulation.add_particle("x", (0, 0), (0, 0), "#ff0000", "A")
+    with pytest.raises(ValueError):
+        simulation.add_particles(np.ones(3), np.zeros((2, 2)), np.zeros((3, 2)))
+    assert len(simulation.store) == len(simulation.store.bodies) == 20
+    assert np.array_equal(simulation.store.pos, pos)
+    # El almacén sigue siendo válido: se pueden agregar partículas y avanzar.
+    simulation.add_particle(1.0, (0, 0), (0, 0), "#ff0000", "A")
+    simulation.step()
+    assert len(simulation.store) == 21 and simulation.store.bodies[-1].name == "A"
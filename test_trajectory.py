@@ -0,0 +1,111 @@
+'''
+Pruebas de los archivos de la trayectoria ("Trajectory_file"). Se ejecutan con "python -m pytest".
+'''
+import numpy as np
+import pytest
+
+from Generators_file import plummer
+from Simulation_file import Simulation
+from Trajectory_file import TrajectoryReader, TrajectoryWriter, segment_filename, truncate_trajectory
+
+
+def small_cluster(n=5):
+    simulation = Simulation()
+    m, pos, vel = plummer(n, np.random.default_rng(0))
+    simulation.add_particles(m, pos, vel, colors=["#000000"] * n, names=[f"P{k}" for k in range(n)])
+    return simulation
+
+
+def write_run(filename, simulation, steps, **options):
+    # Escribe la trayectoria de la simulación y devuelve el estado de cada iteración.
+    states = {}
+    with TrajectoryWriter(filename, simulation.store, **options) as writer:
+        for _ in range(steps + 1):
+            states[simulation.frame] = (simulation.time, simulation.store.pos.copy(),
+                                        simulation.store.vel.copy())
+            writer.append(simulation)
+            simulation.step()
+    return states
+
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+def test_reader_returns_the_written_frames(tmp_path, dtype):
+    filename = tmp_path / "corrida.traj"
+    simulation = small_cluster()
+    states = write_run(filename, simulation, 20, stride=3, dtype=dtype)
+
+    reader = TrajectoryReader(filename)
+    assert (reader.n_bodies, reader.stride, reader.dtype) == (5, 3, np.dtype(dtype))
+    assert reader.names == [f"P{k}" for k in range(5)]
+    np.testing.assert_array_equal(reader.masses, simulation.store.m)
+    # Solo se guardan las iteraciones múltiplo del paso de salida.
+    frames = reader.frames()
+    assert frames["frame"].tolist() == list(range(0, 21, 3))
+    for record in frames:
+        time, pos, vel = states[int(record["frame"])]
+        assert record["time"] == time
+        np.testing.assert_array_equal(record["pos"], pos.astype(dtype))
+        np.testing.assert_array_equal(record["vel"], vel.astype(dtype))
+    np.testing.assert_array_equal(reader.positions(1, 5, 2), frames["pos"][1:5:2])
+
+
+def test_frames_are_written_a_chunk_at_a_time(tmp_path):
+    filename = tmp_path / "corrida.traj"
+    simulation = small_cluster()
+    writer = TrajectoryWriter(filename, simulation.store, chunk_frames=4)
+    lengths = []
+    for _ in range(10):
+        writer.append(simulation)
+        simulation.step()
+        lengths.append(len(TrajectoryReader(filename)))
+    # Los cuadros llegan al disco cuando se llena el bloque, y los restantes al cerrar el archivo.
+    assert lengths == [0, 0, 0, 4, 4, 4, 4, 8, 8, 8]
+    assert writer.frames_written == 10
+    writer.close()
+    assert len(TrajectoryReader(filename)) == 10
+
+
+def test_reader_ignores_a_partial_record(tmp_path):
+    filename = tmp_path / "corrida.traj"
+    write_run(filename, small_cluster(), 5)
+    expected = TrajectoryReader(filename).frames().copy()
+    # Un registro que se estaba escribiendo cuando se leyó el archivo.
+    with open(filename, "ab") as f:
+        f.write(b"\x00" * (expected.dtype.itemsize // 2))
+    reader = TrajectoryReader(filename)
+    assert len(reader) == 6
+    np.testing.assert_array_equal(reader.frames(), expected)
+
+
+def test_truncate_and_append_continue_the_trajectory(tmp_path):
+    filename = tmp_path / "corrida.traj"
+    simulation = small_cluster()
+    write_run(filename, simulation, 10, stride=2)
+    expected = TrajectoryReader(filename).frames()[:3].copy()
+    with open(filename, "ab") as f:
+        f.write(b"\x00" * 10)
+    # Se eliminan los cuadros de las iteraciones 6 en adelante y el registro incompleto.
+    assert truncate_trajectory(filename, 5) == 3
+    np.testing.assert_array_equal(TrajectoryReader(filename).frames(), expected)
+
+    # Los cuadros agregados siguen el mismo paso de salida.
+    simulation.frame = 6
+    write_run(filename, simulation, 4, stride=2, append=True)
+    assert TrajectoryReader(filename).frames()["frame"].tolist() == [0, 2, 4, 6, 8, 10]
+
+
+def test_append_refuses_a_different_file(tmp_path):
+    filename = tmp_path / "corrida.traj"
+    write_run(filename, small_cluster(), 2)
+    with pytest.raises(ValueError):
+        TrajectoryWriter(filename, small_cluster(4).store, append=True)
+    with pytest.raises(ValueError):
+        TrajectoryWriter(filename, small_cluster().store, dtype="float32", append=True)
+    (tmp_path / "otro.traj").write_bytes(b"no es una trayectoria")
+    with pytest.raises(ValueError):
+        TrajectoryReader(tmp_path / "otro.traj")
+
+
+def test_segment_filenames():
+    assert [segment_filename("datos/corrida.traj", k) for k in range(3)] == \
+        ["datos/corrida.traj", "datos/corrida.1.traj", "datos/corrida.2.traj"]